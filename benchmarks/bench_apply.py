@@ -0,0 +1,195 @@
+"""Benchmark planning & applying synthetic fleets against in-memory fake clients.
+
+Usage:
+  ```sh
+  uv run python -m benchmarks.bench_apply [--sizes 10 1000 10000] \
+    [--zone-records 50000] [--latency 0.005] [--output benchmark-results.json]
+  # or
+  nox -s benchmarks -- --sizes 10 1000
+  ```
+
+For each size a blueprint with that many Droplets, each with an A record pointing at
+it, is generated. Half of the Droplets already exist, as do a tenth more that are no
+longer in the blueprint, and half of the A records exist with stale content alongside
+`--zone-records` unrelated records. Each step is timed & its peak memory traced with
+`tracemalloc`, which slows it down, so compare results only with each other.
+"""
+
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+from uuid import UUID
+
+import structlog
+
+from benchmarks.fakes import FakeCloudflareClient, FakeDOClient
+from digitalocean_deployment_orchestrator.infra import apply
+from digitalocean_deployment_orchestrator.infra.utils import DEFAULT_MAX_PARALLEL
+from digitalocean_deployment_orchestrator.types import Environment
+
+ZONE_NAME = "example.com"
+
+BLUEPRINT_TEMPLATE = """
+from uuid import UUID
+
+from digitalocean_deployment_orchestrator.infra.types import EnvironmentBlueprint
+from digitalocean_deployment_orchestrator.types import Environment
+from digitalocean_deployment_orchestrator.types_cloudflare import DNSRecord
+from digitalocean_deployment_orchestrator.types_DO import (
+    DORegion,
+    DropletImage,
+    DropletRequest,
+    DropletSize,
+    IPAddressForDroplet,
+)
+
+# a multi-KB cloud-config, shared by every Droplet
+USER_DATA = "#cloud-config\\n" + "# padding\\n" * 400
+
+BLUEPRINT = EnvironmentBlueprint(
+    environment=Environment.TEST,
+    droplets=[
+        DropletRequest(
+            name=f"web-{{i}}",
+            region=DORegion.LONDON1,
+            size=DropletSize.BASIC_YOCTO,
+            image=DropletImage.DEBIAN_13_X64,
+            ssh_keys=["ab:cd"],
+            tags=["web"],
+            vpc_uuid="",
+            user_data=USER_DATA,
+            well_known_uuid=UUID(int=i),
+        )
+        for i in range({size})
+    ],
+    dns=[
+        DNSRecord(
+            cf_zone_name="{zone_name}",
+            type="A",
+            name=f"web-{{i}}",
+            content=IPAddressForDroplet(droplet_wkid=UUID(int=i)),
+            ttl=None,
+            proxied=True,
+        )
+        for i in range({size})
+    ],
+)
+"""
+
+
+def _measure(fn: Callable[[], Any]) -> tuple[Any, dict]:
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = fn()
+    finally:
+        seconds = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, {"seconds": round(seconds, 6), "peak_memory_bytes": peak}
+
+
+def _seed_cloudflare(cf_client: FakeCloudflareClient, size: int, zone_records: int):
+    zone_id = cf_client.add_zone(ZONE_NAME)
+    for i in range(zone_records):
+        cf_client.add_record(zone_id, name=f"other-{i}", type="A", content="192.0.2.1")
+    for i in range(0, size, 2):
+        cf_client.add_record(
+            zone_id, name=f"web-{i}", type="A", content="192.0.2.2", proxied=True
+        )
+
+
+def run_scenario(
+    size: int, zone_records: int, latency: float, max_parallel: int
+) -> list[dict]:
+    env = Environment.TEST
+    results = []
+
+    with tempfile.TemporaryDirectory() as blueprints_dir:
+        blueprints_path = Path(blueprints_dir)
+        (blueprints_path / "test.py").write_text(
+            BLUEPRINT_TEMPLATE.format(size=size, zone_name=ZONE_NAME)
+        )
+        blueprint, stats = _measure(
+            lambda: apply.load_environment_blueprint(blueprints_path, env)
+        )
+        results.append({"step": "load_environment_blueprint", **stats})
+
+    do_client = FakeDOClient(latency)
+    do_client.seed(env.tag, [UUID(int=i) for i in range(0, size, 2)])
+    do_client.seed(env.tag, [UUID(int=size + i) for i in range(size // 10)])
+    _, stats = _measure(
+        lambda: apply.manage_droplets(
+            False, do_client, env, blueprint.droplets, max_parallel=max_parallel
+        )
+    )
+    results.append({"step": "manage_droplets", **stats})
+
+    cf_client = FakeCloudflareClient(latency)
+    _seed_cloudflare(cf_client, size, zone_records)
+    _, stats = _measure(
+        lambda: apply.manage_cloudflare_dns(
+            False, do_client, cf_client, env, blueprint.dns
+        )
+    )
+    results.append({"step": "manage_cloudflare_dns", **stats})
+
+    for result in results:
+        result.update(droplets=size, zone_records=zone_records)
+    return results
+
+
+def main(
+    sizes: list[int],
+    zone_records: int,
+    latency: float,
+    max_parallel: int,
+    output: Path,
+):
+    results: list[dict[str, Any]] = []
+    report = {
+        "meta": {
+            "timestamp": datetime.now(UTC).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "latency": latency,
+            "max_parallel": max_parallel,
+        },
+        "results": results,
+    }
+    for size in sizes:
+        for result in run_scenario(size, zone_records, latency, max_parallel):
+            results.append(result)
+            print(json.dumps(result))  # noqa: T201
+
+    output.write_text(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1_000, 10_000])
+    parser.add_argument("--zone-records", type=int, default=50_000)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Seconds each fake API call takes",
+    )
+    parser.add_argument("--max-parallel", type=int, default=DEFAULT_MAX_PARALLEL)
+    parser.add_argument("--output", type=Path, default=Path("benchmark-results.json"))
+    args = parser.parse_args()
+
+    # apply's own events would dominate the timings
+    structlog.configure(
+        logger_factory=structlog.PrintLoggerFactory(open(os.devnull, "w"))
+    )
+
+    main(args.sizes, args.zone_records, args.latency, args.max_parallel, args.output)
@@ -0,0 +1,781 @@
+"""A local stand-in for the parts of the Digital Ocean & Cloudflare APIs DODO uses.
+
+Usage:
+  ```sh
+  uv run python -m benchmarks.fake_api [--port 8080] [--zone example.com] \
+    [--latency 0.05] [--error-rate 0.01] [--boot-time 30]
+  # then, in another shell
+  export DIGITALOCEAN__API_URL=http://127.0.0.1:8080
+  export CLOUDFLARE__API_URL=http://127.0.0.1:8080/client/v4
+  export DIGITALOCEAN__TOKEN=fake CLOUDFLARE__TOKEN=fake
+  uv run python -m digitalocean_deployment_orchestrator.infra.apply \
+    path/to/blueprints test --no-dry-run
+  ```
+
+Serves the Droplet, Droplet action, snapshot & tag endpoints of Digital Ocean under
+`/v2` and the zone & DNS record endpoints of Cloudflare under `/client/v4`, from state
+held in memory. Lists are paginated with each provider's page size limits, and every
+response carries rate-limit headers, with a 429 once a provider's budget for the
+current window is spent. Latency and transient 503 errors can be injected to exercise
+retries & concurrency.
+"""
+
+import argparse
+import contextlib
+import itertools
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlencode, urlparse
+
+DO_DEFAULT_PER_PAGE = 20
+DO_MAX_PER_PAGE = 200
+DO_MAX_NAMES_PER_CREATE = 10
+CF_DEFAULT_PER_PAGE = 100
+CF_MAX_ZONES_PER_PAGE = 50
+CF_MAX_RECORDS_PER_PAGE = 5000
+CF_MAX_BATCH_SIZE = 200
+
+
+class APIError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@dataclass
+class RateLimit:
+    """A fixed-window request budget, reported the way Digital Ocean reports its own."""
+
+    limit: int
+    window: float
+    clock: Callable[[], float] = time.time
+    _window_start: float = field(init=False, default=-math.inf)
+    _used: int = field(init=False, default=0)
+
+    def take(self) -> tuple[bool, dict[str, str]]:
+        """Spend one request, returning whether it is allowed & the headers to send."""
+        now = self.clock()
+        if now - self._window_start >= self.window:
+            self._window_start, self._used = now, 0
+        reset = self._window_start + self.window
+        allowed = self._used < self.limit
+        if allowed:
+            self._used += 1
+        headers = {
+            "ratelimit-limit": str(self.limit),
+            "ratelimit-remaining": str(self.limit - self._used),
+            "ratelimit-reset": str(math.ceil(reset)),
+        }
+        if not allowed:
+            headers["retry-after"] = str(max(1, math.ceil(reset - now)))
+        return allowed, headers
+
+
+def _now_iso() -> str:
+    return datetime.now(UTC).isoformat().replace("+00:00", "Z")
+
+
+@dataclass
+class FakeAPIState:
+    """Resources held by the fake API. Not thread-safe, see `FakeAPIServer.lock`.
+
+    Droplets report `status: new` & no IP addresses until `boot_time` seconds after
+    they were created, as real Droplets do while they are being provisioned.
+    """
+
+    boot_time: float = 0.0
+    clock: Callable[[], float] = time.monotonic
+    droplets: dict[int, dict] = field(default_factory=dict)
+    tags: set[str] = field(default_factory=set)
+    zones: dict[str, dict] = field(default_factory=dict)
+    records: dict[str, dict[str, dict]] = field(default_factory=dict)
+    actions: dict[int, dict] = field(default_factory=dict)
+    powered_off: set[int] = field(default_factory=set)
+    # private images, ie. snapshots, public distribution images are not served
+    images: dict[int, dict] = field(default_factory=dict)
+    # { image_id: id of the Droplet it is a snapshot of }
+    snapshot_of: dict[int, int] = field(default_factory=dict)
+    _droplet_ids: Iterator[int] = field(default_factory=lambda: itertools.count(1))
+    _action_ids: Iterator[int] = field(default_factory=lambda: itertools.count(1))
+    _image_ids: Iterator[int] = field(default_factory=lambda: itertools.count(1))
+    _booted_at: dict[int, float] = field(default_factory=dict)
+
+    def add_droplet(self, name: str, tags: list[str], **attrs) -> dict:
+        droplet_id = next(self._droplet_ids)
+        droplet = {
+            "id": droplet_id,
+            "name": name,
+            "tags": list(dict.fromkeys(tags)),
+            "created_at": _now_iso(),
+            **attrs,
+        }
+        self.droplets[droplet_id] = droplet
+        self._booted_at[droplet_id] = self.clock() + self.boot_time
+        self.tags.update(droplet["tags"])
+        return self.droplet_view(droplet)
+
+    def droplet_view(self, droplet: dict) -> dict:
+        booted = self.clock() >= self._booted_at[droplet["id"]]
+        v4 = []
+        if booted:
+            droplet_id = droplet["id"]
+            ip = f"10.{droplet_id >> 16 & 255}.{droplet_id >> 8 & 255}.{droplet_id & 255}"
+            v4 = [{"type": "public", "ip_address": ip}]
+        if droplet["id"] in self.powered_off:
+            status = "off"
+        else:
+            status = "active" if booted else "new"
+        return {
+            **droplet,
+            "status": status,
+            "networks": {"v4": v4, "v6": []},
+        }
+
+    def add_action(self, droplet_id: int, action_type: str) -> dict:
+        action_id = next(self._action_ids)
+        self.actions[action_id] = {
+            "id": action_id,
+            "status": "completed",
+            "type": action_type,
+            "resource_id": droplet_id,
+            "resource_type": "droplet",
+            "started_at": _now_iso(),
+            "completed_at": _now_iso(),
+        }
+        return self.actions[action_id]
+
+    def add_image(self, name: str, droplet_id: int | None = None) -> dict:
+        """Add a snapshot, of the Droplet with `droplet_id` if given."""
+        image_id = next(self._image_ids)
+        self.images[image_id] = {
+            "id": image_id,
+            "name": name,
+            "type": "snapshot",
+            "distribution": "Debian",
+            "public": False,
+            "regions": ["lon1"],
+            "created_at": _now_iso(),
+            "min_disk_size": 10,
+            "size_gigabytes": 1.0,
+            "status": "available",
+        }
+        if droplet_id is not None:
+            self.snapshot_of[image_id] = droplet_id
+        return self.images[image_id]
+
+    def add_zone(self, name: str) -> str:
+        zone_id = uuid.uuid4().hex
+        self.zones[zone_id] = {"id": zone_id, "name": name, "status": "active"}
+        self.records[zone_id] = {}
+        return zone_id
+
+    def add_record(self, zone_id: str, data: dict) -> dict:
+        zone = self._zone(zone_id)
+        record_id = uuid.uuid4().hex
+        now = _now_iso()
+        record = {
+            "id": record_id,
+            "zone_id": zone_id,
+            "zone_name": zone["name"],
+            "ttl": 1,
+            "proxied": False,
+            "created_on": now,
+            "modified_on": now,
+        }
+        record.update(_record_fields(zone, data))
+        self.records[zone_id][record_id] = record
+        return record
+
+    def update_record(self, zone_id: str, record_id: str, data: dict) -> dict:
+        record = self._record(zone_id, record_id)
+        record.update(_record_fields(self._zone(zone_id), data))
+        record["modified_on"] = _now_iso()
+        return record
+
+    def _zone(self, zone_id: str) -> dict:
+        if zone_id not in self.zones:
+            raise APIError(HTTPStatus.NOT_FOUND, f"Zone {zone_id} not found")
+        return self.zones[zone_id]
+
+    def _record(self, zone_id: str, record_id: str) -> dict:
+        records = self.records.get(zone_id, {})
+        if record_id not in records:
+            raise APIError(HTTPStatus.NOT_FOUND, f"Record {record_id} not found")
+        return records[record_id]
+
+
+def _record_fields(zone: dict, data: dict) -> dict:
+    fields = {
+        k: data[k] for k in ("name", "type", "content", "proxied", "ttl") if k in data
+    }
+    if "name" in fields:
+        name = fields["name"]
+        if name == "@":
+            name = zone["name"]
+        elif name != zone["name"] and not name.endswith(f".{zone['name']}"):
+            name = f"{name}.{zone['name']}"
+        fields["name"] = name
+    return fields
+
+
+@dataclass(frozen=True)
+class Request:
+    method: str
+    path: str
+    query: dict[str, str]
+    body: dict
+    # eg. 'http://127.0.0.1:8080', for building pagination links
+    base_url: str
+
+
+# (status, payload) - a payload of `None` sends no body
+Response = tuple[HTTPStatus, dict | None]
+
+
+def _page_args(query: dict[str, str], default: int, maximum: int) -> tuple[int, int]:
+    try:
+        page = max(1, int(query.get("page", 1)))
+        per_page = min(max(1, int(query.get("per_page", default))), maximum)
+    except ValueError as err:
+        raise APIError(HTTPStatus.BAD_REQUEST, "Invalid pagination") from err
+    return page, per_page
+
+
+# --- Digital Ocean --------------------------------------------------------------------
+
+
+def _do_page(
+    req: Request,
+    key: str,
+    items: list[dict],
+    view: Callable[[dict], dict] = lambda item: item,
+) -> Response:
+    """One page of `items`, under `key`, with Digital Ocean's pagination links."""
+    page, per_page = _page_args(req.query, DO_DEFAULT_PER_PAGE, DO_MAX_PER_PAGE)
+    start = (page - 1) * per_page
+    last_page = max(1, math.ceil(len(items) / per_page))
+
+    def _link(to_page: int) -> str:
+        query = {k: v for k, v in req.query.items() if k != "page"}
+        return f"{req.base_url}{req.path}?{urlencode({**query, 'page': to_page})}"
+
+    pages: dict[str, str] = {}
+    if page > 1:
+        pages.update(first=_link(1), prev=_link(page - 1))
+    if page < last_page:
+        pages.update(next=_link(page + 1), last=_link(last_page))
+    return HTTPStatus.OK, {
+        key: [view(item) for item in items[start : start + per_page]],
+        "links": {"pages": pages} if pages else {},
+        "meta": {"total": len(items)},
+    }
+
+
+def _do_droplets_list(state: FakeAPIState, req: Request) -> Response:
+    tag_name = req.query.get("tag_name")
+    matching = [
+        d for d in state.droplets.values() if tag_name is None or tag_name in d["tags"]
+    ]
+    return _do_page(req, "droplets", matching, state.droplet_view)
+
+
+def _do_droplets_create(state: FakeAPIState, req: Request) -> Response:
+    body = req.body
+    names = body.get("names") or ([body["name"]] if body.get("name") else [])
+    missing = [k for k in ("region", "size", "image") if not body.get(k)]
+    if not names or missing:
+        raise APIError(
+            HTTPStatus.UNPROCESSABLE_ENTITY,
+            f"Missing {', '.join(missing or ['name'])}",
+        )
+    if len(names) > DO_MAX_NAMES_PER_CREATE:
+        raise APIError(
+            HTTPStatus.UNPROCESSABLE_ENTITY,
+            f"At most {DO_MAX_NAMES_PER_CREATE} names may be created at once",
+        )
+    image = body["image"]
+    if isinstance(image, int):
+        if image not in state.images:
+            raise APIError(
+                HTTPStatus.UNPROCESSABLE_ENTITY, "You specified an invalid image"
+            )
+        image = {"id": image, "name": state.images[image]["name"]}
+    else:
+        image = {"slug": image}
+    attrs = {
+        "size_slug": body["size"],
+        "region": {"slug": body["region"]},
+        "image": image,
+        "vpc_uuid": body.get("vpc_uuid") or None,
+    }
+    created = [state.add_droplet(name, body.get("tags") or [], **attrs) for name in names]
+    if "names" in body:
+        return HTTPStatus.ACCEPTED, {"droplets": created, "links": {}}
+    return HTTPStatus.ACCEPTED, {"droplet": created[0], "links": {}}
+
+
+def _do_droplets_destroy_by_tag(state: FakeAPIState, req: Request) -> Response:
+    tag_name = req.query.get("tag_name")
+    if not tag_name:
+        raise APIError(HTTPStatus.UNPROCESSABLE_ENTITY, "tag_name is required")
+    for droplet_id, droplet in list(state.droplets.items()):
+        if tag_name in droplet["tags"]:
+            del state.droplets[droplet_id]
+    return HTTPStatus.NO_CONTENT, None
+
+
+def _droplet(state: FakeAPIState, droplet_id: str) -> dict:
+    droplet = None
+    if str(droplet_id).isdigit():
+        droplet = state.droplets.get(int(droplet_id))
+    if droplet is None:
+        raise APIError(HTTPStatus.NOT_FOUND, f"Droplet {droplet_id} not found")
+    return droplet
+
+
+def _do_droplet_get(state: FakeAPIState, req: Request, droplet_id: str) -> Response:
+    return HTTPStatus.OK, {"droplet": state.droplet_view(_droplet(state, droplet_id))}
+
+
+def _do_droplet_destroy(state: FakeAPIState, req: Request, droplet_id: str) -> Response:
+    del state.droplets[_droplet(state, droplet_id)["id"]]
+    return HTTPStatus.NO_CONTENT, None
+
+
+def _do_droplet_snapshots(state: FakeAPIState, req: Request, droplet_id: str) -> Response:
+    owner_id = _droplet(state, droplet_id)["id"]
+    snapshots = [
+        state.images[image_id]
+        for image_id, snapshot_of in state.snapshot_of.items()
+        if snapshot_of == owner_id and image_id in state.images
+    ]
+    return _do_page(req, "snapshots", snapshots)
+
+
+def _do_droplet_action(state: FakeAPIState, req: Request, droplet_id: str) -> Response:
+    """Actions complete at once. A resize, as on DO, needs the Droplet powered off."""
+    droplet = _droplet(state, droplet_id)
+    action_type = req.body.get("type")
+    if action_type in ("shutdown", "power_off"):
+        state.powered_off.add(droplet["id"])
+    elif action_type == "power_on":
+        state.powered_off.discard(droplet["id"])
+    elif action_type == "resize":
+        if not req.body.get("size"):
+            raise APIError(HTTPStatus.UNPROCESSABLE_ENTITY, "size is required")
+        if droplet["id"] not in state.powered_off:
+            raise APIError(
+                HTTPStatus.UNPROCESSABLE_ENTITY, "Droplet must be powered off to resize"
+            )
+        droplet["size_slug"] = req.body["size"]
+    elif action_type == "snapshot":
+        name = req.body.get("name") or f"{droplet['name']}-{int(time.time())}"
+        state.add_image(name, droplet["id"])
+    else:
+        raise APIError(
+            HTTPStatus.UNPROCESSABLE_ENTITY, f"Unsupported action type {action_type}"
+        )
+    return HTTPStatus.CREATED, {"action": state.add_action(droplet["id"], action_type)}
+
+
+def _do_droplet_action_get(
+    state: FakeAPIState, req: Request, droplet_id: str, action_id: str
+) -> Response:
+    action = state.actions.get(int(action_id))
+    if action is None or action["resource_id"] != _droplet(state, droplet_id)["id"]:
+        raise APIError(HTTPStatus.NOT_FOUND, f"Action {action_id} not found")
+    return HTTPStatus.OK, {"action": action}
+
+
+def _do_images_list(state: FakeAPIState, req: Request) -> Response:
+    """Only private images exist, so `private=true` and no filter list the same."""
+    if req.query.get("private") == "false":
+        return _do_page(req, "images", [])
+    type_ = req.query.get("type")
+    images = [i for i in state.images.values() if type_ is None or i["type"] == type_]
+    return _do_page(req, "images", images)
+
+
+def _do_tags_create(state: FakeAPIState, req: Request) -> Response:
+    name = req.body.get("name")
+    if not name:
+        raise APIError(HTTPStatus.UNPROCESSABLE_ENTITY, "name is required")
+    state.tags.add(name)
+    count = sum(name in d["tags"] for d in state.droplets.values())
+    return HTTPStatus.CREATED, {"tag": {"name": name, "resources": {"count": count}}}
+
+
+def _do_tags_assign(state: FakeAPIState, req: Request, tag: str) -> Response:
+    if tag not in state.tags:
+        raise APIError(HTTPStatus.NOT_FOUND, f"Tag {tag} not found")
+    resources = req.body.get("resources") or []
+    droplets = [_droplet(state, r["resource_id"]) for r in resources]
+    for droplet in droplets:
+        if tag not in droplet["tags"]:
+            droplet["tags"].append(tag)
+    return HTTPStatus.NO_CONTENT, None
+
+
+def _do_tags_unassign(state: FakeAPIState, req: Request, tag: str) -> Response:
+    if tag not in state.tags:
+        raise APIError(HTTPStatus.NOT_FOUND, f"Tag {tag} not found")
+    resources = req.body.get("resources") or []
+    for droplet in [_droplet(state, r["resource_id"]) for r in resources]:
+        if tag in droplet["tags"]:
+            droplet["tags"].remove(tag)
+    return HTTPStatus.NO_CONTENT, None
+
+
+# --- Cloudflare -----------------------------------------------------------------------
+
+
+def _cf_result(result, result_info: dict | None = None) -> dict:
+    payload = {"success": True, "errors": [], "messages": [], "result": result}
+    if result_info is not None:
+        payload["result_info"] = result_info
+    return payload
+
+
+def _cf_page(items: list, page: int, per_page: int) -> dict:
+    start = (page - 1) * per_page
+    result = items[start : start + per_page]
+    return _cf_result(
+        result,
+        {
+            "page": page,
+            "per_page": per_page,
+            "count": len(result),
+            "total_count": len(items),
+            "total_pages": max(1, math.ceil(len(items) / per_page)),
+        },
+    )
+
+
+def _cf_zones_list(state: FakeAPIState, req: Request) -> Response:
+    page, per_page = _page_args(req.query, CF_MAX_ZONES_PER_PAGE, CF_MAX_ZONES_PER_PAGE)
+    name = req.query.get("name")
+    zones = [z for z in state.zones.values() if name is None or z["name"] == name]
+    return HTTPStatus.OK, _cf_page(zones, page, per_page)
+
+
+def _cf_records_list(state: FakeAPIState, req: Request, zone_id: str) -> Response:
+    state._zone(zone_id)
+    page, per_page = _page_args(req.query, CF_DEFAULT_PER_PAGE, CF_MAX_RECORDS_PER_PAGE)
+    name = req.query.get("name.exact", req.query.get("name"))
+    type_ = req.query.get("type")
+    records = [
+        r
+        for r in state.records[zone_id].values()
+        if (name is None or r["name"] == name) and (type_ is None or r["type"] == type_)
+    ]
+    return HTTPStatus.OK, _cf_page(records, page, per_page)
+
+
+def _cf_records_create(state: FakeAPIState, req: Request, zone_id: str) -> Response:
+    return HTTPStatus.OK, _cf_result(state.add_record(zone_id, req.body))
+
+
+def _cf_record_update(
+    state: FakeAPIState, req: Request, zone_id: str, record_id: str
+) -> Response:
+    return HTTPStatus.OK, _cf_result(state.update_record(zone_id, record_id, req.body))
+
+
+def _cf_record_delete(
+    state: FakeAPIState, req: Request, zone_id: str, record_id: str
+) -> Response:
+    state._record(zone_id, record_id)
+    del state.records[zone_id][record_id]
+    return HTTPStatus.OK, _cf_result({"id": record_id})
+
+
+def _cf_records_batch(state: FakeAPIState, req: Request, zone_id: str) -> Response:
+    """Apply deletes, patches, puts then posts, as Cloudflare does, all or nothing."""
+    state._zone(zone_id)
+    ops = {k: req.body.get(k) or [] for k in ("deletes", "patches", "puts", "posts")}
+    if sum(len(v) for v in ops.values()) > CF_MAX_BATCH_SIZE:
+        raise APIError(
+            HTTPStatus.BAD_REQUEST, f"At most {CF_MAX_BATCH_SIZE} changes per batch"
+        )
+    for op in ops["deletes"] + ops["patches"] + ops["puts"]:
+        state._record(zone_id, op["id"])
+
+    result: dict[str, list[dict]] = {
+        "deletes": [],
+        "patches": [],
+        "puts": [],
+        "posts": [],
+    }
+    for op in ops["deletes"]:
+        result["deletes"].append(state.records[zone_id].pop(op["id"]))
+    for key in ("patches", "puts"):
+        for op in ops[key]:
+            data = {k: v for k, v in op.items() if k != "id"}
+            result[key].append(dict(state.update_record(zone_id, op["id"], data)))
+    for op in ops["posts"]:
+        result["posts"].append(dict(state.add_record(zone_id, op)))
+    return HTTPStatus.OK, _cf_result(result)
+
+
+_ID = r"([^/]+)"
+_HANDLERS: list[tuple[str, str, Callable[..., Response]]] = [
+    ("GET", "/v2/droplets", _do_droplets_list),
+    ("POST", "/v2/droplets", _do_droplets_create),
+    ("DELETE", "/v2/droplets", _do_droplets_destroy_by_tag),
+    ("GET", r"/v2/droplets/(\d+)", _do_droplet_get),
+    ("DELETE", r"/v2/droplets/(\d+)", _do_droplet_destroy),
+    ("POST", r"/v2/droplets/(\d+)/actions", _do_droplet_action),
+    ("GET", r"/v2/droplets/(\d+)/actions/(\d+)", _do_droplet_action_get),
+    ("GET", r"/v2/droplets/(\d+)/snapshots", _do_droplet_snapshots),
+    ("GET", "/v2/images", _do_images_list),
+    ("POST", "/v2/tags", _do_tags_create),
+    ("POST", f"/v2/tags/{_ID}/resources", _do_tags_assign),
+    ("DELETE", f"/v2/tags/{_ID}/resources", _do_tags_unassign),
+    ("GET", "/client/v4/zones", _cf_zones_list),
+    ("GET", f"/client/v4/zones/{_ID}/dns_records", _cf_records_list),
+    ("POST", f"/client/v4/zones/{_ID}/dns_records", _cf_records_create),
+    ("POST", f"/client/v4/zones/{_ID}/dns_records/batch", _cf_records_batch),
+    ("PUT", f"/client/v4/zones/{_ID}/dns_records/{_ID}", _cf_record_update),
+    ("PATCH", f"/client/v4/zones/{_ID}/dns_records/{_ID}", _cf_record_update),
+    ("DELETE", f"/client/v4/zones/{_ID}/dns_records/{_ID}", _cf_record_delete),
+]
+ROUTES: list[tuple[str, re.Pattern, Callable[..., Response]]] = [
+    (method, re.compile(f"{pattern}/?"), handler)
+    for method, pattern, handler in _HANDLERS
+]
+
+
+def _route(method: str, path: str) -> tuple[Callable[..., Response], tuple[str, ...]]:
+    path_matched = False
+    for route_method, pattern, handler in ROUTES:
+        match = pattern.fullmatch(path)
+        if match is None:
+            continue
+        path_matched = True
+        if route_method == method:
+            return handler, tuple(unquote(g) for g in match.groups())
+    if path_matched:
+        raise APIError(HTTPStatus.METHOD_NOT_ALLOWED, f"{method} not allowed")
+    raise APIError(HTTPStatus.NOT_FOUND, f"No route for {path}")
+
+
+def _provider(path: str) -> str:
+    return "cloudflare" if path.startswith("/client/v4/") else "digitalocean"
+
+
+def _error_payload(provider: str, err: APIError) -> dict:
+    if provider == "cloudflare":
+        return {
+            "success": False,
+            "errors": [{"code": 10000 + err.status.value, "message": err.message}],
+            "messages": [],
+            "result": None,
+        }
+    return {"id": err.status.phrase.lower().replace(" ", "_"), "message": err.message}
+
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    server: "FakeAPIServer"
+    protocol_version = "HTTP/1.1"
+    # send headers & body in one write, flushed after each request
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def do_PUT(self):
+        self._handle()
+
+    def do_PATCH(self):
+        self._handle()
+
+    def do_DELETE(self):
+        self._handle()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _handle(self):
+        url = urlparse(self.path)
+        provider = _provider(url.path)
+        length = int(self.headers.get("content-length") or 0)
+        raw_body = self.rfile.read(length) if length else b""
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        headers: dict[str, str] = {}
+        try:
+            if not self.headers.get("authorization", "").startswith("Bearer "):
+                raise APIError(HTTPStatus.UNAUTHORIZED, "Unable to authenticate you")
+            try:
+                body = json.loads(raw_body) if raw_body else {}
+            except json.JSONDecodeError as err:
+                raise APIError(HTTPStatus.BAD_REQUEST, "Malformed JSON") from err
+            request = Request(
+                method=self.command,
+                path=url.path,
+                query=dict(parse_qsl(url.query)),
+                body=body,
+                base_url=f"http://{self.headers.get('host', 'localhost')}",
+            )
+            status, payload, headers = self.server.dispatch(provider, request)
+        except APIError as err:
+            status, payload = err.status, _error_payload(provider, err)
+
+        content = b"" if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if payload is not None:
+            self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class FakeAPIServer(ThreadingHTTPServer):
+    """Serve `state` over HTTP, see the module docstring.
+
+    Requests are handled on a thread each, but state is only read & changed under
+    `lock`. `requests` counts handled requests by (provider, method, path pattern).
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int] = ("127.0.0.1", 0),
+        *,
+        state: FakeAPIState | None = None,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        rate_limits: dict[str, RateLimit] | None = None,
+        seed: int | None = None,
+        verbose: bool = False,
+    ):
+        super().__init__(address, FakeAPIHandler)
+        self.state = state or FakeAPIState()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limits = rate_limits or {
+            # <https://docs.digitalocean.com/reference/api/digitalocean/#section/Introduction/Rate-Limit>
+            "digitalocean": RateLimit(limit=5000, window=3600),
+            # <https://developers.cloudflare.com/fundamentals/api/reference/limits/>
+            "cloudflare": RateLimit(limit=1200, window=300),
+        }
+        self.verbose = verbose
+        self.requests: Counter[tuple[str, str, str]] = Counter()
+        self.lock = threading.Lock()
+        self._random = random.Random(seed)  # noqa: S311
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        if isinstance(host, bytes):
+            host = host.decode()
+        return f"http://{host}:{port}"
+
+    def dispatch(
+        self, provider: str, request: Request
+    ) -> tuple[HTTPStatus, dict | None, dict[str, str]]:
+        with self.lock:
+            allowed, headers = self.rate_limits[provider].take()
+            if not allowed:
+                err = APIError(HTTPStatus.TOO_MANY_REQUESTS, "Too many requests")
+                return err.status, _error_payload(provider, err), headers
+            if self._random.random() < self.error_rate:
+                err = APIError(HTTPStatus.SERVICE_UNAVAILABLE, "Injected error")
+                return err.status, _error_payload(provider, err), headers
+
+            handler, args = _route(request.method, request.path)
+            self.requests[(provider, request.method, handler.__name__)] += 1
+            try:
+                status, payload = handler(self.state, request, *args)
+            except APIError as err:
+                return err.status, _error_payload(provider, err), headers
+            return status, payload, headers
+
+
+@contextlib.contextmanager
+def serve_in_background(server: FakeAPIServer) -> Iterator[FakeAPIServer]:
+    # poll often, so that `shutdown()` does not wait long
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--zone",
+        dest="zones",
+        action="append",
+        default=[],
+        help="Cloudflare zone to serve, may be repeated",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds to wait before responding"
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests to fail with a 503",
+    )
+    parser.add_argument(
+        "--boot-time",
+        type=float,
+        default=0.0,
+        help="Seconds before a new Droplet is active & has an IP address",
+    )
+    parser.add_argument("--do-rate-limit", type=int, default=5000)
+    parser.add_argument("--do-rate-window", type=float, default=3600)
+    parser.add_argument("--cf-rate-limit", type=int, default=1200)
+    parser.add_argument("--cf-rate-window", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    state = FakeAPIState(boot_time=args.boot_time)
+    for zone in args.zones:
+        state.add_zone(zone)
+    server = FakeAPIServer(
+        (args.host, args.port),
+        state=state,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limits={
+            "digitalocean": RateLimit(args.do_rate_limit, args.do_rate_window),
+            "cloudflare": RateLimit(args.cf_rate_limit, args.cf_rate_window),
+        },
+        seed=args.seed,
+        verbose=args.verbose,
+    )
+    print(f"Serving fake Digital Ocean & Cloudflare APIs on {server.url}")  # noqa: T201
+    with contextlib.suppress(KeyboardInterrupt):
+        server.serve_forever()
+    server.server_close()
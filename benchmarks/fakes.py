@@ -0,0 +1,191 @@
+"""In-memory stand-ins for the pydo & Cloudflare clients used by `infra.apply`.
+
+Only the calls DODO makes are implemented. Each call sleeps for `latency` seconds to
+approximate a round trip to the real API.
+"""
+
+import itertools
+import time
+from types import SimpleNamespace
+from uuid import UUID
+
+
+def _sleep(latency: float):
+    if latency:
+        time.sleep(latency)
+
+
+def make_droplet(droplet_id: int, name: str, tags: list[str]) -> dict:
+    return {
+        "id": droplet_id,
+        "name": name,
+        "tags": tags,
+        "status": "active",
+        "networks": {
+            "v4": [
+                {
+                    "type": "public",
+                    "ip_address": f"10.{droplet_id >> 16 & 255}."
+                    f"{droplet_id >> 8 & 255}.{droplet_id & 255}",
+                }
+            ],
+            "v6": [],
+        },
+    }
+
+
+class _FakeDroplets:
+    def __init__(self, client: "FakeDOClient"):
+        self._client = client
+
+    def list(self, *, tag_name=None, per_page=20, page=1):
+        _sleep(self._client.latency)
+        matching = [
+            d
+            for d in self._client.store.values()
+            if tag_name is None or tag_name in d["tags"]
+        ]
+        start = (page - 1) * per_page
+        links = {}
+        if start + per_page < len(matching):
+            links = {"pages": {"next": f"https://fake/v2/droplets?page={page + 1}"}}
+        return {
+            "droplets": matching[start : start + per_page],
+            "links": links,
+            "meta": {"total": len(matching)},
+        }
+
+    def create(self, *, body):
+        _sleep(self._client.latency)
+        names = body.get("names") or [body["name"]]
+        created = [self._client.add_droplet(name, list(body["tags"])) for name in names]
+        if "names" in body:
+            return {"droplets": created, "links": {}}
+        return {"droplet": created[0], "links": {}}
+
+    def destroy(self, *, droplet_id):
+        _sleep(self._client.latency)
+        del self._client.store[droplet_id]
+
+    def destroy_by_tag(self, *, tag_name):
+        _sleep(self._client.latency)
+        for droplet_id, droplet in list(self._client.store.items()):
+            if tag_name in droplet["tags"]:
+                del self._client.store[droplet_id]
+
+
+class _FakeTags:
+    def __init__(self, client: "FakeDOClient"):
+        self._client = client
+
+    def create(self, *, body):
+        _sleep(self._client.latency)
+        return {"tag": {"name": body["name"]}}
+
+    def assign_resources(self, *, tag_id, body):
+        _sleep(self._client.latency)
+        for resource in body["resources"]:
+            self._client.store[int(resource["resource_id"])]["tags"].append(tag_id)
+
+
+class FakeDOClient:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        # { droplet_id: droplet }
+        self.store: dict[int, dict] = {}
+        self._ids = itertools.count(1)
+        self.droplets = _FakeDroplets(self)
+        self.tags = _FakeTags(self)
+
+    def add_droplet(self, name: str, tags: list[str]) -> dict:
+        droplet = make_droplet(next(self._ids), name, tags)
+        self.store[droplet["id"]] = droplet
+        return droplet
+
+    def seed(self, env_tag: str, wkids: list[UUID]):
+        for wkid in wkids:
+            self.add_droplet(f"existing-{wkid.int}", [env_tag, f"wkid:{wkid}"])
+
+
+class _FakeZones:
+    def __init__(self, client: "FakeCloudflareClient"):
+        self._client = client
+
+    def list(self, *, name):
+        _sleep(self._client.latency)
+        zone_id = self._client.zone_ids.get(name)
+        zones = [SimpleNamespace(id=zone_id, name=name)] if zone_id else []
+        return SimpleNamespace(result=zones)
+
+
+class _FakeRecords:
+    def __init__(self, client: "FakeCloudflareClient"):
+        self._client = client
+
+    def list(self, *, zone_id, per_page=100, page=1, name=None, type=None):
+        _sleep(self._client.latency)
+        records = list(self._client.records[zone_id].values())
+        if name is not None:
+            records = [r for r in records if r.name == name["exact"]]
+        if type is not None:
+            records = [r for r in records if r.type == type]
+        start = (page - 1) * per_page
+        total_pages = max(1, -(-len(records) // per_page))
+        return SimpleNamespace(
+            result=records[start : start + per_page],
+            result_info=SimpleNamespace(total_pages=total_pages),
+        )
+
+    def batch(self, *, zone_id, deletes=(), patches=(), posts=(), puts=()):
+        _sleep(self._client.latency)
+        zone = self._client.records[zone_id]
+        for delete in deletes:
+            del zone[delete["id"]]
+        for patch in patches:
+            record = zone[patch["id"]]
+            for key in ("content", "proxied", "ttl"):
+                if key in patch:
+                    setattr(record, key, patch[key])
+        for post in posts:
+            self._client.add_record(zone_id, **post)
+
+    def update(self, *, dns_record_id, zone_id, **data):
+        self.batch(zone_id=zone_id, patches=[{"id": dns_record_id, **data}])
+
+    def create(self, *, zone_id, **data):
+        self.batch(zone_id=zone_id, posts=[data])
+
+    def delete(self, *, dns_record_id, zone_id):
+        self.batch(zone_id=zone_id, deletes=[{"id": dns_record_id}])
+
+
+class FakeCloudflareClient:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.zone_ids: dict[str, str] = {}
+        self.zone_names: dict[str, str] = {}
+        # { zone_id: { record_id: record } }
+        self.records: dict[str, dict[str, SimpleNamespace]] = {}
+        self._ids = itertools.count(1)
+        self.zones = _FakeZones(self)
+        self.dns = SimpleNamespace(records=_FakeRecords(self))
+
+    def add_zone(self, name: str) -> str:
+        zone_id = f"{len(self.zone_ids) + 1:032x}"
+        self.zone_ids[name] = zone_id
+        self.zone_names[zone_id] = name
+        self.records[zone_id] = {}
+        return zone_id
+
+    def add_record(self, zone_id, *, name, type, content, proxied=False, ttl=1):
+        zone_name = self.zone_names[zone_id]
+        if name in ("@", zone_name):
+            fqdn = zone_name
+        elif name.endswith(f".{zone_name}"):
+            fqdn = name
+        else:
+            fqdn = f"{name}.{zone_name}"
+        record_id = f"{next(self._ids):032x}"
+        self.records[zone_id][record_id] = SimpleNamespace(
+            id=record_id, name=fqdn, type=type, content=content, proxied=proxied, ttl=ttl
+        )
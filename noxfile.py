@@ -62,3 +62,10 @@ def tests_with_coverage(session: nox.Session) -> None:
         *pytest_args,
         *session.posargs,
     )
+
+
+@nox.session(python=LATEST_PY)
+def benchmarks(session: nox.Session) -> None:
+    _install_deps(session)
+
+    session.run("python", "-m", "benchmarks.bench_apply", *session.posargs)
@@ -0,0 +1,107 @@
+# Cache slow API lookups on disk, so that consecutive runs of DODO's entry points can
+# skip them. Entries are JSON files under `<cache dir>/<kind>/`, one per key, stamped
+# with the time they were stored. An entry older than its kind's TTL is a miss.
+#
+# Cloudflare zone IDs practically never change so are kept for weeks, while Droplet
+# inventories are kept for a minute & dropped whenever DODO creates or destroys
+# Droplets. Entries are not scoped to an account: use one cache dir per set of tokens.
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+ZONE_ID = "zone_id"
+INVENTORY = "inventory"
+# seconds an entry of each kind is fresh for
+DEFAULT_TTLS: Mapping[str, float] = {
+    ZONE_ID: 30 * 24 * 60 * 60,
+    INVENTORY: 60,
+}
+CACHE_DIR_ENV_VAR = "DODO__CACHE_DIR"
+
+
+@dataclass
+class DiskCache:
+    directory: Path
+    ttls: Mapping[str, float] = field(default_factory=lambda: dict(DEFAULT_TTLS))
+    clock: Callable[[], float] = time.time
+
+    def _path(self, kind: str, key: str) -> Path:
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return self.directory / kind / f"{digest}.json"
+
+    def get(self, kind: str, key: str) -> Any | None:
+        """Return the value stored for `key`, or `None` if there is none or it expired."""
+        try:
+            entry = json.loads(self._path(kind, key).read_text())
+        except (OSError, ValueError):
+            return None
+        age = self.clock() - entry.get("stored_at", 0)
+        if entry.get("key") != key or not 0 <= age < self.ttls.get(kind, 0):
+            return None
+        return entry["value"]
+
+    def set(self, kind: str, key: str, value: Any) -> None:
+        """Store `value`, atomically replacing any previous entry for `key`."""
+        path = self._path(kind, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"key": key, "stored_at": self.clock(), "value": value}
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def invalidate(self, kind: str, key: str) -> None:
+        self._path(kind, key).unlink(missing_ok=True)
+
+
+def _kind_ttl(string: str) -> tuple[str, float]:
+    kind, sep, seconds = string.partition("=")
+    if not sep or kind not in DEFAULT_TTLS:
+        kinds = ", ".join(DEFAULT_TTLS)
+        raise argparse.ArgumentTypeError(f"expected KIND=SECONDS, KIND one of: {kinds}")
+    try:
+        return kind, float(seconds)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"invalid number of seconds: {seconds}"
+        ) from None
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=os.getenv(CACHE_DIR_ENV_VAR) or None,
+        help="Cache zone IDs & Droplet inventories in this directory between runs "
+        f"(default: ${CACHE_DIR_ENV_VAR}, or no cache)",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=_kind_ttl,
+        action="append",
+        default=[],
+        metavar="KIND=SECONDS",
+        help="How long cached entries of a kind stay fresh. May be supplied multiple "
+        "times. Defaults: "
+        + ", ".join(f"{kind}={int(ttl)}" for kind, ttl in DEFAULT_TTLS.items()),
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Neither read nor write the cache, even if a cache dir is set",
+    )
+
+
+def cache_from_args(args: argparse.Namespace) -> DiskCache | None:
+    """Build the cache configured by `add_cache_arguments()`, or `None` if disabled."""
+    if args.no_cache or args.cache_dir is None:
+        return None
+    return DiskCache(args.cache_dir, ttls={**DEFAULT_TTLS, **dict(args.cache_ttl)})
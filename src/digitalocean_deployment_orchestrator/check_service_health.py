@@ -9,6 +9,12 @@ from typing import Literal
 
 from pydo import Client as DO_Client
 
+from digitalocean_deployment_orchestrator.cache import (
+    add_cache_arguments,
+    cache_from_args,
+)
+from digitalocean_deployment_orchestrator.clients import make_do_client
+from digitalocean_deployment_orchestrator.inventory import EnvironmentInventory
 from digitalocean_deployment_orchestrator.list_droplet_IPs import get_droplet_ips_for_env
 from digitalocean_deployment_orchestrator.types import Environment
 from digitalocean_deployment_orchestrator.types_DO import DigitalOceanCredentials
@@ -56,9 +62,14 @@ def service_is_healthy(
     return False
 
 
-def main(*, do_client: DO_Client, env: Environment):
+def main(
+    *,
+    do_client: DO_Client,
+    env: Environment,
+    inventory: EnvironmentInventory | None = None,
+):
     unhealthy_services = []
-    for ip in get_droplet_ips_for_env(do_client, env).values():
+    for ip in get_droplet_ips_for_env(do_client, env, inventory=inventory).values():
         try:
             if service_is_healthy(ip=ip):
                 LOG.info("service '%s' is healthy", ip)
@@ -88,9 +99,13 @@ if __name__ == "__main__":
         choices=list(Environment),
         help="Environment to run against",
     )
+    add_cache_arguments(parser)
     args = parser.parse_args()
     env = args.env
 
     do_creds = DigitalOceanCredentials.from_env()
-    do_client = DO_Client(do_creds.digitalocean__token)
-    main(do_client=do_client, env=env)
+    do_client = make_do_client(do_creds.digitalocean__token)
+    inventory = None
+    if (cache := cache_from_args(args)) is not None:
+        inventory = EnvironmentInventory.fetch(do_client, env, cache=cache)
+    main(do_client=do_client, env=env, inventory=inventory)
@@ -0,0 +1,485 @@
+# Build Digital Ocean & Cloudflare SDK clients that share a rate-limit aware scheduler.
+#
+# Every request made through these clients first takes a token from its provider's
+# bucket, then reports the response back so that the bucket follows the provider's own
+# view of the budget. Requests that hit a rate limit, or idempotent requests that fail
+# transiently, are retried with jittered exponential backoff.
+#
+# pydo is built on azure-core, so the scheduler is installed as its retry policy.
+# The Cloudflare SDK is built on httpx, so the scheduler wraps its transport. The same
+# layer times each request for `metrics.ApiMetrics`.
+
+import asyncio
+import os
+import random
+import threading
+import time
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass, field
+
+import httpx
+import structlog
+from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+from azure.core.pipeline import PipelineRequest, PipelineResponse
+from azure.core.pipeline.policies import AsyncHTTPPolicy, HeadersPolicy, HTTPPolicy
+from azure.core.pipeline.transport import RequestsTransport
+from cloudflare import (
+    AsyncCloudflare,
+    Cloudflare,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+)
+from pydo import Client as DO_Client
+from pydo.aio import Client as AsyncDO_Client
+from requests import Session  # type: ignore[import-untyped]
+from requests.adapters import HTTPAdapter  # type: ignore[import-untyped]
+
+from digitalocean_deployment_orchestrator.metrics import (
+    ApiCall,
+    ApiMetrics,
+    operation_name,
+)
+
+LOGGER = structlog.get_logger()
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+TRANSIENT_STATUS_CODES = frozenset({500, 502, 503, 504})
+DEFAULT_POOL_SIZE = 32
+# point the clients at another server, eg. `benchmarks/fake_api.py`, instead
+DO_API_URL_ENV_VAR = "DIGITALOCEAN__API_URL"
+CLOUDFLARE_API_URL_ENV_VAR = "CLOUDFLARE__API_URL"
+
+
+@dataclass
+class RequestScheduler:
+    """Rate limit budget & retry decisions for one provider's API.
+
+    The scheduler does no I/O itself: `reserve()` says how long to wait before sending
+    a request, `observe()` takes in the response & `retry_delay()` decides whether to
+    send it again. It is safe to share between threads.
+
+    Args:
+      provider: name used in log events, eg. 'digitalocean'.
+      rate: requests per second the bucket refills at.
+      burst: the most requests that may be sent back to back.
+    """
+
+    provider: str
+    rate: float
+    burst: int
+    max_retries: int = 5
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+    clock: Callable[[], float] = time.monotonic
+    wall_clock: Callable[[], float] = time.time
+    jitter: Callable[[], float] = random.random
+    _tokens: float = field(init=False)
+    _updated_at: float = field(init=False)
+    _blocked_until: float = field(init=False, default=0.0)
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock)
+
+    def __post_init__(self):
+        self._tokens = float(self.burst)
+        self._updated_at = self.clock()
+
+    @classmethod
+    def for_digitalocean(cls) -> "RequestScheduler":
+        # <https://docs.digitalocean.com/reference/api/digitalocean/#section/Introduction/Rate-Limit>
+        # 5,000 requests per hour, and at most 250 in any minute
+        return cls("digitalocean", rate=5000 / 3600, burst=100)
+
+    @classmethod
+    def for_cloudflare(cls) -> "RequestScheduler":
+        # <https://developers.cloudflare.com/fundamentals/api/reference/limits/>
+        # 1,200 requests per five minutes
+        return cls("cloudflare", rate=1200 / 300, burst=100)
+
+    def reserve(self) -> float:
+        """Take a token, returning the number of seconds to wait before using it."""
+        with self._lock:
+            now = self.clock()
+            elapsed = now - self._updated_at
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated_at = now
+            # tokens may go negative, queueing callers behind each other
+            self._tokens -= 1
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            return max(wait, self._blocked_until - now)
+
+    def observe(self, status: int, headers: Mapping[str, str]) -> None:
+        """Follow the budget reported by the provider in a response's headers."""
+        with self._lock:
+            remaining = _parse_float(headers.get("ratelimit-remaining"))
+            if remaining is not None:
+                self._tokens = min(self._tokens, remaining)
+                if remaining < 1:
+                    self._block_for(self._seconds_until_reset(headers))
+            if status == 429:
+                self._tokens = min(self._tokens, 0)
+                self._block_for(self._retry_after(headers))
+
+    def retry_delay(
+        self,
+        method: str,
+        status: int | None,
+        headers: Mapping[str, str],
+        attempt: int,
+    ) -> float | None:
+        """Seconds to wait before retrying a request, or `None` not to retry.
+
+        `status` is `None` if no response was received. Rate limited requests were not
+        processed so are always retried; other failures only for idempotent methods.
+        """
+        if attempt >= self.max_retries:
+            return None
+        if status == 429:
+            return max(self._backoff(attempt), self._retry_after(headers))
+        if status is None or status in TRANSIENT_STATUS_CODES:
+            if method.upper() in IDEMPOTENT_METHODS:
+                return self._backoff(attempt)
+        return None
+
+    def _backoff(self, attempt: int) -> float:
+        # "full jitter" <https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/>
+        return self.jitter() * min(self.backoff_max, self.backoff_base * 2**attempt)
+
+    def _retry_after(self, headers: Mapping[str, str]) -> float:
+        retry_after = _parse_float(headers.get("retry-after"))
+        if retry_after is not None:
+            return retry_after
+        return self._seconds_until_reset(headers)
+
+    def _seconds_until_reset(self, headers: Mapping[str, str]) -> float:
+        # Digital Ocean reports the epoch time at which the oldest request expires
+        reset = _parse_float(headers.get("ratelimit-reset"))
+        if reset is None:
+            return 0.0
+        return max(0.0, reset - self.wall_clock())
+
+    def _block_for(self, seconds: float) -> None:
+        self._blocked_until = max(self._blocked_until, self.clock() + seconds)
+
+
+def _parse_float(value: str | None) -> float | None:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _log_retry(scheduler: RequestScheduler, method: str, status, attempt, delay):
+    LOGGER.warning(
+        "Retrying API request",
+        provider=scheduler.provider,
+        method=method,
+        status=status,
+        attempt=attempt + 1,
+        delay=round(delay, 3),
+    )
+
+
+class _CallTimer:
+    """Times one API call, including waits & retries, and records it to `metrics`."""
+
+    def __init__(self, metrics: ApiMetrics | None, provider: str, method: str, url: str):
+        self.metrics = metrics
+        self.provider = provider
+        self.method = method
+        self.url = url
+        self.status: int | None = None
+        self.retries = 0
+        self._started = time.perf_counter()
+
+    def __enter__(self) -> "_CallTimer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self.metrics is None:
+            return
+        self.metrics.record(
+            ApiCall(
+                provider=self.provider,
+                operation=operation_name(self.method, self.url),
+                duration=time.perf_counter() - self._started,
+                status=self.status,
+                retries=self.retries,
+            )
+        )
+
+
+class RateLimitPolicy(HTTPPolicy):
+    """azure-core pipeline policy scheduling pydo requests, in place of its retries."""
+
+    def __init__(self, scheduler: RequestScheduler, metrics: ApiMetrics | None = None):
+        super().__init__()
+        self.scheduler = scheduler
+        self.metrics = metrics
+
+    def send(self, request: PipelineRequest) -> PipelineResponse:
+        method = request.http_request.method
+        url = request.http_request.url
+        with _CallTimer(self.metrics, self.scheduler.provider, method, url) as call:
+            headers: Mapping[str, str] = {}
+            while True:
+                time.sleep(self.scheduler.reserve())
+                try:
+                    response = self.next.send(request)
+                except (ServiceRequestError, ServiceResponseError):
+                    call.status, headers = None, {}
+                    delay = self.scheduler.retry_delay(
+                        method, call.status, headers, call.retries
+                    )
+                    if delay is None:
+                        raise
+                else:
+                    call.status = response.http_response.status_code
+                    headers = response.http_response.headers
+                    self.scheduler.observe(call.status, headers)
+                    delay = self.scheduler.retry_delay(
+                        method, call.status, headers, call.retries
+                    )
+                    if delay is None:
+                        return response
+                _log_retry(self.scheduler, method, call.status, call.retries, delay)
+                time.sleep(delay)
+                call.retries += 1
+
+
+class AsyncRateLimitPolicy(AsyncHTTPPolicy):
+    """Like `RateLimitPolicy`, for `pydo.aio` clients."""
+
+    def __init__(self, scheduler: RequestScheduler, metrics: ApiMetrics | None = None):
+        super().__init__()
+        self.scheduler = scheduler
+        self.metrics = metrics
+
+    async def send(self, request: PipelineRequest) -> PipelineResponse:
+        method = request.http_request.method
+        url = request.http_request.url
+        with _CallTimer(self.metrics, self.scheduler.provider, method, url) as call:
+            headers: Mapping[str, str] = {}
+            while True:
+                await asyncio.sleep(self.scheduler.reserve())
+                try:
+                    response = await self.next.send(request)
+                except (ServiceRequestError, ServiceResponseError):
+                    call.status, headers = None, {}
+                    delay = self.scheduler.retry_delay(
+                        method, call.status, headers, call.retries
+                    )
+                    if delay is None:
+                        raise
+                else:
+                    call.status = response.http_response.status_code
+                    headers = response.http_response.headers
+                    self.scheduler.observe(call.status, headers)
+                    delay = self.scheduler.retry_delay(
+                        method, call.status, headers, call.retries
+                    )
+                    if delay is None:
+                        return response
+                _log_retry(self.scheduler, method, call.status, call.retries, delay)
+                await asyncio.sleep(delay)
+                call.retries += 1
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """httpx transport scheduling Cloudflare SDK requests, in place of its retries."""
+
+    def __init__(
+        self,
+        scheduler: RequestScheduler,
+        transport: httpx.BaseTransport | None = None,
+        metrics: ApiMetrics | None = None,
+    ):
+        self.scheduler = scheduler
+        self.metrics = metrics
+        self._transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        method, url = request.method, str(request.url)
+        with _CallTimer(self.metrics, self.scheduler.provider, method, url) as call:
+            headers: Mapping[str, str] = {}
+            while True:
+                time.sleep(self.scheduler.reserve())
+                try:
+                    response = self._transport.handle_request(request)
+                except httpx.TransportError:
+                    call.status, headers = None, {}
+                    delay = self.scheduler.retry_delay(
+                        method, call.status, headers, call.retries
+                    )
+                    if delay is None:
+                        raise
+                else:
+                    call.status, headers = response.status_code, response.headers
+                    self.scheduler.observe(call.status, headers)
+                    delay = self.scheduler.retry_delay(
+                        method, call.status, headers, call.retries
+                    )
+                    if delay is None:
+                        return response
+                    response.close()
+                _log_retry(self.scheduler, method, call.status, call.retries, delay)
+                time.sleep(delay)
+                call.retries += 1
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Like `RateLimitedTransport`, for `AsyncCloudflare` clients."""
+
+    def __init__(
+        self,
+        scheduler: RequestScheduler,
+        transport: httpx.AsyncBaseTransport | None = None,
+        metrics: ApiMetrics | None = None,
+    ):
+        self.scheduler = scheduler
+        self.metrics = metrics
+        self._transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        method, url = request.method, str(request.url)
+        with _CallTimer(self.metrics, self.scheduler.provider, method, url) as call:
+            headers: Mapping[str, str] = {}
+            while True:
+                await asyncio.sleep(self.scheduler.reserve())
+                try:
+                    response = await self._transport.handle_async_request(request)
+                except httpx.TransportError:
+                    call.status, headers = None, {}
+                    delay = self.scheduler.retry_delay(
+                        method, call.status, headers, call.retries
+                    )
+                    if delay is None:
+                        raise
+                else:
+                    call.status, headers = response.status_code, response.headers
+                    self.scheduler.observe(call.status, headers)
+                    delay = self.scheduler.retry_delay(
+                        method, call.status, headers, call.retries
+                    )
+                    if delay is None:
+                        return response
+                    await response.aclose()
+                _log_retry(self.scheduler, method, call.status, call.retries, delay)
+                await asyncio.sleep(delay)
+                call.retries += 1
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def _with_api_url(kwargs: dict, key: str, env_var: str) -> dict:
+    if api_url := os.getenv(env_var):
+        kwargs.setdefault(key, api_url)
+    return kwargs
+
+
+def _do_client_kwargs(token: str, kwargs: dict) -> dict:
+    kwargs = _with_api_url(kwargs, "endpoint", DO_API_URL_ENV_VAR)
+    if kwargs.get("endpoint", "").startswith("http://"):
+        # azure-core refuses to send bearer tokens over plain HTTP, which is how a local
+        # stand-in for the API is served
+        kwargs.setdefault(
+            "authentication_policy",
+            HeadersPolicy({"Authorization": f"Bearer {token}"}),
+        )
+    return kwargs
+
+
+def make_do_client(
+    token: str,
+    *,
+    scheduler: RequestScheduler | None = None,
+    metrics: ApiMetrics | None = None,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    **kwargs,
+) -> DO_Client:
+    """Build a pydo client whose requests go through `scheduler`.
+
+    Connections are pooled so that concurrent operations reuse them. If `metrics` is
+    given, every request is recorded to it. Requests go to `$DIGITALOCEAN__API_URL`
+    if it is set, unless `endpoint` is passed.
+    """
+    session = Session()
+    adapter = HTTPAdapter(pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return DO_Client(
+        token,
+        retry_policy=RateLimitPolicy(
+            scheduler or RequestScheduler.for_digitalocean(), metrics
+        ),
+        transport=RequestsTransport(session=session, session_owner=True),
+        **_do_client_kwargs(token, kwargs),
+    )
+
+
+def make_async_do_client(
+    token: str,
+    *,
+    scheduler: RequestScheduler | None = None,
+    metrics: ApiMetrics | None = None,
+    **kwargs,
+) -> AsyncDO_Client:
+    """Like `make_do_client()`, for a `pydo.aio` client."""
+    return AsyncDO_Client(
+        token,
+        retry_policy=AsyncRateLimitPolicy(
+            scheduler or RequestScheduler.for_digitalocean(), metrics
+        ),
+        **_do_client_kwargs(token, kwargs),
+    )
+
+
+def make_cloudflare_client(
+    token: str,
+    *,
+    scheduler: RequestScheduler | None = None,
+    metrics: ApiMetrics | None = None,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    **kwargs,
+) -> Cloudflare:
+    """Build a Cloudflare client whose requests go through `scheduler`.
+
+    Requests go to `$CLOUDFLARE__API_URL` if it is set, unless `base_url` is passed.
+    """
+    transport = RateLimitedTransport(
+        scheduler or RequestScheduler.for_cloudflare(),
+        httpx.HTTPTransport(limits=httpx.Limits(max_connections=pool_size)),
+        metrics,
+    )
+    return Cloudflare(
+        api_token=token,
+        http_client=DefaultHttpxClient(transport=transport),
+        max_retries=0,
+        **_with_api_url(kwargs, "base_url", CLOUDFLARE_API_URL_ENV_VAR),
+    )
+
+
+def make_async_cloudflare_client(
+    token: str,
+    *,
+    scheduler: RequestScheduler | None = None,
+    metrics: ApiMetrics | None = None,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    **kwargs,
+) -> AsyncCloudflare:
+    """Like `make_cloudflare_client()`, for an `AsyncCloudflare` client."""
+    transport = AsyncRateLimitedTransport(
+        scheduler or RequestScheduler.for_cloudflare(),
+        httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=pool_size)),
+        metrics,
+    )
+    return AsyncCloudflare(
+        api_token=token,
+        http_client=DefaultAsyncHttpxClient(transport=transport),
+        max_retries=0,
+        **_with_api_url(kwargs, "base_url", CLOUDFLARE_API_URL_ENV_VAR),
+    )
@@ -0,0 +1,210 @@
+# Run actions on existing Droplets, eg. power off or snapshot, & wait for them to end.
+#
+# <https://docs.digitalocean.com/reference/api/digitalocean/#tag/Droplet-Actions>
+
+import asyncio
+import time
+
+import structlog
+from pydo import Client as DO_Client
+from pydo.aio import Client as AsyncDO_Client
+
+from digitalocean_deployment_orchestrator.inventory import DO_MAX_PER_PAGE
+from digitalocean_deployment_orchestrator.types_DO import ActionResponse
+
+LOGGER = structlog.get_logger()
+
+# seconds to wait for an action to finish, & between checks while waiting. Snapshots
+# & resizes copy the Droplet's disk so may take several minutes.
+DEFAULT_ACTION_TIMEOUT = 1800.0
+ACTION_POLL_INTERVAL = 5.0
+
+
+def run_action(
+    do_client: DO_Client,
+    droplet_id: int,
+    action_type: str,
+    *,
+    timeout: float = DEFAULT_ACTION_TIMEOUT,
+    poll_interval: float | None = None,
+    **params,
+) -> ActionResponse:
+    """Start an action on a Droplet & wait until it has completed.
+
+    Args:
+      action_type: eg. "power_off", see the API reference for every type.
+      params: Sent alongside the type, eg. `name` for a "snapshot".
+
+    Raises:
+      RuntimeError: If the action errored or did not finish within `timeout` seconds.
+    """
+    if poll_interval is None:
+        poll_interval = ACTION_POLL_INTERVAL
+    started = time.monotonic()
+    action: ActionResponse = do_client.droplet_actions.post(
+        droplet_id=droplet_id, body={"type": action_type, **params}
+    )["action"]
+    LOGGER.info(
+        "Started Droplet action", id=droplet_id, type=action_type, action_id=action["id"]
+    )
+
+    while action["status"] == "in-progress":
+        remaining = started + timeout - time.monotonic()
+        if remaining <= 0:
+            raise RuntimeError(
+                f"Droplet {droplet_id} {action_type} did not finish within {timeout}s"
+            )
+        time.sleep(min(poll_interval, remaining))
+        action = do_client.droplet_actions.get(
+            droplet_id=droplet_id, action_id=action["id"]
+        )["action"]
+
+    _check_action(droplet_id, action, started)
+    return action
+
+
+def _check_action(droplet_id: int, action: ActionResponse, started: float) -> None:
+    if action["status"] != "completed":
+        raise RuntimeError(f"Droplet {droplet_id} {action['type']} {action['status']}")
+    LOGGER.info(
+        "Finished Droplet action",
+        id=droplet_id,
+        type=action["type"],
+        waited=round(time.monotonic() - started, 1),
+    )
+
+
+async def run_action_async(
+    do_client: AsyncDO_Client,
+    droplet_id: int,
+    action_type: str,
+    *,
+    timeout: float = DEFAULT_ACTION_TIMEOUT,
+    poll_interval: float | None = None,
+    **params,
+) -> ActionResponse:
+    """See `run_action()`."""
+    if poll_interval is None:
+        poll_interval = ACTION_POLL_INTERVAL
+    started = time.monotonic()
+    action: ActionResponse = (
+        await do_client.droplet_actions.post(
+            droplet_id=droplet_id, body={"type": action_type, **params}
+        )
+    )["action"]
+    LOGGER.info(
+        "Started Droplet action", id=droplet_id, type=action_type, action_id=action["id"]
+    )
+
+    while action["status"] == "in-progress":
+        remaining = started + timeout - time.monotonic()
+        if remaining <= 0:
+            raise RuntimeError(
+                f"Droplet {droplet_id} {action_type} did not finish within {timeout}s"
+            )
+        await asyncio.sleep(min(poll_interval, remaining))
+        action = (
+            await do_client.droplet_actions.get(
+                droplet_id=droplet_id, action_id=action["id"]
+            )
+        )["action"]
+
+    _check_action(droplet_id, action, started)
+    return action
+
+
+def power_off(
+    do_client: DO_Client, droplet_id: int, *, timeout: float = DEFAULT_ACTION_TIMEOUT
+) -> None:
+    """Shut a Droplet down gracefully, cutting its power if that fails."""
+    try:
+        run_action(do_client, droplet_id, "shutdown", timeout=timeout)
+    except Exception as err:
+        LOGGER.warning(
+            "Droplet did not shut down, powering off", id=droplet_id, err=str(err)
+        )
+        run_action(do_client, droplet_id, "power_off", timeout=timeout)
+
+
+async def power_off_async(
+    do_client: AsyncDO_Client,
+    droplet_id: int,
+    *,
+    timeout: float = DEFAULT_ACTION_TIMEOUT,
+) -> None:
+    """See `power_off()`."""
+    try:
+        await run_action_async(do_client, droplet_id, "shutdown", timeout=timeout)
+    except Exception as err:
+        LOGGER.warning(
+            "Droplet did not shut down, powering off", id=droplet_id, err=str(err)
+        )
+        await run_action_async(do_client, droplet_id, "power_off", timeout=timeout)
+
+
+def power_on(
+    do_client: DO_Client, droplet_id: int, *, timeout: float = DEFAULT_ACTION_TIMEOUT
+) -> None:
+    run_action(do_client, droplet_id, "power_on", timeout=timeout)
+
+
+def resize(
+    do_client: DO_Client,
+    droplet_id: int,
+    size: str,
+    *,
+    is_powered_on: bool = True,
+    timeout: float = DEFAULT_ACTION_TIMEOUT,
+) -> None:
+    """Resize a Droplet's CPU & memory, powering it off for the duration.
+
+    The disk is left as it is, so that the Droplet may later be resized down again. A
+    Droplet that was powered on is powered back on even if the resize failed.
+    """
+    if is_powered_on:
+        power_off(do_client, droplet_id, timeout=timeout)
+    try:
+        run_action(
+            do_client, droplet_id, "resize", timeout=timeout, size=size, disk=False
+        )
+    finally:
+        if is_powered_on:
+            power_on(do_client, droplet_id, timeout=timeout)
+
+
+async def resize_async(
+    do_client: AsyncDO_Client,
+    droplet_id: int,
+    size: str,
+    *,
+    is_powered_on: bool = True,
+    timeout: float = DEFAULT_ACTION_TIMEOUT,
+) -> None:
+    """See `resize()`."""
+    if is_powered_on:
+        await power_off_async(do_client, droplet_id, timeout=timeout)
+    try:
+        await run_action_async(
+            do_client, droplet_id, "resize", timeout=timeout, size=size, disk=False
+        )
+    finally:
+        if is_powered_on:
+            await run_action_async(do_client, droplet_id, "power_on", timeout=timeout)
+
+
+def snapshot(
+    do_client: DO_Client,
+    droplet_id: int,
+    name: str,
+    *,
+    timeout: float = DEFAULT_ACTION_TIMEOUT,
+) -> int:
+    """Snapshot a Droplet, ideally powered off, & return the new snapshot's image ID."""
+    run_action(do_client, droplet_id, "snapshot", timeout=timeout, name=name)
+    res = do_client.droplets.list_snapshots(
+        droplet_id=droplet_id, per_page=DO_MAX_PER_PAGE
+    )
+    snapshots = [s for s in res["snapshots"] if s["name"] == name]
+    if not snapshots:
+        raise RuntimeError(f"Snapshot '{name}' of Droplet {droplet_id} not found")
+    return max(snapshots, key=lambda s: s["created_at"])["id"]
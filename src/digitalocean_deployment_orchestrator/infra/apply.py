@@ -1,32 +1,61 @@
 import argparse
-import copy
-import json
+import asyncio
+import contextlib
+import dataclasses
+import functools
+import itertools
 import pprint
-from collections.abc import Mapping
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
 from pathlib import Path
+from typing import Any
 from uuid import UUID
 
 import structlog
-from cloudflare import Cloudflare
-from cloudflare.types.dns import (
-    AAAARecord,
-    ARecord,
-    CNAMERecord,
-    MXRecord,
-    NSRecord,
-    PTRRecord,
-    SRVRecordParam,
-    TXTRecord,
-)
+from cloudflare import Cloudflare, NotFoundError, PermissionDeniedError
+from cloudflare.types.dns import RecordResponse
 from cloudflare.types.zones.zone import Zone
 from pydo import Client as DO_Client
 
+from digitalocean_deployment_orchestrator.cache import (
+    ZONE_ID,
+    DiskCache,
+    add_cache_arguments,
+    cache_from_args,
+)
+from digitalocean_deployment_orchestrator.clients import (
+    make_cloudflare_client,
+    make_do_client,
+)
+from digitalocean_deployment_orchestrator.droplet_actions import resize
+from digitalocean_deployment_orchestrator.infra.phone_home import (
+    DEFAULT_PHONE_HOME_TIMEOUT,
+    PHONE_HOME_URL,
+    PhoneHomeListener,
+    expect_phone_home,
+    wait_for_phone_home,
+)
 from digitalocean_deployment_orchestrator.infra.types import (
-    EnvironmentBlueprint,
+    DropletPlan,
+    DropletSpec,
+    EnvironmentSpec,
+    Operation,
+    OperationResult,
+)
+from digitalocean_deployment_orchestrator.infra.utils import (
+    DEFAULT_MAX_PARALLEL,
+    DEFAULT_MAX_PARALLEL_RESIZES,
+    find_blueprint_environment,
+    import_module_from_path,
+    run_operations,
+)
+from digitalocean_deployment_orchestrator.inventory import (
+    DEFAULT_READY_TIMEOUT,
+    DO_MAX_PER_PAGE,
+    EnvironmentInventory,
 )
-from digitalocean_deployment_orchestrator.infra.utils import import_module_from_path
 from digitalocean_deployment_orchestrator.list_droplet_IPs import get_droplet_ips_for_env
 from digitalocean_deployment_orchestrator.logging import configure_logging
+from digitalocean_deployment_orchestrator.metrics import ApiMetrics
 from digitalocean_deployment_orchestrator.types import Environment
 from digitalocean_deployment_orchestrator.types_cloudflare import (
     CloudflareCredentials,
@@ -35,34 +64,33 @@ from digitalocean_deployment_orchestrator.types_cloudflare import (
 from digitalocean_deployment_orchestrator.types_DO import (
     DigitalOceanCredentials,
     DropletCreateResponse,
-    DropletListResponse,
-    DropletRequest,
+    DropletMultiCreateResponse,
     DropletResponse,
+    SnapshotImage,
 )
 from digitalocean_deployment_orchestrator.utils import (
+    get_spec_tag_from_tags,
     get_wkid_from_tags,
 )
 
 LOGGER = structlog.get_logger()
 configure_logging()
 
+# <https://developers.cloudflare.com/dns/manage-dns-records/how-to/batch-record-changes/>
+CF_MAX_BATCH_SIZE = 200
+# <https://developers.cloudflare.com/api/resources/dns/subresources/records/methods/list/>
+CF_MAX_RECORDS_PER_PAGE = 5000
+# <https://docs.digitalocean.com/reference/api/digitalocean/#tag/Droplets/operation/droplets_create>
+DO_MAX_NAMES_PER_CREATE = 10
 
-def load_environment_blueprint(
-    blueprints_dir: Path, env: Environment
-) -> EnvironmentBlueprint:
-    """Load the blueprint for a given environment and ensure resources are tagged."""
 
-    def _tag_resources(blueprint: EnvironmentBlueprint) -> EnvironmentBlueprint:
-        bp = copy.deepcopy(blueprint)
-        bp_env = bp["environment"]
+def load_environment_blueprint(blueprints_dir: Path, env: Environment) -> EnvironmentSpec:
+    """Load the blueprint for a given environment as an immutable `EnvironmentSpec`.
 
-        droplets = bp["droplets"]
-        for d in droplets:
-            env_tag = f"env:{bp_env.value}"
-            wkid_tag = f"wkid:{d['well_known_uuid']}"
-            d["tags"].extend([env_tag, wkid_tag])
+    Resources are tagged with their environment & wkid by `DropletSpec.tags`.
 
-        return bp
+    Only modules that may define `env` are imported, see `find_blueprint_environment`.
+    """
 
     env_blueprints = []
 
@@ -74,6 +102,10 @@ def load_environment_blueprint(
         ):
             continue
 
+        static_env = find_blueprint_environment(module_path)
+        if static_env is not None and static_env != env:
+            continue
+
         module = import_module_from_path(module_path)
 
         if not hasattr(module, "BLUEPRINT"):
@@ -100,81 +132,108 @@ def load_environment_blueprint(
     if len(env_blueprints) != 1:
         raise ValueError(f"Multiple blueprints found for env:{env.value}")
 
-    bp = _tag_resources(env_blueprints[0])
-    return bp
+    return EnvironmentSpec.from_blueprint(env_blueprints[0])
 
 
-def manage_droplets(
+def _log_operations_summary(event: str, results: list[OperationResult]):
+    failed = [r for r in results if not r.ok]
+    LOGGER.info(
+        event,
+        succeeded=len(results) - len(failed),
+        failed=len(failed),
+        errors=[{"kind": r.kind, "target": r.target, "err": r.error} for r in failed],
+    )
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(results)} operation(s) failed")
+
+
+def _spec_tag_at_size(droplet_spec: DropletSpec, size: str | None) -> str:
+    """The `spec:` tag `droplet_spec` would have at `size`, eg. before a resize."""
+    if not size or size == str(droplet_spec.size):
+        return droplet_spec.spec_tag
+    return dataclasses.replace(droplet_spec, size=size).spec_tag
+
+
+def _spec_drift(
+    actual_droplets: Iterable[DropletResponse], blueprint_droplets: Iterable[DropletSpec]
+) -> tuple[list[tuple[DropletResponse, DropletSpec]], list[DropletResponse]]:
+    """Find existing Droplets that no longer match their spec.
+
+    A Droplet whose `spec:` tag matches its spec's is up to date without comparing any
+    further. Otherwise it is paired with its spec to be resized if its size differs, and
+    counts as drifted if its tag differs in anything other than size, which `apply`
+    cannot change in place. Droplets created without a `spec:` tag can only be compared
+    by size.
+
+    Returns:
+      The Droplets to resize, and the Droplets that have drifted.
+    """
+    specs = {d.well_known_uuid: d for d in blueprint_droplets}
+    to_resize, drifted = [], []
+    for droplet in actual_droplets:
+        droplet_spec = specs.get(get_wkid_from_tags(droplet["tags"]))
+        if droplet_spec is None:
+            continue
+        spec_tag = get_spec_tag_from_tags(droplet["tags"])
+        if spec_tag is not None and spec_tag == droplet_spec.spec_tag:
+            continue
+        size = droplet.get("size_slug")
+        if size and size != str(droplet_spec.size):
+            to_resize.append((droplet, droplet_spec))
+        if spec_tag is not None and spec_tag != _spec_tag_at_size(droplet_spec, size):
+            drifted.append(droplet)
+    return to_resize, drifted
+
+
+def _plan_droplets(
     is_dry_run: bool,
-    do_client: DO_Client,
     env: Environment,
-    blueprint_droplets: list[DropletRequest],
-):
-    actual_droplets_res: DropletListResponse = do_client.droplets.list(tag_name=env.tag)
-    actual_droplets: list[DropletResponse] = actual_droplets_res["droplets"]
-    needed_droplets: list[DropletRequest] = copy.deepcopy(blueprint_droplets)
+    actual_droplets: list[DropletResponse],
+    blueprint_droplets: Sequence[DropletSpec],
+) -> DropletPlan:
+    """Compare the Droplets that exist against the blueprint & log the differences."""
     actual_droplet_uuids = {get_wkid_from_tags(d["tags"]) for d in actual_droplets}
-    needed_droplet_uuids = {get_wkid_from_tags(d["tags"]) for d in needed_droplets}
+    needed_droplet_uuids = {d.well_known_uuid for d in blueprint_droplets}
 
     existing = actual_droplet_uuids & needed_droplet_uuids
     to_create = needed_droplet_uuids - actual_droplet_uuids
     to_destroy = actual_droplet_uuids - needed_droplet_uuids
+    to_resize, drifted = _spec_drift(actual_droplets, blueprint_droplets)
 
     LOGGER.info(
         "Droplet comparison",
         existing=len(existing),
         to_create=len(to_create),
         to_destroy=len(to_destroy),
+        to_resize=len(to_resize),
     )
+    if drifted:
+        LOGGER.warning(
+            "Droplets drifted from blueprint, recreate them to apply changes",
+            droplets={d["name"]: str(get_wkid_from_tags(d["tags"])) for d in drifted},
+        )
 
-    if not to_create and not to_destroy:
+    if not to_create and not to_destroy and not to_resize:
         LOGGER.info(
             "Droplets in environment already match blueprint", environment=env.value
         )
-        return
-
-    def _create_droplet(droplet_req: DropletRequest):
-        try:
-            # deep copy + convert UUIDs
-            safe_req = json.loads(json.dumps(droplet_req, default=str))
-            res: DropletCreateResponse = do_client.droplets.create(body=safe_req)
-        except Exception as err:
-            LOGGER.error("Error creating Droplet", err=str(err))
-            raise err
-        else:
-            wkid = get_wkid_from_tags(droplet_req["tags"])
-            LOGGER.info("Created Droplet", wkid=str(wkid), id=res["droplet"]["id"])
+        return DropletPlan(to_create=[], to_destroy=[])
 
+    droplets_to_create: list[DropletSpec] = []
     if to_create:
         droplets_to_create = [
-            d for d in needed_droplets if d["well_known_uuid"] in to_create
+            d for d in blueprint_droplets if d.well_known_uuid in to_create
         ]
         LOGGER.info(
             "Droplets to create",
-            droplets={d["name"]: str(d["well_known_uuid"]) for d in droplets_to_create},
+            droplets={d.name: str(d.well_known_uuid) for d in droplets_to_create},
         )
-        for droplet_req in droplets_to_create:
-            redacted_droplet = {
-                k: (v if k != "user_data" else "***REDACTED***")
-                for k, v in droplet_req.items()
-            }
-            if is_dry_run:
+        if is_dry_run:
+            for droplet_spec in droplets_to_create:
                 print("Would create Droplet:")  # noqa: T201
-                pprint.pp(redacted_droplet)
-            else:
-                wkid = get_wkid_from_tags(droplet_req["tags"])
-                if wkid in to_create:
-                    _create_droplet(droplet_req)
-
-    def _destroy_droplet(droplet_id: int, wkid: UUID):
-        try:
-            do_client.droplets.destroy(droplet_id=droplet_id)
-        except Exception as err:
-            LOGGER.error("Failed to destroy Droplet", err=str(err))
-            raise err
-        else:
-            LOGGER.info("Destroyed Droplet", wkid=str(wkid), id=droplet_id)
+                pprint.pp(droplet_spec.to_request_body(redact_user_data=True))
 
+    droplets_to_destroy: list[DropletResponse] = []
     if to_destroy:
         droplets_to_destroy = [
             d for d in actual_droplets if get_wkid_from_tags(d["tags"]) in to_destroy
@@ -185,106 +244,636 @@ def manage_droplets(
                 d["name"]: str(get_wkid_from_tags(d["tags"])) for d in droplets_to_destroy
             },
         )
-        for droplet in droplets_to_destroy:
-            if is_dry_run:
+        if is_dry_run:
+            for droplet in droplets_to_destroy:
                 print("Would destroy Droplet:")  # noqa: T201
                 pprint.pp(droplet)
-            else:
-                wkid = get_wkid_from_tags(droplet["tags"])
-                if wkid in to_destroy:
-                    _destroy_droplet(droplet["id"], wkid)
+
+    if to_resize:
+        LOGGER.info(
+            "Droplets to resize",
+            droplets={
+                d["name"]: f"{d['size_slug']} -> {spec.size}" for d, spec in to_resize
+            },
+        )
+        if is_dry_run:
+            for droplet, droplet_spec in to_resize:
+                print("Would resize Droplet:")  # noqa: T201
+                pprint.pp(
+                    {
+                        "id": droplet["id"],
+                        "name": droplet["name"],
+                        "size": {"from": droplet["size_slug"], "to": droplet_spec.size},
+                    }
+                )
+
+    return DropletPlan(
+        to_create=droplets_to_create,
+        to_destroy=droplets_to_destroy,
+        to_resize=to_resize,
+    )
 
 
-def manage_cloudflare_dns(
+def _snapshot_names(droplet_specs: Iterable[DropletSpec]) -> set[str]:
+    return {d.image.name for d in droplet_specs if isinstance(d.image, SnapshotImage)}
+
+
+def _iter_private_images(do_client: DO_Client) -> Iterator[dict]:
+    page = 1
+    while True:
+        res = do_client.images.list(private=True, per_page=DO_MAX_PER_PAGE, page=page)
+        yield from res["images"]
+        if not res.get("links", {}).get("pages", {}).get("next"):
+            return
+        page += 1
+
+
+def _latest_image_ids(images: Iterable[dict], names: set[str]) -> dict[str, int]:
+    """Map each of `names` to the ID of the most recent private image with that name."""
+    latest: dict[str, dict] = {}
+    for image in images:
+        name = image.get("name")
+        if name in names and (
+            name not in latest or image["created_at"] > latest[name]["created_at"]
+        ):
+            latest[name] = image
+    if missing := names - latest.keys():
+        raise RuntimeError(f"No snapshot named {', '.join(sorted(missing))}")
+    return {name: image["id"] for name, image in latest.items()}
+
+
+def _with_image_ids(
+    droplet_specs: Iterable[DropletSpec], image_ids: Mapping[str, int]
+) -> list[DropletSpec]:
+    return [
+        dataclasses.replace(d, image_id=image_ids[d.image.name])
+        if isinstance(d.image, SnapshotImage)
+        else d
+        for d in droplet_specs
+    ]
+
+
+def _resolve_snapshot_images(
+    do_client: DO_Client, droplet_specs: Sequence[DropletSpec]
+) -> list[DropletSpec]:
+    """Set the `image_id` of each `SnapshotImage` Droplet to the snapshot it names.
+
+    Private images are only listed if a Droplet uses a `SnapshotImage`.
+    """
+    names = _snapshot_names(droplet_specs)
+    if not names:
+        return list(droplet_specs)
+    image_ids = _latest_image_ids(_iter_private_images(do_client), names)
+    return _with_image_ids(droplet_specs, image_ids)
+
+
+def _create_droplet(do_client: DO_Client, droplet_spec: DropletSpec):
+    try:
+        res: DropletCreateResponse = do_client.droplets.create(
+            body=droplet_spec.to_request_body()
+        )
+    except Exception as err:
+        LOGGER.error("Error creating Droplet", err=str(err))
+        raise err
+    else:
+        wkid = droplet_spec.well_known_uuid
+        LOGGER.info("Created Droplet", wkid=str(wkid), id=res["droplet"]["id"])
+
+
+def _create_batch_key(droplet_spec: DropletSpec) -> tuple:
+    """Droplets with equal keys differ only in name & wkid."""
+    return (
+        droplet_spec.region,
+        droplet_spec.size,
+        droplet_spec.image,
+        droplet_spec.ssh_keys,
+        droplet_spec.shared_tags,
+        droplet_spec.vpc_uuid,
+        droplet_spec.user_data,
+        droplet_spec.backups,
+        droplet_spec.ipv6,
+        droplet_spec.monitoring,
+    )
+
+
+def _batch_droplet_creates(
+    droplet_specs: Iterable[DropletSpec],
+) -> list[list[DropletSpec]]:
+    """Group Droplets that can be created by a single multi-name request.
+
+    Batches hold at most `DO_MAX_NAMES_PER_CREATE` Droplets with distinct names, so
+    that each Droplet in the response can be matched back to its spec.
+    """
+    groups: dict[tuple, list[list[DropletSpec]]] = {}
+    for droplet_spec in droplet_specs:
+        batches = groups.setdefault(_create_batch_key(droplet_spec), [[]])
+        batch = batches[-1]
+        if len(batch) == DO_MAX_NAMES_PER_CREATE or any(
+            d.name == droplet_spec.name for d in batch
+        ):
+            batch = []
+            batches.append(batch)
+        batch.append(droplet_spec)
+    return [batch for batches in groups.values() for batch in batches]
+
+
+def _multi_create_body(droplet_specs: Sequence[DropletSpec]) -> dict:
+    body = droplet_specs[0].to_request_body()
+    del body["name"]
+    body["names"] = [d.name for d in droplet_specs]
+    # wkid tags are unique to each Droplet so are assigned once it exists
+    body["tags"] = [*droplet_specs[0].shared_tags, droplet_specs[0].spec_tag]
+    return body
+
+
+def _wkid_tag_body(droplet_id: int) -> dict:
+    return {"resources": [{"resource_id": str(droplet_id), "resource_type": "droplet"}]}
+
+
+def _create_droplets(do_client: DO_Client, droplet_specs: Sequence[DropletSpec]):
+    """Create a batch of Droplets from `_batch_droplet_creates()`."""
+    if len(droplet_specs) == 1:
+        _create_droplet(do_client, droplet_specs[0])
+        return
+
+    try:
+        res: DropletMultiCreateResponse = do_client.droplets.create(
+            body=_multi_create_body(droplet_specs)
+        )
+    except Exception as err:
+        LOGGER.error("Error creating Droplets", err=str(err))
+        raise err
+
+    droplet_ids = {d["name"]: d["id"] for d in res["droplets"]}
+    untagged: dict[int, UUID] = {}
+    for droplet_spec in droplet_specs:
+        droplet_id = droplet_ids[droplet_spec.name]
+        wkid = droplet_spec.well_known_uuid
+        try:
+            do_client.tags.create(body={"name": droplet_spec.wkid_tag})
+            do_client.tags.assign_resources(
+                tag_id=droplet_spec.wkid_tag, body=_wkid_tag_body(droplet_id)
+            )
+        except Exception as err:
+            LOGGER.error("Error tagging Droplet", wkid=str(wkid), err=str(err))
+            untagged[droplet_id] = wkid
+        else:
+            LOGGER.info("Created Droplet", wkid=str(wkid), id=droplet_id)
+
+    if untagged:
+        for droplet_id, wkid in untagged.items():
+            with contextlib.suppress(Exception):
+                _destroy_droplet(do_client, droplet_id, wkid)
+        raise RuntimeError(_untagged_droplets_error(untagged))
+
+
+def _untagged_droplets_error(untagged: Mapping[int, UUID]) -> str:
+    """Describe new Droplets that could not be given their wkid tag.
+
+    Without it they are unknown to later runs, so `_create_droplets()` destroys them,
+    leaving the next run to create them again.
+    """
+    wkids = ", ".join(str(wkid) for wkid in untagged.values())
+    return f"Could not tag {len(untagged)} new Droplet(s) with their wkid: {wkids}"
+
+
+def _create_operation_target(droplet_specs: Sequence[DropletSpec]) -> str:
+    return ",".join(str(d.well_known_uuid) for d in droplet_specs)
+
+
+def _destroy_droplet(do_client: DO_Client, droplet_id: int, wkid: UUID | None):
+    try:
+        do_client.droplets.destroy(droplet_id=droplet_id)
+    except Exception as err:
+        LOGGER.error("Failed to destroy Droplet", err=str(err))
+        raise err
+    else:
+        LOGGER.info("Destroyed Droplet", wkid=str(wkid), id=droplet_id)
+
+
+def _resize_droplet(
+    do_client: DO_Client, droplet: DropletResponse, droplet_spec: DropletSpec
+):
+    wkid = droplet_spec.well_known_uuid
+    try:
+        resize(
+            do_client,
+            droplet["id"],
+            str(droplet_spec.size),
+            is_powered_on=droplet.get("status") != "off",
+        )
+    except Exception as err:
+        LOGGER.error("Error resizing Droplet", wkid=str(wkid), err=str(err))
+        raise err
+    else:
+        LOGGER.info(
+            "Resized Droplet",
+            wkid=str(wkid),
+            id=droplet["id"],
+            size=str(droplet_spec.size),
+        )
+    if _should_retag(droplet, droplet_spec):
+        _retag_spec(do_client, droplet, droplet_spec)
+
+
+def _should_retag(droplet: DropletResponse, droplet_spec: DropletSpec) -> bool:
+    """Whether a resize has left `droplet` matching its spec in everything but tag."""
+    spec_tag = get_spec_tag_from_tags(droplet["tags"])
+    return spec_tag is not None and spec_tag == _spec_tag_at_size(
+        droplet_spec, droplet.get("size_slug")
+    )
+
+
+def _retag_spec(
+    do_client: DO_Client, droplet: DropletResponse, droplet_spec: DropletSpec
+):
+    """Swap the `spec:` tag of a resized Droplet for that of its current spec."""
+    body = _wkid_tag_body(droplet["id"])
+    do_client.tags.create(body={"name": droplet_spec.spec_tag})
+    do_client.tags.assign_resources(tag_id=droplet_spec.spec_tag, body=body)
+    do_client.tags.unassign_resources(
+        tag_id=get_spec_tag_from_tags(droplet["tags"]), body=body
+    )
+
+
+def _resize_operations(
+    resize_droplet: Callable[[DropletResponse, DropletSpec], Any],
+    to_resize: Iterable[tuple[DropletResponse, DropletSpec]],
+) -> list[Operation]:
+    return [
+        Operation(
+            "resize",
+            str(droplet_spec.well_known_uuid),
+            functools.partial(resize_droplet, droplet, droplet_spec),
+        )
+        for droplet, droplet_spec in to_resize
+    ]
+
+
+def manage_droplets(
     is_dry_run: bool,
     do_client: DO_Client,
-    cf_client: Cloudflare,
     env: Environment,
-    blueprint_dns_records: list[DNSRecord],
-):
-    # { zone_name: zone_id } eg. { 'example.com': '12ab...0789' }
-    zone_cache: dict[str, str] = {}
-    # { zone_id: list of DNS records }
-    zone_records_cache: dict[
-        str,
-        list[
-            ARecord
-            | AAAARecord
-            | CNAMERecord
-            | MXRecord
-            | TXTRecord
-            | NSRecord
-            | SRVRecordParam
-            | PTRRecord
-        ],
-    ] = {}
+    blueprint_droplets: Sequence[DropletSpec],
+    *,
+    max_parallel: int = DEFAULT_MAX_PARALLEL,
+    max_parallel_resizes: int = DEFAULT_MAX_PARALLEL_RESIZES,
+    inventory: EnvironmentInventory | None = None,
+) -> DropletPlan:
+    """Create, destroy & resize Droplets so the environment matches its blueprint.
+
+    Droplets are resized once every create & destroy has finished, with at most
+    `max_parallel_resizes` powered off for resizing at any time.
+    """
+    if inventory is None:
+        inventory = EnvironmentInventory.fetch(do_client, env)
+    plan = _plan_droplets(is_dry_run, env, inventory.droplets, blueprint_droplets)
+    if is_dry_run or plan.is_empty:
+        return plan
+
+    operations = [
+        Operation(
+            "create",
+            _create_operation_target(batch),
+            functools.partial(_create_droplets, do_client, batch),
+        )
+        for batch in _batch_droplet_creates(
+            _resolve_snapshot_images(do_client, plan.to_create)
+        )
+    ]
+    for droplet in plan.to_destroy:
+        wkid = get_wkid_from_tags(droplet["tags"])
+        operations.append(
+            Operation(
+                "destroy",
+                str(wkid),
+                functools.partial(_destroy_droplet, do_client, droplet["id"], wkid),
+            )
+        )
+
+    inventory.invalidate()
+    results = run_operations(operations, max_parallel=max_parallel)
+    results += run_operations(
+        _resize_operations(functools.partial(_resize_droplet, do_client), plan.to_resize),
+        max_parallel=max_parallel_resizes,
+    )
+    inventory.refresh()
+    _log_operations_summary("Droplet operations summary", results)
+    return plan
+
+
+# { (fqdn, type): records } eg. { ('www.example.com', 'A'): [<ARecord>, <ARecord>] }
+ZoneRecordIndex = dict[tuple[str, str], list[RecordResponse]]
+
+
+def _index_zone_records(records: Iterable[RecordResponse]) -> ZoneRecordIndex:
+    index: ZoneRecordIndex = {}
+    for record in records:
+        index.setdefault((record.name, record.type), []).append(record)
+    return index
+
+
+def _iter_zone_records(
+    cf_client: Cloudflare, zone_id: str, *, page: int = 1, **filters
+) -> Iterator[RecordResponse]:
+    """Yield DNS records from `page` onwards, requesting the largest pages allowed."""
+    while True:
+        res = cf_client.dns.records.list(
+            zone_id=zone_id, per_page=CF_MAX_RECORDS_PER_PAGE, page=page, **filters
+        )
+        yield from res.result
+        if page >= _total_pages(res):
+            return
+        page += 1
+
+
+def _total_pages(res) -> int:
+    info = res.result_info
+    if info is None or info.total_pages is None:
+        return 1
+    return int(info.total_pages)
+
+
+def _should_query_by_name(wanted: set[tuple[str, str]], remaining_pages: int) -> bool:
+    """Whether looking up each wanted record set is cheaper than reading every page."""
+    return len(wanted) < remaining_pages
+
+
+def _fetch_zone_records(
+    cf_client: Cloudflare, zone_id: str, wanted: set[tuple[str, str]]
+) -> ZoneRecordIndex:
+    """Index the records in a zone that share a (fqdn, type) with the blueprint.
+
+    The first page of the zone is always read. If the zone has more pages than the
+    blueprint has record sets in it, the remaining sets are looked up by name & type
+    server-side; otherwise the rest of the zone is paginated through.
+    """
+    first_page = cf_client.dns.records.list(
+        zone_id=zone_id, per_page=CF_MAX_RECORDS_PER_PAGE, page=1
+    )
+    remaining_pages = _total_pages(first_page) - 1
+    if remaining_pages <= 0:
+        return _index_zone_records(first_page.result)
 
+    if _should_query_by_name(wanted, remaining_pages):
+        LOGGER.info(
+            "Looking up DNS records by name", zone_id=zone_id, lookups=len(wanted)
+        )
+        records = itertools.chain.from_iterable(
+            _iter_zone_records(cf_client, zone_id, name={"exact": fqdn}, type=type_)
+            for fqdn, type_ in sorted(wanted)
+        )
+        return _index_zone_records(records)
+
+    return _index_zone_records(
+        itertools.chain(first_page.result, _iter_zone_records(cf_client, zone_id, page=2))
+    )
+
+
+def _match_record_set(
+    desired: list[dict], existing: list[RecordResponse]
+) -> list[tuple[dict, RecordResponse | None]]:
+    """Pair desired records with existing records that share their name and type.
+
+    Existing records whose content already matches are claimed first, so that
+    multi-value sets (eg. several round-robin A records) touch as few records as
+    possible. Desired records left without a partner need to be created.
+    """
+    unclaimed = list(existing)
+    partners: dict[int, RecordResponse | None] = {}
+    for i, record_data in enumerate(desired):
+        match = next((r for r in unclaimed if r.content == record_data["content"]), None)
+        if match is not None:
+            unclaimed.remove(match)
+            partners[i] = match
+    for i in range(len(desired)):
+        if i not in partners:
+            partners[i] = unclaimed.pop(0) if unclaimed else None
+    return [(record_data, partners[i]) for i, record_data in enumerate(desired)]
+
+
+def _record_differs(record: RecordResponse, record_data: dict) -> bool:
+    """Whether writing `record_data` over an existing record would change it."""
+    if record.content != record_data["content"]:
+        return True
+    if record.proxied != record_data["proxied"]:
+        return True
+    # proxied records always have an automatic TTL, so only compare unproxied ones
+    return record_data.get("ttl") is not None and record.ttl != record_data["ttl"]
+
+
+def _points_to_droplet(dns_content) -> bool:
+    """Whether a `DNSRecord.content` is an `IPAddressForDroplet` TypedDict."""
+    return isinstance(dns_content, Mapping) and "droplet_wkid" in dns_content
+
+
+def _resolve_dns_content(
+    blueprint_dns_records: Sequence[DNSRecord], droplet_ips: Mapping[UUID, str]
+) -> list[tuple[DNSRecord, str]]:
+    """Pair each blueprint record with its final content, skipping unknown Droplets."""
+    resolved = []
     for dns in blueprint_dns_records:
         dns_content = dns.get("content")
-        if isinstance(dns_content, Mapping) and "droplet_wkid" in dns_content:
-            # handle when dns_content is an `IPAddressForDroplet` TypedDict
-            droplet_ips_for_env = get_droplet_ips_for_env(do_client, env)
+        if _points_to_droplet(dns_content):
             wkid = dns_content["droplet_wkid"]
-            if wkid not in droplet_ips_for_env:
+            if wkid not in droplet_ips:
                 LOGGER.warning(
                     "Could not match wkid to running droplet",
                     droplet_wkid=str(wkid),
                 )
                 continue
-            dns["content"] = droplet_ips_for_env[wkid]
+            dns_content = droplet_ips[wkid]
+        resolved.append((dns, dns_content))
+    return resolved
 
-        cf_zone_name = dns["cf_zone_name"]
-        if cf_zone_name not in zone_cache:
-            try:
-                zone: Zone = cf_client.zones.list(name=cf_zone_name).result[0]
-            except IndexError:
-                err_msg = f"Zone {cf_zone_name} not found in Cloudflare"
-                raise RuntimeError(err_msg) from None
-            if not zone:
-                err_msg = f"Zone {cf_zone_name} not found in Cloudflare"
-                raise RuntimeError(err_msg)
-            zone_cache[cf_zone_name] = zone.id
-
-        zone_id = zone_cache[cf_zone_name]
-
-        if zone_id not in zone_records_cache:
-            zone_records_cache[zone_id] = cf_client.dns.records.list(
-                zone_id=zone_id
-            ).result
-
-        fqdn = cf_zone_name if dns["name"] == "@" else f"{dns['name']}.{cf_zone_name}"
-        cur_dns_records = [
-            record
-            for record in zone_records_cache[zone_id]
-            if record.name == fqdn and record.type == dns["type"]
-        ]
+
+def _get_zone_id(
+    cf_client: Cloudflare, cf_zone_name: str, cache: DiskCache | None = None
+) -> str:
+    if cache is not None and (zone_id := cache.get(ZONE_ID, cf_zone_name)):
+        return zone_id
+    try:
+        zone: Zone = cf_client.zones.list(name=cf_zone_name).result[0]
+    except IndexError:
+        err_msg = f"Zone {cf_zone_name} not found in Cloudflare"
+        raise RuntimeError(err_msg) from None
+    if not zone:
+        err_msg = f"Zone {cf_zone_name} not found in Cloudflare"
+        raise RuntimeError(err_msg)
+    if cache is not None:
+        cache.set(ZONE_ID, cf_zone_name, zone.id)
+    return zone.id
+
+
+def _record_fqdn(dns: DNSRecord) -> str:
+    cf_zone_name = dns["cf_zone_name"]
+    return cf_zone_name if dns["name"] == "@" else f"{dns['name']}.{cf_zone_name}"
+
+
+def _desired_record_sets(
+    resolved: list[tuple[DNSRecord, str]], zone_ids: Mapping[str, str]
+) -> dict[tuple[str, str, str], list[dict]]:
+    """Group resolved records by (zone_id, fqdn, type) as data ready to send."""
+    desired_record_sets: dict[tuple[str, str, str], list[dict]] = {}
+    for dns, dns_content in resolved:
+        zone_id = zone_ids[dns["cf_zone_name"]]
+        fqdn = _record_fqdn(dns)
 
         new_record_data = {
-            "zone_id": zone_id,
             "type": dns["type"],
             "name": dns["name"],
-            "content": dns["content"],
+            "content": dns_content,
             "proxied": dns["proxied"],
         }
         if not dns["proxied"]:
             new_record_data["ttl"] = dns["ttl"]
 
-        if cur_dns_records:
-            if is_dry_run:
-                LOGGER.info("Would update DNS record", name=dns["name"], type=dns["type"])
-            else:
-                update_record_data = {
-                    "dns_record_id": cur_dns_records[0].id,
-                    **new_record_data,
-                }
-                cf_client.dns.records.update(**update_record_data)
-                LOGGER.info("Updated DNS record", name=dns["name"], type=dns["type"])
-        else:
-            if is_dry_run:
-                LOGGER.info("Would create DNS record", name=dns["name"], type=dns["type"])
+        desired_record_sets.setdefault((zone_id, fqdn, dns["type"]), []).append(
+            new_record_data
+        )
+    return desired_record_sets
+
+
+def _wanted_record_keys(
+    desired_record_sets: Mapping[tuple[str, str, str], list[dict]],
+) -> dict[str, set[tuple[str, str]]]:
+    """{ zone_id: {(fqdn, type)} } the record sets the blueprint touches in each zone."""
+    wanted_keys: dict[str, set[tuple[str, str]]] = {}
+    for zone_id, fqdn, record_type in desired_record_sets:
+        wanted_keys.setdefault(zone_id, set()).add((fqdn, record_type))
+    return wanted_keys
+
+
+def _plan_dns_changes(
+    is_dry_run: bool,
+    desired_record_sets: Mapping[tuple[str, str, str], list[dict]],
+    zone_records: Mapping[str, ZoneRecordIndex],
+) -> dict[str, list[tuple[str | None, dict]]]:
+    """Diff desired records against existing ones & log the differences.
+
+    Returns:
+      { zone_id: [(existing record ID or None to create, record data)] }
+    """
+    zone_changes: dict[str, list[tuple[str | None, dict]]] = {}
+    unchanged_count = 0
+    for (zone_id, fqdn, record_type), desired in desired_record_sets.items():
+        existing = zone_records[zone_id].get((fqdn, record_type), [])
+        for new_record_data, cur_record in _match_record_set(desired, existing):
+            name, type_ = new_record_data["name"], new_record_data["type"]
+            if cur_record is not None and not _record_differs(
+                cur_record, new_record_data
+            ):
+                unchanged_count += 1
+                if is_dry_run:
+                    LOGGER.info("Would leave DNS record unchanged", name=name, type=type_)
+            elif cur_record is not None:
+                if is_dry_run:
+                    LOGGER.info("Would update DNS record", name=name, type=type_)
+                zone_changes.setdefault(zone_id, []).append(
+                    (cur_record.id, new_record_data)
+                )
             else:
-                cf_client.dns.records.create(**new_record_data)
-                LOGGER.info("Created DNS record", name=dns["name"], type=dns["type"])
+                if is_dry_run:
+                    LOGGER.info("Would create DNS record", name=name, type=type_)
+                zone_changes.setdefault(zone_id, []).append((None, new_record_data))
+
+    all_changes = [c for changes in zone_changes.values() for c in changes]
+    LOGGER.info(
+        "DNS comparison",
+        unchanged=unchanged_count,
+        to_update=sum(1 for record_id, _ in all_changes if record_id is not None),
+        to_create=sum(1 for record_id, _ in all_changes if record_id is None),
+    )
+    return zone_changes
+
+
+def manage_cloudflare_dns(
+    is_dry_run: bool,
+    do_client: DO_Client,
+    cf_client: Cloudflare,
+    env: Environment,
+    blueprint_dns_records: Sequence[DNSRecord],
+    *,
+    inventory: EnvironmentInventory | None = None,
+    zone_cache: dict[str, str] | None = None,
+    cache: DiskCache | None = None,
+):
+    """Create or update the blueprint's DNS records in Cloudflare.
+
+    Args:
+      zone_cache: { zone_name: zone_id } eg. { 'example.com': '12ab...0789' }, may be
+        shared between calls so that each zone is only looked up once.
+      cache: Zones missing from `zone_cache` are looked up in it before Cloudflare.
+    """
+    # { wkid: public IP } only looked up if a record points at a Droplet
+    droplet_ips_for_env: dict[UUID, str] = {}
+    if any(_points_to_droplet(dns.get("content")) for dns in blueprint_dns_records):
+        droplet_ips_for_env = get_droplet_ips_for_env(do_client, env, inventory=inventory)
+    resolved = _resolve_dns_content(blueprint_dns_records, droplet_ips_for_env)
+
+    if zone_cache is None:
+        zone_cache = {}
+    for dns, _ in resolved:
+        cf_zone_name = dns["cf_zone_name"]
+        if cf_zone_name not in zone_cache:
+            zone_cache[cf_zone_name] = _get_zone_id(cf_client, cf_zone_name, cache)
+
+    desired_record_sets = _desired_record_sets(resolved, zone_cache)
+    # { zone_id: index of the zone's DNS records }
+    zone_records_cache: dict[str, ZoneRecordIndex] = {
+        zone_id: _fetch_zone_records(cf_client, zone_id, keys)
+        for zone_id, keys in _wanted_record_keys(desired_record_sets).items()
+    }
+
+    zone_changes = _plan_dns_changes(is_dry_run, desired_record_sets, zone_records_cache)
+    if is_dry_run:
+        return
+
+    for zone_id, changes in zone_changes.items():
+        _write_dns_changes(cf_client, zone_id, changes)
+
+
+def _chunk_dns_changes(
+    changes: list[tuple[str | None, dict]],
+) -> Iterator[tuple[list[tuple[str | None, dict]], list[dict], list[dict]]]:
+    """Split changes into batch-sized chunks of (chunk, patches, posts)."""
+    for i in range(0, len(changes), CF_MAX_BATCH_SIZE):
+        chunk = changes[i : i + CF_MAX_BATCH_SIZE]
+        patches = [{"id": rid, **data} for rid, data in chunk if rid is not None]
+        posts = [data for rid, data in chunk if rid is None]
+        yield chunk, patches, posts
+
+
+def _log_dns_changes(chunk: list[tuple[str | None, dict]]):
+    for record_id, data in chunk:
+        event = "Updated DNS record" if record_id else "Created DNS record"
+        LOGGER.info(event, name=data["name"], type=data["type"])
+
+
+def _write_dns_changes(
+    cf_client: Cloudflare, zone_id: str, changes: list[tuple[str | None, dict]]
+):
+    """Send record changes for a zone in as few batch requests as the API allows.
+
+    Falls back to one request per record if the batch endpoint is unavailable.
+    """
+    for chunk, patches, posts in _chunk_dns_changes(changes):
+        try:
+            cf_client.dns.records.batch(zone_id=zone_id, patches=patches, posts=posts)
+        except (NotFoundError, PermissionDeniedError) as err:
+            LOGGER.warning(
+                "DNS batch endpoint unavailable, writing records one by one",
+                zone_id=zone_id,
+                err=str(err),
+            )
+            for record_id, data in chunk:
+                if record_id is not None:
+                    cf_client.dns.records.update(
+                        dns_record_id=record_id, zone_id=zone_id, **data
+                    )
+                else:
+                    cf_client.dns.records.create(zone_id=zone_id, **data)
+        _log_dns_changes(chunk)
 
 
 def apply(
@@ -293,17 +882,290 @@ def apply(
     cloudflare_client: Cloudflare,
     blueprints_dir: Path,
     env: Environment,
+    *,
+    max_parallel: int = DEFAULT_MAX_PARALLEL,
+    max_parallel_resizes: int = DEFAULT_MAX_PARALLEL_RESIZES,
+    blueprint: EnvironmentSpec | None = None,
+    zone_cache: dict[str, str] | None = None,
+    cache: DiskCache | None = None,
+    ready_timeout: float = DEFAULT_READY_TIMEOUT,
+    phone_home: PhoneHomeListener | None = None,
+    phone_home_timeout: float = DEFAULT_PHONE_HOME_TIMEOUT,
 ):
-    blueprint: EnvironmentBlueprint = load_environment_blueprint(blueprints_dir, env)
+    """Make an environment match its blueprint: Droplets first, then DNS records.
+
+    New Droplets only get a public IP once they are active, so before DNS records are
+    written, wait up to `ready_timeout` seconds for them to be ready.
 
-    manage_droplets(is_dry_run, do_client, env, blueprint["droplets"])
+    With a `phone_home` listener, new Droplets' cloud-configs are rendered with its
+    URL & once DNS records are written, wait up to `phone_home_timeout` seconds for
+    those that use it to report they have finished provisioning.
+    """
+    if blueprint is None:
+        blueprint = load_environment_blueprint(blueprints_dir, env)
+    inventory = EnvironmentInventory.fetch(do_client, env, cache=cache)
+
+    token = PHONE_HOME_URL.set(phone_home.url if phone_home is not None else None)
+    try:
+        plan = manage_droplets(
+            is_dry_run,
+            do_client,
+            env,
+            blueprint.droplets,
+            max_parallel=max_parallel,
+            max_parallel_resizes=max_parallel_resizes,
+            inventory=inventory,
+        )
+    finally:
+        PHONE_HOME_URL.reset(token)
+    if not is_dry_run and plan.to_create:
+        inventory.wait_until_ready(
+            [d.well_known_uuid for d in plan.to_create], timeout=ready_timeout
+        )
+        if phone_home is not None:
+            # Droplets that finish provisioning while DNS is written are recorded
+            expect_phone_home(phone_home, inventory, plan.to_create)
 
     manage_cloudflare_dns(
         is_dry_run,
         do_client,
         cloudflare_client,
         env,
-        blueprint["dns"],
+        blueprint.dns,
+        inventory=inventory,
+        zone_cache=zone_cache,
+        cache=cache,
+    )
+
+    if not is_dry_run and plan.to_create and phone_home is not None:
+        wait_for_phone_home(
+            phone_home, inventory, plan.to_create, timeout=phone_home_timeout
+        )
+
+
+def _load_environments(
+    cloudflare_client: Cloudflare,
+    blueprints_dir: Path,
+    envs: Iterable[Environment],
+    cache: DiskCache | None = None,
+) -> tuple[list[EnvironmentSpec], dict[str, str]]:
+    """Load the blueprints for `envs` & look up every Cloudflare zone they use."""
+    blueprints = [
+        load_environment_blueprint(blueprints_dir, env) for env in dict.fromkeys(envs)
+    ]
+    cf_zone_names = sorted({dns["cf_zone_name"] for bp in blueprints for dns in bp.dns})
+    zone_cache = {
+        name: _get_zone_id(cloudflare_client, name, cache) for name in cf_zone_names
+    }
+    return blueprints, zone_cache
+
+
+def _run_for_environments(
+    kind: str,
+    blueprints: Sequence[EnvironmentSpec],
+    fn: Callable[[EnvironmentSpec], Any],
+):
+    """Run `fn` for each blueprint concurrently & log a summary per environment."""
+
+    def _run(blueprint: EnvironmentSpec):
+        env = blueprint.environment
+        with structlog.contextvars.bound_contextvars(environment=env.value):
+            fn(blueprint)
+
+    operations = [
+        Operation(kind, bp.environment.value, functools.partial(_run, bp))
+        for bp in blueprints
+    ]
+    results = run_operations(operations, max_parallel=max(len(operations), 1))
+    _log_operations_summary(f"Environments {kind} summary", results)
+
+
+def apply_environments(
+    is_dry_run: bool,
+    do_client: DO_Client,
+    cloudflare_client: Cloudflare,
+    blueprints_dir: Path,
+    envs: Iterable[Environment],
+    *,
+    max_parallel: int = DEFAULT_MAX_PARALLEL,
+    max_parallel_resizes: int = DEFAULT_MAX_PARALLEL_RESIZES,
+    cache: DiskCache | None = None,
+    ready_timeout: float = DEFAULT_READY_TIMEOUT,
+    phone_home: PhoneHomeListener | None = None,
+    phone_home_timeout: float = DEFAULT_PHONE_HOME_TIMEOUT,
+):
+    """Apply the blueprints for several environments concurrently.
+
+    Every blueprint is loaded, and the Cloudflare zones they use looked up, before any
+    environment is changed. Clients & the zone-id cache are shared by all environments.
+    A failure in one environment does not stop the others, see `run_operations()`.
+    """
+    blueprints, zone_cache = _load_environments(
+        cloudflare_client, blueprints_dir, envs, cache
+    )
+    _run_for_environments(
+        "apply",
+        blueprints,
+        lambda blueprint: apply(
+            is_dry_run,
+            do_client,
+            cloudflare_client,
+            blueprints_dir,
+            blueprint.environment,
+            max_parallel=max_parallel,
+            max_parallel_resizes=max_parallel_resizes,
+            blueprint=blueprint,
+            zone_cache=zone_cache,
+            cache=cache,
+            ready_timeout=ready_timeout,
+            phone_home=phone_home,
+            phone_home_timeout=phone_home_timeout,
+        ),
+    )
+
+
+def _delete_dns_records(
+    cf_client: Cloudflare, zone_id: str, records: Sequence[RecordResponse]
+):
+    """Delete records in as few batch requests as the API allows.
+
+    Falls back to one request per record if the batch endpoint is unavailable.
+    """
+    for i in range(0, len(records), CF_MAX_BATCH_SIZE):
+        chunk = records[i : i + CF_MAX_BATCH_SIZE]
+        try:
+            cf_client.dns.records.batch(
+                zone_id=zone_id, deletes=[{"id": record.id} for record in chunk]
+            )
+        except (NotFoundError, PermissionDeniedError) as err:
+            LOGGER.warning(
+                "DNS batch endpoint unavailable, deleting records one by one",
+                zone_id=zone_id,
+                err=str(err),
+            )
+            for record in chunk:
+                cf_client.dns.records.delete(dns_record_id=record.id, zone_id=zone_id)
+        for record in chunk:
+            LOGGER.info("Deleted DNS record", name=record.name, type=record.type)
+
+
+def _droplet_ips(droplets: Iterable[DropletResponse]) -> set[str]:
+    return {
+        net["ip_address"]
+        for droplet in droplets
+        for version in ("v4", "v6")
+        for net in droplet.get("networks", {}).get(version, [])
+    }
+
+
+def teardown(
+    is_dry_run: bool,
+    do_client: DO_Client,
+    cloudflare_client: Cloudflare,
+    blueprint: EnvironmentSpec,
+    *,
+    zone_cache: dict[str, str] | None = None,
+    cache: DiskCache | None = None,
+    confirm: bool = False,
+):
+    """Delete an environment's DNS records, then every Droplet tagged with its `env:`.
+
+    Only records that share a name & type with one of the blueprint's records, and
+    point at an IP of one of the environment's Droplets, are deleted. Records that
+    DODO did not create are left alone. Droplets are destroyed with a single
+    destroy-by-tag request, including any that are not in the blueprint.
+
+    Args:
+      confirm: Must be set to tear down the LIVE environment.
+
+    Raises:
+      ValueError: If `blueprint` is for LIVE and `confirm` is not set.
+    """
+    env = blueprint.environment
+    if env is Environment.LIVE and not confirm:
+        raise ValueError(f"Refusing to tear down {env.tag} without confirmation")
+    if zone_cache is None:
+        zone_cache = {}
+
+    # { zone_id: {(fqdn, type)} }
+    wanted_keys: dict[str, set[tuple[str, str]]] = {}
+    for dns in blueprint.dns:
+        cf_zone_name = dns["cf_zone_name"]
+        if cf_zone_name not in zone_cache:
+            zone_cache[cf_zone_name] = _get_zone_id(
+                cloudflare_client, cf_zone_name, cache
+            )
+        wanted_keys.setdefault(zone_cache[cf_zone_name], set()).add(
+            (_record_fqdn(dns), dns["type"])
+        )
+
+    # listed afresh, as a stale snapshot could match records to since reused IPs
+    droplets = EnvironmentInventory.fetch(do_client, env).droplets
+    droplet_ips = _droplet_ips(droplets)
+
+    # records go first so that they never point at IPs freed by destroyed Droplets
+    for zone_id, keys in wanted_keys.items():
+        zone_records = _fetch_zone_records(cloudflare_client, zone_id, keys)
+        matching = [r for key in sorted(keys) for r in zone_records.get(key, [])]
+        records = [r for r in matching if r.content in droplet_ips]
+        if len(records) < len(matching):
+            LOGGER.info(
+                "Keeping DNS records that do not point at the environment's Droplets",
+                zone_id=zone_id,
+                records=[
+                    f"{r.name} {r.type} {r.content}"
+                    for r in matching
+                    if r.content not in droplet_ips
+                ],
+            )
+        if is_dry_run:
+            for record in records:
+                LOGGER.info("Would delete DNS record", name=record.name, type=record.type)
+            continue
+        _delete_dns_records(cloudflare_client, zone_id, records)
+
+    if is_dry_run:
+        LOGGER.info(
+            "Would destroy Droplets by tag",
+            tag=env.tag,
+            droplets={d["name"]: str(get_wkid_from_tags(d["tags"])) for d in droplets},
+        )
+        return
+
+    EnvironmentInventory(do_client, env, cache=cache).invalidate()
+    do_client.droplets.destroy_by_tag(tag_name=env.tag)
+    LOGGER.info("Destroyed Droplets by tag", tag=env.tag)
+
+
+def teardown_environments(
+    is_dry_run: bool,
+    do_client: DO_Client,
+    cloudflare_client: Cloudflare,
+    blueprints_dir: Path,
+    envs: Iterable[Environment],
+    *,
+    cache: DiskCache | None = None,
+    confirm: bool = False,
+):
+    """Tear down several environments concurrently, see `apply_environments()`.
+
+    `confirm` must be set to tear down LIVE, see `teardown()`.
+    """
+    blueprints, zone_cache = _load_environments(
+        cloudflare_client, blueprints_dir, envs, cache
+    )
+    _run_for_environments(
+        "teardown",
+        blueprints,
+        lambda blueprint: teardown(
+            is_dry_run,
+            do_client,
+            cloudflare_client,
+            blueprint,
+            zone_cache=zone_cache,
+            cache=cache,
+            confirm=confirm,
+        ),
     )
 
 
@@ -316,13 +1178,33 @@ if __name__ == "__main__":
         else:
             raise NotADirectoryError(string)
 
+    def _positive_int(string):
+        value = int(string)
+        if value < 1:
+            raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+        return value
+
+    def _non_negative_float(string):
+        value = float(string)
+        if value < 0:
+            raise argparse.ArgumentTypeError(f"must not be negative, got {value}")
+        return value
+
     parser = argparse.ArgumentParser()
     parser.add_argument("blueprints_dir", type=_dir_path)
     parser.add_argument(
-        "env",
+        "envs",
+        metavar="env",
+        nargs="*",
         type=Environment,
         choices=list(Environment),
-        help="Environment to run against",
+        help="Environment(s) to run against",
+    )
+    parser.add_argument(
+        "--all",
+        dest="all_envs",
+        action="store_true",
+        help="Run against every environment",
     )
     parser.add_argument(
         "--no-dry-run",
@@ -330,14 +1212,141 @@ if __name__ == "__main__":
         action="store_true",
         help="Actually apply blueprint to environment",
     )
+    parser.add_argument(
+        "--max-parallel",
+        type=_positive_int,
+        default=DEFAULT_MAX_PARALLEL,
+        help="Maximum number of Droplet operations to run concurrently",
+    )
+    parser.add_argument(
+        "--max-parallel-resizes",
+        type=_positive_int,
+        default=DEFAULT_MAX_PARALLEL_RESIZES,
+        help="Maximum number of Droplets to power off & resize at once, when their "
+        "size in the blueprint has changed",
+    )
+    parser.add_argument(
+        "--ready-timeout",
+        type=_non_negative_float,
+        default=DEFAULT_READY_TIMEOUT,
+        help="Seconds to wait for new Droplets to be active with a public IP before "
+        "writing DNS records, 0 to not wait",
+    )
+    parser.add_argument(
+        "--phone-home-url",
+        default=None,
+        metavar="URL",
+        help="Listen for new Droplets to phone home once provisioned, at this URL "
+        "which they must be able to reach, eg. http://203.0.113.7:8090",
+    )
+    parser.add_argument(
+        "--phone-home-timeout",
+        type=_non_negative_float,
+        default=DEFAULT_PHONE_HOME_TIMEOUT,
+        help="Seconds to wait for new Droplets to phone home after writing DNS records",
+    )
+    parser.add_argument(
+        "--teardown",
+        action="store_true",
+        help="Delete the environment's DNS records & destroy all of its Droplets",
+    )
+    parser.add_argument(
+        "--confirm-teardown",
+        action="store_true",
+        help="Required to --teardown LIVE, or every environment with --all",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=Path,
+        default=None,
+        help="Also write API call metrics to this file, as a Prometheus textfile if it "
+        "ends in '.prom' or as JSON otherwise",
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Use the asyncio engine (requires the `async` extra)",
+    )
+    add_cache_arguments(parser)
     args = parser.parse_args()
+    if args.all_envs == bool(args.envs):
+        parser.error("pass either one or more environments, or --all")
+    if args.teardown and args.use_async:
+        parser.error("--teardown does not support --async")
+    if args.teardown and args.phone_home_url:
+        parser.error("--teardown does not support --phone-home-url")
+    if args.teardown and args.all_envs and not args.confirm_teardown:
+        parser.error("--teardown with --all also requires --confirm-teardown")
+    if args.teardown and Environment.LIVE in args.envs and not args.confirm_teardown:
+        parser.error("--teardown of live also requires --confirm-teardown")
     blueprints_dir = args.blueprints_dir
-    env = args.env
+    envs = list(Environment) if args.all_envs else args.envs
     is_dry_run = not args.no_dry_run
-    LOGGER.info("Running DODO", environment=env.value)
+    LOGGER.info("Running DODO", environments=[env.value for env in envs])
 
     do_creds = DigitalOceanCredentials.from_env()
-    do_client = DO_Client(do_creds.digitalocean__token)
     cloudflare_creds = CloudflareCredentials.from_env()
-    cloudflare_client = Cloudflare(api_token=cloudflare_creds.cloudflare__token)
-    apply(is_dry_run, do_client, cloudflare_client, blueprints_dir, env)
+    metrics = ApiMetrics()
+    cache = cache_from_args(args)
+    listener = (
+        PhoneHomeListener(args.phone_home_url)
+        if args.phone_home_url and not is_dry_run
+        else contextlib.nullcontext()
+    )
+    with listener as phone_home:
+        try:
+            if args.teardown:
+                teardown_environments(
+                    is_dry_run,
+                    make_do_client(do_creds.digitalocean__token, metrics=metrics),
+                    make_cloudflare_client(
+                        cloudflare_creds.cloudflare__token, metrics=metrics
+                    ),
+                    blueprints_dir,
+                    envs,
+                    cache=cache,
+                    confirm=args.confirm_teardown,
+                )
+            elif args.use_async:
+                # imported here as `apply_async` itself builds on this module
+                from digitalocean_deployment_orchestrator.infra.apply_async import (
+                    run_apply_async,
+                )
+
+                asyncio.run(
+                    run_apply_async(
+                        is_dry_run,
+                        do_creds.digitalocean__token,
+                        cloudflare_creds.cloudflare__token,
+                        blueprints_dir,
+                        envs,
+                        max_parallel=args.max_parallel,
+                        max_parallel_resizes=args.max_parallel_resizes,
+                        metrics=metrics,
+                        cache=cache,
+                        ready_timeout=args.ready_timeout,
+                        phone_home=phone_home,
+                        phone_home_timeout=args.phone_home_timeout,
+                    )
+                )
+            else:
+                apply_environments(
+                    is_dry_run,
+                    make_do_client(do_creds.digitalocean__token, metrics=metrics),
+                    make_cloudflare_client(
+                        cloudflare_creds.cloudflare__token, metrics=metrics
+                    ),
+                    blueprints_dir,
+                    envs,
+                    max_parallel=args.max_parallel,
+                    max_parallel_resizes=args.max_parallel_resizes,
+                    cache=cache,
+                    ready_timeout=args.ready_timeout,
+                    phone_home=phone_home,
+                    phone_home_timeout=args.phone_home_timeout,
+                )
+        finally:
+            metrics.log_summary()
+            if args.metrics_file is not None:
+                metrics.write(args.metrics_file)
@@ -0,0 +1,568 @@
+# Apply a blueprint using the asyncio clients shipped by pydo & the Cloudflare SDK.
+#
+# Planning is shared with `apply.py`; only the I/O differs. Independent requests are
+# issued concurrently, eg. listing Droplets while Cloudflare zones are resolved, or
+# fetching records for several zones at once.
+#
+# Usage:
+#   ```sh
+#   uv run python -m digitalocean_deployment_orchestrator.infra.apply \
+#     $(pwd)/env_blueprints test --async [--no-dry-run]
+#   ```
+#
+# Prerequisites:
+#   - [ ] the `async` extra, which provides the aiohttp transport `pydo.aio` needs
+
+import asyncio
+import functools
+import itertools
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from uuid import UUID
+
+import structlog
+from cloudflare import AsyncCloudflare, NotFoundError, PermissionDeniedError
+from cloudflare.types.dns import RecordResponse
+from pydo.aio import Client as AsyncDO_Client
+
+from digitalocean_deployment_orchestrator.cache import ZONE_ID, DiskCache
+from digitalocean_deployment_orchestrator.clients import (
+    make_async_cloudflare_client,
+    make_async_do_client,
+)
+from digitalocean_deployment_orchestrator.droplet_actions import resize_async
+from digitalocean_deployment_orchestrator.infra.apply import (
+    CF_MAX_RECORDS_PER_PAGE,
+    ZoneRecordIndex,
+    _batch_droplet_creates,
+    _chunk_dns_changes,
+    _create_operation_target,
+    _desired_record_sets,
+    _index_zone_records,
+    _latest_image_ids,
+    _log_dns_changes,
+    _log_operations_summary,
+    _multi_create_body,
+    _plan_dns_changes,
+    _plan_droplets,
+    _points_to_droplet,
+    _resize_operations,
+    _resolve_dns_content,
+    _should_query_by_name,
+    _should_retag,
+    _snapshot_names,
+    _total_pages,
+    _untagged_droplets_error,
+    _wanted_record_keys,
+    _with_image_ids,
+    _wkid_tag_body,
+    load_environment_blueprint,
+)
+from digitalocean_deployment_orchestrator.infra.phone_home import (
+    DEFAULT_PHONE_HOME_TIMEOUT,
+    PHONE_HOME_URL,
+    PhoneHomeListener,
+    expect_phone_home,
+    wait_for_phone_home,
+)
+from digitalocean_deployment_orchestrator.infra.types import (
+    DropletPlan,
+    DropletSpec,
+    EnvironmentSpec,
+    Operation,
+)
+from digitalocean_deployment_orchestrator.infra.utils import (
+    DEFAULT_MAX_PARALLEL,
+    DEFAULT_MAX_PARALLEL_RESIZES,
+    run_operations_async,
+)
+from digitalocean_deployment_orchestrator.inventory import (
+    DEFAULT_READY_TIMEOUT,
+    DO_MAX_PER_PAGE,
+    EnvironmentInventory,
+)
+from digitalocean_deployment_orchestrator.list_droplet_IPs import get_droplet_ips_for_env
+from digitalocean_deployment_orchestrator.metrics import ApiMetrics
+from digitalocean_deployment_orchestrator.types import Environment
+from digitalocean_deployment_orchestrator.types_cloudflare import DNSRecord
+from digitalocean_deployment_orchestrator.types_DO import (
+    DropletCreateResponse,
+    DropletMultiCreateResponse,
+    DropletResponse,
+)
+from digitalocean_deployment_orchestrator.utils import (
+    get_spec_tag_from_tags,
+    get_wkid_from_tags,
+)
+
+LOGGER = structlog.get_logger()
+
+
+async def _create_droplet(do_client: AsyncDO_Client, droplet_spec: DropletSpec):
+    try:
+        res: DropletCreateResponse = await do_client.droplets.create(
+            body=droplet_spec.to_request_body()
+        )
+    except Exception as err:
+        LOGGER.error("Error creating Droplet", err=str(err))
+        raise err
+    else:
+        wkid = droplet_spec.well_known_uuid
+        LOGGER.info("Created Droplet", wkid=str(wkid), id=res["droplet"]["id"])
+
+
+async def _create_droplets(
+    do_client: AsyncDO_Client, droplet_specs: Sequence[DropletSpec]
+):
+    """See `apply._create_droplets()`, the new Droplets are tagged concurrently."""
+    if len(droplet_specs) == 1:
+        await _create_droplet(do_client, droplet_specs[0])
+        return
+
+    try:
+        res: DropletMultiCreateResponse = await do_client.droplets.create(
+            body=_multi_create_body(droplet_specs)
+        )
+    except Exception as err:
+        LOGGER.error("Error creating Droplets", err=str(err))
+        raise err
+
+    droplet_ids = {d["name"]: d["id"] for d in res["droplets"]}
+    untagged: dict[int, UUID] = {}
+
+    async def _tag_droplet(droplet_spec: DropletSpec):
+        droplet_id = droplet_ids[droplet_spec.name]
+        wkid = droplet_spec.well_known_uuid
+        try:
+            await do_client.tags.create(body={"name": droplet_spec.wkid_tag})
+            await do_client.tags.assign_resources(
+                tag_id=droplet_spec.wkid_tag, body=_wkid_tag_body(droplet_id)
+            )
+        except Exception as err:
+            LOGGER.error("Error tagging Droplet", wkid=str(wkid), err=str(err))
+            untagged[droplet_id] = wkid
+        else:
+            LOGGER.info("Created Droplet", wkid=str(wkid), id=droplet_id)
+
+    await asyncio.gather(*(_tag_droplet(d) for d in droplet_specs))
+
+    if untagged:
+        await asyncio.gather(
+            *(_destroy_droplet(do_client, i, wkid) for i, wkid in untagged.items()),
+            return_exceptions=True,
+        )
+        raise RuntimeError(_untagged_droplets_error(untagged))
+
+
+async def _destroy_droplet(do_client: AsyncDO_Client, droplet_id: int, wkid):
+    try:
+        await do_client.droplets.destroy(droplet_id=droplet_id)
+    except Exception as err:
+        LOGGER.error("Failed to destroy Droplet", err=str(err))
+        raise err
+    else:
+        LOGGER.info("Destroyed Droplet", wkid=str(wkid), id=droplet_id)
+
+
+async def _resize_droplet(
+    do_client: AsyncDO_Client, droplet: DropletResponse, droplet_spec: DropletSpec
+):
+    """See `apply._resize_droplet()`."""
+    wkid = droplet_spec.well_known_uuid
+    try:
+        await resize_async(
+            do_client,
+            droplet["id"],
+            str(droplet_spec.size),
+            is_powered_on=droplet.get("status") != "off",
+        )
+    except Exception as err:
+        LOGGER.error("Error resizing Droplet", wkid=str(wkid), err=str(err))
+        raise err
+    else:
+        LOGGER.info(
+            "Resized Droplet",
+            wkid=str(wkid),
+            id=droplet["id"],
+            size=str(droplet_spec.size),
+        )
+    if _should_retag(droplet, droplet_spec):
+        await _retag_spec(do_client, droplet, droplet_spec)
+
+
+async def _retag_spec(
+    do_client: AsyncDO_Client, droplet: DropletResponse, droplet_spec: DropletSpec
+):
+    """See `apply._retag_spec()`."""
+    body = _wkid_tag_body(droplet["id"])
+    await do_client.tags.create(body={"name": droplet_spec.spec_tag})
+    await do_client.tags.assign_resources(tag_id=droplet_spec.spec_tag, body=body)
+    await do_client.tags.unassign_resources(
+        tag_id=get_spec_tag_from_tags(droplet["tags"]), body=body
+    )
+
+
+async def _resolve_snapshot_images(
+    do_client: AsyncDO_Client, droplet_specs: Sequence[DropletSpec]
+) -> list[DropletSpec]:
+    """See `apply._resolve_snapshot_images()`."""
+    names = _snapshot_names(droplet_specs)
+    if not names:
+        return list(droplet_specs)
+    images, page = [], 1
+    while True:
+        res = await do_client.images.list(
+            private=True, per_page=DO_MAX_PER_PAGE, page=page
+        )
+        images.extend(res["images"])
+        if not res.get("links", {}).get("pages", {}).get("next"):
+            break
+        page += 1
+    return _with_image_ids(droplet_specs, _latest_image_ids(images, names))
+
+
+async def manage_droplets_async(
+    is_dry_run: bool,
+    do_client: AsyncDO_Client,
+    env: Environment,
+    blueprint_droplets: Sequence[DropletSpec],
+    *,
+    inventory: EnvironmentInventory,
+    max_parallel: int = DEFAULT_MAX_PARALLEL,
+    max_parallel_resizes: int = DEFAULT_MAX_PARALLEL_RESIZES,
+) -> DropletPlan:
+    """See `apply.manage_droplets()`."""
+    plan = _plan_droplets(is_dry_run, env, inventory.droplets, blueprint_droplets)
+    if is_dry_run or plan.is_empty:
+        return plan
+
+    operations = [
+        Operation(
+            "create",
+            _create_operation_target(batch),
+            functools.partial(_create_droplets, do_client, batch),
+        )
+        for batch in _batch_droplet_creates(
+            await _resolve_snapshot_images(do_client, plan.to_create)
+        )
+    ]
+    for droplet in plan.to_destroy:
+        wkid = get_wkid_from_tags(droplet["tags"])
+        operations.append(
+            Operation(
+                "destroy",
+                str(wkid),
+                functools.partial(_destroy_droplet, do_client, droplet["id"], wkid),
+            )
+        )
+
+    inventory.invalidate()
+    results = await run_operations_async(operations, max_parallel=max_parallel)
+    results += await run_operations_async(
+        _resize_operations(functools.partial(_resize_droplet, do_client), plan.to_resize),
+        max_parallel=max_parallel_resizes,
+    )
+    await inventory.refresh_async()
+    _log_operations_summary("Droplet operations summary", results)
+    return plan
+
+
+async def _get_zone_id(
+    cf_client: AsyncCloudflare, cf_zone_name: str, cache: DiskCache | None = None
+) -> str:
+    if cache is not None and (zone_id := cache.get(ZONE_ID, cf_zone_name)):
+        return zone_id
+    zones = (await cf_client.zones.list(name=cf_zone_name)).result
+    if not zones or not zones[0]:
+        raise RuntimeError(f"Zone {cf_zone_name} not found in Cloudflare")
+    if cache is not None:
+        cache.set(ZONE_ID, cf_zone_name, zones[0].id)
+    return zones[0].id
+
+
+async def _get_zone_ids(
+    cf_client: AsyncCloudflare,
+    cf_zone_names: list[str],
+    cache: DiskCache | None = None,
+) -> dict[str, str]:
+    zone_ids = await asyncio.gather(
+        *(_get_zone_id(cf_client, name, cache) for name in cf_zone_names)
+    )
+    return dict(zip(cf_zone_names, zone_ids, strict=True))
+
+
+async def _list_zone_records(
+    cf_client: AsyncCloudflare, zone_id: str, **filters
+) -> list[RecordResponse]:
+    records: list[RecordResponse] = []
+    page = 1
+    while True:
+        res = await cf_client.dns.records.list(
+            zone_id=zone_id, per_page=CF_MAX_RECORDS_PER_PAGE, page=page, **filters
+        )
+        records.extend(res.result)
+        if page >= _total_pages(res):
+            return records
+        page += 1
+
+
+async def _fetch_zone_records(
+    cf_client: AsyncCloudflare, zone_id: str, wanted: set[tuple[str, str]]
+) -> ZoneRecordIndex:
+    """See `apply._fetch_zone_records()`, the follow-up requests run concurrently."""
+    first_page = await cf_client.dns.records.list(
+        zone_id=zone_id, per_page=CF_MAX_RECORDS_PER_PAGE, page=1
+    )
+    total_pages = _total_pages(first_page)
+    if total_pages <= 1:
+        return _index_zone_records(first_page.result)
+
+    if _should_query_by_name(wanted, total_pages - 1):
+        LOGGER.info(
+            "Looking up DNS records by name", zone_id=zone_id, lookups=len(wanted)
+        )
+        record_sets = await asyncio.gather(
+            *(
+                _list_zone_records(cf_client, zone_id, name={"exact": fqdn}, type=type_)
+                for fqdn, type_ in sorted(wanted)
+            )
+        )
+        return _index_zone_records(itertools.chain.from_iterable(record_sets))
+
+    rest = await asyncio.gather(
+        *(
+            cf_client.dns.records.list(
+                zone_id=zone_id, per_page=CF_MAX_RECORDS_PER_PAGE, page=page
+            )
+            for page in range(2, total_pages + 1)
+        )
+    )
+    return _index_zone_records(
+        itertools.chain(first_page.result, *(res.result for res in rest))
+    )
+
+
+async def _write_dns_changes(
+    cf_client: AsyncCloudflare, zone_id: str, changes: list[tuple[str | None, dict]]
+):
+    """See `apply._write_dns_changes()`."""
+    for chunk, patches, posts in _chunk_dns_changes(changes):
+        try:
+            await cf_client.dns.records.batch(
+                zone_id=zone_id, patches=patches, posts=posts
+            )
+        except (NotFoundError, PermissionDeniedError) as err:
+            LOGGER.warning(
+                "DNS batch endpoint unavailable, writing records one by one",
+                zone_id=zone_id,
+                err=str(err),
+            )
+            await asyncio.gather(
+                *(
+                    cf_client.dns.records.update(
+                        dns_record_id=record_id, zone_id=zone_id, **data
+                    )
+                    if record_id is not None
+                    else cf_client.dns.records.create(zone_id=zone_id, **data)
+                    for record_id, data in chunk
+                )
+            )
+        _log_dns_changes(chunk)
+
+
+async def manage_cloudflare_dns_async(
+    is_dry_run: bool,
+    cf_client: AsyncCloudflare,
+    env: Environment,
+    blueprint_dns_records: Sequence[DNSRecord],
+    *,
+    inventory: EnvironmentInventory,
+    zone_ids: dict[str, str],
+):
+    droplet_ips_for_env = {}
+    if any(_points_to_droplet(dns.get("content")) for dns in blueprint_dns_records):
+        droplet_ips_for_env = get_droplet_ips_for_env(
+            inventory.do_client, env, inventory=inventory
+        )
+    resolved = _resolve_dns_content(blueprint_dns_records, droplet_ips_for_env)
+    desired_record_sets = _desired_record_sets(resolved, zone_ids)
+
+    wanted_keys = _wanted_record_keys(desired_record_sets)
+    indexes = await asyncio.gather(
+        *(
+            _fetch_zone_records(cf_client, zone_id, keys)
+            for zone_id, keys in wanted_keys.items()
+        )
+    )
+    zone_records = dict(zip(wanted_keys, indexes, strict=True))
+
+    zone_changes = _plan_dns_changes(is_dry_run, desired_record_sets, zone_records)
+    if is_dry_run:
+        return
+
+    await asyncio.gather(
+        *(
+            _write_dns_changes(cf_client, zone_id, changes)
+            for zone_id, changes in zone_changes.items()
+        )
+    )
+
+
+async def apply_async(
+    is_dry_run: bool,
+    do_client: AsyncDO_Client,
+    cloudflare_client: AsyncCloudflare,
+    blueprints_dir: Path,
+    env: Environment,
+    *,
+    max_parallel: int = DEFAULT_MAX_PARALLEL,
+    max_parallel_resizes: int = DEFAULT_MAX_PARALLEL_RESIZES,
+    blueprint: EnvironmentSpec | None = None,
+    zone_ids: dict[str, str] | None = None,
+    cache: DiskCache | None = None,
+    ready_timeout: float = DEFAULT_READY_TIMEOUT,
+    phone_home: PhoneHomeListener | None = None,
+    phone_home_timeout: float = DEFAULT_PHONE_HOME_TIMEOUT,
+):
+    """See `apply.apply()`."""
+    if blueprint is None:
+        blueprint = load_environment_blueprint(blueprints_dir, env)
+
+    if zone_ids is None:
+        cf_zone_names = sorted({dns["cf_zone_name"] for dns in blueprint.dns})
+        inventory, found_zone_ids = await asyncio.gather(
+            EnvironmentInventory.fetch_async(do_client, env, cache=cache),
+            _get_zone_ids(cloudflare_client, cf_zone_names, cache),
+        )
+        zone_ids = found_zone_ids
+    else:
+        inventory = await EnvironmentInventory.fetch_async(do_client, env, cache=cache)
+
+    token = PHONE_HOME_URL.set(phone_home.url if phone_home is not None else None)
+    try:
+        plan = await manage_droplets_async(
+            is_dry_run,
+            do_client,
+            env,
+            blueprint.droplets,
+            inventory=inventory,
+            max_parallel=max_parallel,
+            max_parallel_resizes=max_parallel_resizes,
+        )
+    finally:
+        PHONE_HOME_URL.reset(token)
+    if not is_dry_run and plan.to_create:
+        await inventory.wait_until_ready_async(
+            [d.well_known_uuid for d in plan.to_create], timeout=ready_timeout
+        )
+        if phone_home is not None:
+            # Droplets that finish provisioning while DNS is written are recorded
+            expect_phone_home(phone_home, inventory, plan.to_create)
+
+    await manage_cloudflare_dns_async(
+        is_dry_run,
+        cloudflare_client,
+        env,
+        blueprint.dns,
+        inventory=inventory,
+        zone_ids=zone_ids,
+    )
+
+    if not is_dry_run and plan.to_create and phone_home is not None:
+        # the listener records arrivals on its own thread, so only waiting blocks
+        await asyncio.to_thread(
+            wait_for_phone_home,
+            phone_home,
+            inventory,
+            plan.to_create,
+            timeout=phone_home_timeout,
+        )
+
+
+async def apply_environments_async(
+    is_dry_run: bool,
+    do_client: AsyncDO_Client,
+    cloudflare_client: AsyncCloudflare,
+    blueprints_dir: Path,
+    envs: Iterable[Environment],
+    *,
+    max_parallel: int = DEFAULT_MAX_PARALLEL,
+    max_parallel_resizes: int = DEFAULT_MAX_PARALLEL_RESIZES,
+    cache: DiskCache | None = None,
+    ready_timeout: float = DEFAULT_READY_TIMEOUT,
+    phone_home: PhoneHomeListener | None = None,
+    phone_home_timeout: float = DEFAULT_PHONE_HOME_TIMEOUT,
+):
+    """See `apply.apply_environments()`."""
+    blueprints = [
+        load_environment_blueprint(blueprints_dir, env) for env in dict.fromkeys(envs)
+    ]
+    cf_zone_names = sorted({dns["cf_zone_name"] for bp in blueprints for dns in bp.dns})
+    zone_ids = await _get_zone_ids(cloudflare_client, cf_zone_names, cache)
+
+    async def _apply_environment(blueprint: EnvironmentSpec):
+        env = blueprint.environment
+        with structlog.contextvars.bound_contextvars(environment=env.value):
+            await apply_async(
+                is_dry_run,
+                do_client,
+                cloudflare_client,
+                blueprints_dir,
+                env,
+                max_parallel=max_parallel,
+                max_parallel_resizes=max_parallel_resizes,
+                blueprint=blueprint,
+                zone_ids=zone_ids,
+                cache=cache,
+                ready_timeout=ready_timeout,
+                phone_home=phone_home,
+                phone_home_timeout=phone_home_timeout,
+            )
+
+    operations = [
+        Operation(
+            "apply",
+            bp.environment.value,
+            functools.partial(_apply_environment, bp),
+        )
+        for bp in blueprints
+    ]
+    results = await run_operations_async(operations, max_parallel=max(len(operations), 1))
+    _log_operations_summary("Environments apply summary", results)
+
+
+async def run_apply_async(
+    is_dry_run: bool,
+    do_token: str,
+    cloudflare_token: str,
+    blueprints_dir: Path,
+    envs: Iterable[Environment],
+    *,
+    max_parallel: int = DEFAULT_MAX_PARALLEL,
+    max_parallel_resizes: int = DEFAULT_MAX_PARALLEL_RESIZES,
+    metrics: ApiMetrics | None = None,
+    cache: DiskCache | None = None,
+    ready_timeout: float = DEFAULT_READY_TIMEOUT,
+    phone_home: PhoneHomeListener | None = None,
+    phone_home_timeout: float = DEFAULT_PHONE_HOME_TIMEOUT,
+):
+    """Open async clients for the duration of `apply_environments_async()`."""
+    async with (
+        make_async_do_client(do_token, metrics=metrics) as do_client,
+        make_async_cloudflare_client(
+            cloudflare_token, metrics=metrics
+        ) as cloudflare_client,
+    ):
+        await apply_environments_async(
+            is_dry_run,
+            do_client,
+            cloudflare_client,
+            blueprints_dir,
+            envs,
+            max_parallel=max_parallel,
+            max_parallel_resizes=max_parallel_resizes,
+            cache=cache,
+            ready_timeout=ready_timeout,
+            phone_home=phone_home,
+            phone_home_timeout=phone_home_timeout,
+        )
@@ -0,0 +1,191 @@
+# Bake a snapshot of a blueprint Droplet once cloud-init has provisioned it.
+#
+# Droplets created from the snapshot, with `image=SnapshotImage("<snapshot name>")`,
+# boot with packages already installed & upgraded, so their cloud-init has little left
+# to do. A builder Droplet is created from the blueprint's spec & its cloud-config
+# rendered with `phone_home_url`, see `infra.phone_home`. Once it phones home it is
+# shut down & snapshot, then destroyed whether or not baking succeeded. Builders are
+# tagged `dodo-builder` instead of with their environment, so `apply` ignores them.
+#
+# Usage:
+#   ```sh
+#   uv run python -m digitalocean_deployment_orchestrator.infra.bake \
+#     $(pwd)/env_blueprints test <Droplet name or wkid> \
+#     --snapshot-name app-server-2026-10 \
+#     --phone-home-url http://203.0.113.7:8090 [--no-dry-run]
+#   ```
+#
+# Prerequisites:
+#   Data that must be available to this script:
+#     - [ ] A Digital Ocean token stored in env. var. `$DIGITALOCEAN__TOKEN`
+#   The builder Droplet must be able to reach `--phone-home-url`.
+
+import argparse
+import pprint
+from collections.abc import Sequence
+from pathlib import Path
+
+import structlog
+from pydo import Client as DO_Client
+
+from digitalocean_deployment_orchestrator.clients import make_do_client
+from digitalocean_deployment_orchestrator.droplet_actions import (
+    DEFAULT_ACTION_TIMEOUT,
+    power_off,
+    snapshot,
+)
+from digitalocean_deployment_orchestrator.infra.apply import (
+    _resolve_snapshot_images,
+    load_environment_blueprint,
+)
+from digitalocean_deployment_orchestrator.infra.phone_home import (
+    DEFAULT_PHONE_HOME_TIMEOUT,
+    PHONE_HOME_URL,
+    PhoneHomeListener,
+    expects_phone_home,
+)
+from digitalocean_deployment_orchestrator.infra.types import DropletSpec
+from digitalocean_deployment_orchestrator.types import Environment
+from digitalocean_deployment_orchestrator.types_DO import (
+    DigitalOceanCredentials,
+    DropletCreateResponse,
+)
+
+LOGGER = structlog.get_logger()
+
+BUILDER_TAG = "dodo-builder"
+
+
+def find_droplet_spec(
+    droplet_specs: Sequence[DropletSpec], name_or_wkid: str
+) -> DropletSpec:
+    """Pick the blueprint Droplet with the given name or well-known UUID."""
+    matches = [
+        d for d in droplet_specs if name_or_wkid in (d.name, str(d.well_known_uuid))
+    ]
+    if len(matches) != 1:
+        raise ValueError(
+            f"Expected one Droplet named or with wkid '{name_or_wkid}', "
+            f"found {len(matches)}"
+        )
+    return matches[0]
+
+
+def builder_request_body(droplet_spec: DropletSpec, phone_home_url: str) -> dict:
+    token = PHONE_HOME_URL.set(phone_home_url)
+    try:
+        body = droplet_spec.to_request_body()
+    finally:
+        PHONE_HOME_URL.reset(token)
+    body["name"] = f"{droplet_spec.name}-builder"
+    body["tags"] = [BUILDER_TAG]
+    return body
+
+
+def bake(
+    do_client: DO_Client,
+    droplet_spec: DropletSpec,
+    snapshot_name: str,
+    phone_home: PhoneHomeListener,
+    *,
+    phone_home_timeout: float = DEFAULT_PHONE_HOME_TIMEOUT,
+    action_timeout: float = DEFAULT_ACTION_TIMEOUT,
+) -> int:
+    """Snapshot a builder Droplet made from `droplet_spec` once it is provisioned.
+
+    Returns:
+      The image ID of the new snapshot.
+    """
+    if not expects_phone_home(droplet_spec, phone_home.url):
+        raise ValueError(
+            f"The cloud-config of Droplet '{droplet_spec.name}' does not phone home"
+        )
+    (droplet_spec,) = _resolve_snapshot_images(do_client, [droplet_spec])
+
+    res: DropletCreateResponse = do_client.droplets.create(
+        body=builder_request_body(droplet_spec, phone_home.url)
+    )
+    droplet_id = res["droplet"]["id"]
+    LOGGER.info("Created builder Droplet", id=droplet_id, name=droplet_spec.name)
+    try:
+        if not list(phone_home.wait([droplet_id], phone_home_timeout)):
+            raise RuntimeError(
+                f"Builder Droplet {droplet_id} did not phone home within "
+                f"{phone_home_timeout}s"
+            )
+        LOGGER.info("Builder Droplet provisioned", id=droplet_id)
+        power_off(do_client, droplet_id, timeout=action_timeout)
+        snapshot_id = snapshot(
+            do_client, droplet_id, snapshot_name, timeout=action_timeout
+        )
+    finally:
+        do_client.droplets.destroy(droplet_id=droplet_id)
+        LOGGER.info("Destroyed builder Droplet", id=droplet_id)
+
+    LOGGER.info("Baked snapshot", name=snapshot_name, id=snapshot_id)
+    return snapshot_id
+
+
+if __name__ == "__main__":
+
+    def _dir_path(string):
+        dir_path = Path(string)
+        if dir_path.is_dir():
+            return dir_path
+        else:
+            raise NotADirectoryError(string)
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("blueprints_dir", type=_dir_path)
+    parser.add_argument(
+        "env",
+        type=Environment,
+        choices=list(Environment),
+        help="Environment whose blueprint holds the Droplet",
+    )
+    parser.add_argument("droplet", help="Name or wkid of the Droplet to bake")
+    parser.add_argument("--snapshot-name", required=True)
+    parser.add_argument(
+        "--phone-home-url",
+        required=True,
+        metavar="URL",
+        help="Listen for the builder Droplet to phone home once provisioned, at this "
+        "URL which it must be able to reach, eg. http://203.0.113.7:8090",
+    )
+    parser.add_argument(
+        "--phone-home-timeout",
+        type=float,
+        default=DEFAULT_PHONE_HOME_TIMEOUT,
+        help="Seconds to wait for the builder Droplet to phone home",
+    )
+    parser.add_argument(
+        "--action-timeout",
+        type=float,
+        default=DEFAULT_ACTION_TIMEOUT,
+        help="Seconds to wait for the builder Droplet to power off, & to be snapshot",
+    )
+    parser.add_argument(
+        "--no-dry-run",
+        required=False,
+        action="store_true",
+        help="Actually create the builder Droplet & snapshot it",
+    )
+    args = parser.parse_args()
+
+    blueprint = load_environment_blueprint(args.blueprints_dir, args.env)
+    droplet_spec = find_droplet_spec(blueprint.droplets, args.droplet)
+
+    if not args.no_dry_run:
+        print(f"Would bake snapshot '{args.snapshot_name}' from Droplet:")  # noqa: T201
+        pprint.pp(droplet_spec.to_request_body(redact_user_data=True))
+    else:
+        do_creds = DigitalOceanCredentials.from_env()
+        with PhoneHomeListener(args.phone_home_url) as phone_home:
+            bake(
+                make_do_client(do_creds.digitalocean__token),
+                droplet_spec,
+                args.snapshot_name,
+                phone_home,
+                phone_home_timeout=args.phone_home_timeout,
+                action_timeout=args.action_timeout,
+            )
@@ -0,0 +1,247 @@
+# Learn when new Droplets have finished provisioning by having them phone home.
+#
+# `apply` starts a `PhoneHomeListener` & exposes its URL to cloud-config templates as
+# `phone_home_url`, see `infra.utils.DeferredCloudConfig`. Templates opt in by POSTing
+# to `{{ phone_home_url }}/<droplet id>` once provisioned. cloud-init's own `phone_home`
+# module runs before `power_state` reboots the Droplet, so the demo templates instead
+# install a systemd unit that POSTs on the next boot, see
+# `docs/demo/cloud_config_templates/`. A Droplet is ready for deploys as soon as it
+# phones home. The listener must be reachable by the Droplets.
+#
+# The URL ends in a random token generated for each listener. Requests without it are
+# refused, and only the Droplets `expect()`-ed by the current run are recorded.
+
+import contextvars
+import functools
+import hmac
+import secrets
+import threading
+import time
+from collections.abc import Collection, Iterable, Iterator, Sequence
+from datetime import datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from uuid import UUID
+
+import structlog
+
+from digitalocean_deployment_orchestrator.infra.types import DropletSpec
+from digitalocean_deployment_orchestrator.inventory import EnvironmentInventory
+from digitalocean_deployment_orchestrator.utils import get_wkid_from_tags
+
+LOGGER = structlog.get_logger()
+
+# seconds to wait for new Droplets to phone home
+DEFAULT_PHONE_HOME_TIMEOUT = 900.0
+# cloud-init posts a handful of short fields, anything larger is not from it
+MAX_BODY_SIZE = 64 * 1024
+
+# the URL of the running listener, read when cloud-configs are rendered
+PHONE_HOME_URL: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "phone_home_url", default=None
+)
+
+
+def _instance_id(path: str, body: bytes) -> int | None:
+    """Read the Droplet ID from the request path, or failing that the form body."""
+    last_segment = path.rstrip("/").rpartition("/")[2]
+    if last_segment.isdigit():
+        return int(last_segment)
+    form = parse_qs(body.decode(errors="replace"))
+    instance_id = form.get("instance_id", [""])[0]
+    return int(instance_id) if instance_id.isdigit() else None
+
+
+class _PhoneHomeHandler(BaseHTTPRequestHandler):
+    server: "_PhoneHomeServer"
+
+    def do_POST(self):
+        length = min(int(self.headers.get("content-length") or 0), MAX_BODY_SIZE)
+        status = self.server.listener.handle(self.path, self.rfile.read(length))
+        self.send_response(status)
+        self.send_header("content-length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _PhoneHomeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], listener: "PhoneHomeListener"):
+        super().__init__(address, _PhoneHomeHandler)
+        self.listener = listener
+
+
+class PhoneHomeListener:
+    """An HTTP server, run on a background thread, that records Droplets phoning home.
+
+    Use as a context manager. It listens on every interface, on the port of `url`,
+    which is the address Droplets should reach it at. A port of 0 picks a free port.
+    `self.url` is `url` followed by this listener's token, for templates to POST to.
+    """
+
+    def __init__(self, url: str):
+        parsed = urlparse(url.rstrip("/"))
+        self._server = _PhoneHomeServer(
+            ("0.0.0.0", 80 if parsed.port is None else parsed.port),  # noqa: S104 Droplets connect from outside
+            self,
+        )
+        if parsed.port == 0:
+            parsed = parsed._replace(
+                netloc=f"{parsed.hostname}:{self._server.server_address[1]}"
+            )
+        self._base_url = parsed.geturl()
+        self._token = secrets.token_urlsafe(16)
+        self.url = f"{self._base_url}/{self._token}"
+        # Droplets the current run waits for, others phoning home are not recorded
+        self._expected: set[int] = set()
+        # { droplet_id: time.time() it phoned home }
+        self._arrivals: dict[int, float] = {}
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.1,), daemon=True
+        )
+
+    def __enter__(self) -> "PhoneHomeListener":
+        self._thread.start()
+        # the token is a secret, keep it out of logs
+        LOGGER.info("Listening for Droplets to phone home", url=self._base_url)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def handle(self, path: str, body: bytes) -> HTTPStatus:
+        """Record the Droplet a request to `path` is from, if it has the token."""
+        token, _, rest = urlparse(path).path.strip("/").partition("/")
+        if not hmac.compare_digest(token.encode(), self._token.encode()):
+            return HTTPStatus.FORBIDDEN
+        droplet_id = _instance_id(rest, body)
+        if droplet_id is None:
+            return HTTPStatus.BAD_REQUEST
+        if not self.record(droplet_id):
+            return HTTPStatus.NOT_FOUND
+        return HTTPStatus.OK
+
+    def expect(self, droplet_ids: Iterable[int]) -> None:
+        """Let the Droplets phone home, eg. as soon as they are created."""
+        with self._condition:
+            self._expected.update(droplet_ids)
+
+    def record(self, droplet_id: int) -> bool:
+        """Record the Droplet as having phoned home, unless it is not expected."""
+        with self._condition:
+            if droplet_id not in self._expected:
+                return False
+            self._arrivals.setdefault(droplet_id, time.time())
+            self._condition.notify_all()
+            return True
+
+    def wait(
+        self, droplet_ids: Collection[int], timeout: float
+    ) -> Iterator[tuple[int, float]]:
+        """Yield `(droplet_id, phoned_home_at)` as each Droplet phones home.
+
+        Stops once all have, or when `timeout` seconds have passed.
+        """
+        self.expect(droplet_ids)
+        pending = set(droplet_ids)
+        deadline = time.monotonic() + timeout
+        while pending:
+            with self._condition:
+                arrived = self._condition.wait_for(
+                    functools.partial(self._arrived, pending),
+                    timeout=max(0.0, deadline - time.monotonic()),
+                )
+            if not arrived:
+                return
+            pending -= arrived.keys()
+            yield from sorted(arrived.items(), key=lambda item: item[1])
+
+    def _arrived(self, droplet_ids: set[int]) -> dict[int, float]:
+        return {i: self._arrivals[i] for i in droplet_ids & self._arrivals.keys()}
+
+
+def _created_at(droplet: dict) -> float | None:
+    try:
+        return datetime.fromisoformat(droplet["created_at"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def expects_phone_home(droplet_spec: DropletSpec, url: str) -> bool:
+    """Whether the Droplet's cloud-config, rendered with `url` set, uses it."""
+    token = PHONE_HOME_URL.set(url)
+    try:
+        user_data = droplet_spec.to_request_body()["user_data"]
+    finally:
+        PHONE_HOME_URL.reset(token)
+    return url in user_data
+
+
+def _phone_home_droplets(
+    listener: PhoneHomeListener,
+    inventory: EnvironmentInventory,
+    droplet_specs: Sequence[DropletSpec],
+) -> dict[int, dict]:
+    """The Droplets in `inventory` created from specs whose cloud-config phones home."""
+    wkids = {
+        d.well_known_uuid for d in droplet_specs if expects_phone_home(d, listener.url)
+    }
+    return {
+        d["id"]: d for d in inventory.droplets if get_wkid_from_tags(d["tags"]) in wkids
+    }
+
+
+def expect_phone_home(
+    listener: PhoneHomeListener,
+    inventory: EnvironmentInventory,
+    droplet_specs: Sequence[DropletSpec],
+) -> None:
+    """Let new Droplets phone home as soon as they exist, ahead of waiting for them."""
+    listener.expect(_phone_home_droplets(listener, inventory, droplet_specs))
+
+
+def wait_for_phone_home(
+    listener: PhoneHomeListener,
+    inventory: EnvironmentInventory,
+    droplet_specs: Sequence[DropletSpec],
+    *,
+    timeout: float = DEFAULT_PHONE_HOME_TIMEOUT,
+) -> set[UUID]:
+    """Wait for new Droplets whose cloud-config phones home to do so.
+
+    Logs each Droplet's time to ready, from its creation until it phoned home, as it
+    arrives.
+
+    Returns:
+      The wkids of the Droplets that did not phone home in time.
+    """
+    droplets = _phone_home_droplets(listener, inventory, droplet_specs)
+    if not droplets:
+        return set()
+
+    for droplet_id, phoned_home_at in listener.wait(droplets, timeout):
+        droplet = droplets.pop(droplet_id)
+        created_at = _created_at(droplet)
+        LOGGER.info(
+            "Droplet phoned home",
+            wkid=str(get_wkid_from_tags(droplet["tags"])),
+            id=droplet_id,
+            time_to_ready=(
+                round(phoned_home_at - created_at, 1) if created_at is not None else None
+            ),
+        )
+
+    not_ready = {get_wkid_from_tags(d["tags"]) for d in droplets.values()}
+    if not_ready:
+        LOGGER.warning(
+            "Droplets did not phone home before deadline",
+            wkids=sorted(str(wkid) for wkid in not_ready),
+        )
+    return not_ready
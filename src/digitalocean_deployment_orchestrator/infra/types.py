@@ -1,9 +1,21 @@
-from dataclasses import dataclass
-from typing import TypedDict
+import hashlib
+import json
+import secrets
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any, TypedDict
+from uuid import UUID
 
 from digitalocean_deployment_orchestrator.types import Environment, EnvVarDataClass
 from digitalocean_deployment_orchestrator.types_cloudflare import DNSRecord
-from digitalocean_deployment_orchestrator.types_DO import DropletRequest
+from digitalocean_deployment_orchestrator.types_DO import (
+    DORegion,
+    DropletImage,
+    DropletRequest,
+    DropletResponse,
+    DropletSize,
+    SnapshotImage,
+)
 
 
 class EnvironmentBlueprint(TypedDict):
@@ -12,6 +24,183 @@ class EnvironmentBlueprint(TypedDict):
     dns: list[DNSRecord]
 
 
+@dataclass(frozen=True, slots=True)
+class DropletSpec:
+    """An immutable view of a blueprint's `DropletRequest`.
+
+    The `env:`, `wkid:` & `spec:` tags are derived rather than appended to the
+    blueprint, and `user_data` is shared with the blueprint instead of copied. Converted
+    back to a request body only at the API boundary, see `to_request_body()`.
+
+    `image_id` is the ID a `SnapshotImage` resolves to, set by `apply` just before the
+    Droplet is created, see `apply._resolve_snapshot_images()`.
+    """
+
+    name: str
+    region: DORegion
+    size: DropletSize
+    image: DropletImage | SnapshotImage | int
+    ssh_keys: tuple[str, ...]
+    base_tags: tuple[str, ...]
+    vpc_uuid: str
+    user_data: str | Callable[[], str]
+    well_known_uuid: UUID
+    environment: Environment
+    backups: bool | None = None
+    ipv6: bool | None = None
+    monitoring: bool | None = None
+    image_id: int | None = None
+
+    @classmethod
+    def from_request(cls, req: DropletRequest, env: Environment) -> "DropletSpec":
+        return cls(
+            name=req["name"],
+            region=req["region"],
+            size=req["size"],
+            image=req["image"],
+            ssh_keys=tuple(req["ssh_keys"]),
+            base_tags=tuple(req["tags"]),
+            vpc_uuid=req["vpc_uuid"],
+            user_data=req["user_data"],
+            well_known_uuid=req["well_known_uuid"],
+            environment=env,
+            backups=req.get("backups"),
+            ipv6=req.get("ipv6"),
+            monitoring=req.get("monitoring"),
+        )
+
+    @property
+    def wkid_tag(self) -> str:
+        return f"wkid:{self.well_known_uuid}"
+
+    @property
+    def shared_tags(self) -> tuple[str, ...]:
+        """The tags this Droplet has in common with others in its environment."""
+        return tuple(dict.fromkeys((*self.base_tags, self.environment.tag)))
+
+    @property
+    def fingerprint(self) -> str:
+        """A stable hash of the attributes that define this Droplet.
+
+        Covers region, size, image, SSH keys, shared tags & `user_data`, but not the
+        name or wkid, so Droplets that differ only in those share a fingerprint. A
+        `DeferredCloudConfig` is identified by its templates & context type instead of
+        being rendered, see `_user_data_digest()`.
+        """
+        spec = {
+            "region": str(self.region),
+            "size": str(self.size),
+            "image": (
+                f"snapshot:{self.image.name}"
+                if isinstance(self.image, SnapshotImage)
+                else str(self.image)
+            ),
+            "ssh_keys": list(self.ssh_keys),
+            "tags": sorted(self.shared_tags),
+            "user_data": _user_data_digest(self.user_data),
+        }
+        digest = hashlib.sha256(json.dumps(spec, sort_keys=True).encode())
+        return digest.hexdigest()[:16]
+
+    @property
+    def spec_tag(self) -> str:
+        return f"spec:{self.fingerprint}"
+
+    @property
+    def tags(self) -> tuple[str, ...]:
+        return tuple(dict.fromkeys((*self.shared_tags, self.wkid_tag, self.spec_tag)))
+
+    def to_request_body(self, *, redact_user_data: bool = False) -> dict[str, Any]:
+        """Build the JSON body for `droplets.create()`.
+
+        Deferred `user_data` is rendered here, unless `redact_user_data` is set. A
+        `SnapshotImage` is sent by name unless its `image_id` has been resolved, as
+        `apply.manage_droplets()` does.
+        """
+        if redact_user_data:
+            user_data = "***REDACTED***"
+        elif callable(self.user_data):
+            user_data = self.user_data()
+        else:
+            user_data = self.user_data
+
+        image: str | int
+        if self.image_id is not None:
+            image = self.image_id
+        elif isinstance(self.image, SnapshotImage):
+            image = self.image.name
+        elif isinstance(self.image, int):
+            image = self.image
+        else:
+            image = str(self.image)
+
+        body: dict[str, Any] = {
+            "name": self.name,
+            "region": str(self.region),
+            "size": str(self.size),
+            "image": image,
+            "ssh_keys": list(self.ssh_keys),
+            "tags": list(self.tags),
+            "vpc_uuid": self.vpc_uuid,
+            "user_data": user_data,
+        }
+        for key in ("backups", "ipv6", "monitoring"):
+            if (value := getattr(self, key)) is not None:
+                body[key] = value
+        return body
+
+
+def _user_data_digest(user_data: str | Callable[[], str]) -> str:
+    """Hash `user_data` without rendering it.
+
+    A callable is hashed by its own `fingerprint()` if it has one, like
+    `DeferredCloudConfig`. Any other callable can't be told apart from one rendering
+    something else, so gets a random digest: Droplets using it always count as drifted.
+    """
+    fingerprint = getattr(user_data, "fingerprint", None)
+    if callable(fingerprint):
+        return fingerprint()
+    if callable(user_data):
+        return secrets.token_hex(32)
+    return hashlib.sha256(user_data.encode()).hexdigest()
+
+
+@dataclass(frozen=True, slots=True)
+class EnvironmentSpec:
+    """A loaded `EnvironmentBlueprint`, see `apply.load_environment_blueprint()`."""
+
+    environment: Environment
+    droplets: tuple[DropletSpec, ...]
+    dns: tuple[DNSRecord, ...]
+
+    @classmethod
+    def from_blueprint(cls, blueprint: EnvironmentBlueprint) -> "EnvironmentSpec":
+        env = blueprint["environment"]
+        return cls(
+            environment=env,
+            droplets=tuple(
+                DropletSpec.from_request(d, env) for d in blueprint.get("droplets", [])
+            ),
+            dns=tuple(blueprint.get("dns", [])),
+        )
+
+
+@dataclass(frozen=True)
+class DropletPlan:
+    """The Droplets an apply run needs to change to match its blueprint.
+
+    `to_resize` pairs existing Droplets with the spec whose size they no longer match.
+    """
+
+    to_create: list[DropletSpec]
+    to_destroy: list[DropletResponse]
+    to_resize: list[tuple[DropletResponse, DropletSpec]] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.to_create and not self.to_destroy and not self.to_resize
+
+
 @dataclass(frozen=True)
 class PostgresServerEnv(EnvVarDataClass):
     ssh__public_key: str
@@ -23,3 +212,23 @@ class PostgresServerEnv(EnvVarDataClass):
 @dataclass(frozen=True)
 class AppServerEnv(EnvVarDataClass):
     ssh__public_key: str
+
+
+@dataclass(frozen=True)
+class Operation:
+    """A single unit of work against a provider API, eg. creating one Droplet."""
+
+    kind: str
+    target: str
+    fn: Callable[[], Any]
+
+
+@dataclass(frozen=True)
+class OperationResult:
+    kind: str
+    target: str
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
@@ -1,11 +1,31 @@
+import ast
+import asyncio
+import contextvars
+import functools
+import hashlib
 import importlib.util
+import json
+import os
 import sys
+from collections.abc import Hashable, Iterable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
 from pathlib import Path
 from types import ModuleType
+from typing import cast
 
-from jinja2 import Template
+from jinja2 import Environment as JinjaEnvironment
+from jinja2 import FileSystemBytecodeCache, FileSystemLoader, meta
 
-from digitalocean_deployment_orchestrator.types import EnvVarDataClass
+from digitalocean_deployment_orchestrator.infra.phone_home import PHONE_HOME_URL
+from digitalocean_deployment_orchestrator.infra.types import Operation, OperationResult
+from digitalocean_deployment_orchestrator.types import Environment, EnvVarDataClass
+
+DEFAULT_MAX_PARALLEL = 8
+# Droplets are powered off while resized, so resize one at a time to keep the rest up
+DEFAULT_MAX_PARALLEL_RESIZES = 1
+# optional directory in which to persist compiled templates between runs
+TEMPLATE_CACHE_DIR_ENV_VAR = "DODO__TEMPLATE_CACHE_DIR"
 
 
 def import_module_from_path(file_path: Path) -> ModuleType:
@@ -20,12 +40,81 @@ def import_module_from_path(file_path: Path) -> ModuleType:
     return module
 
 
-def render_cloud_config(template_path: Path, context: EnvVarDataClass) -> str:
+def _environment_from_node(node: ast.expr) -> Environment | None:
+    # matches `Environment.TEST`, regardless of what the enum was imported as
+    if isinstance(node, ast.Attribute) and node.attr in Environment.__members__:
+        return Environment[node.attr]
+    return None
+
+
+def find_blueprint_environment(module_path: Path) -> Environment | None:
+    """Work out which environment a blueprint module defines, without importing it.
+
+    Importing a blueprint renders its cloud-configs and reads secrets from the
+    environment, so a static scan is preferred. The module's source is searched for
+    an `environment=Environment.X` keyword (or an `"environment": Environment.X` dict
+    entry). If none is found the file name is used, eg. `test.py` -> Environment.TEST.
+
+    Returns:
+      None if the environment cannot be determined, in which case the module must be
+      imported to find out.
+    """
+    try:
+        tree = ast.parse(module_path.read_text(encoding="utf-8"))
+    except SyntaxError:
+        return None
+
+    found: set[Environment] = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.keyword) and node.arg == "environment":
+            if (env := _environment_from_node(node.value)) is not None:
+                found.add(env)
+        elif isinstance(node, ast.Dict):
+            for key, value in zip(node.keys, node.values, strict=True):
+                if isinstance(key, ast.Constant) and key.value == "environment":
+                    if (env := _environment_from_node(value)) is not None:
+                        found.add(env)
+
+    if len(found) == 1:
+        return found.pop()
+    if found:
+        return None  # ambiguous, let the import decide
+
+    try:
+        return Environment(module_path.stem)
+    except ValueError:
+        return None
+
+
+@functools.cache
+def _get_jinja_env(template_dir: Path) -> JinjaEnvironment:
+    """One Jinja environment per template directory, shared for the whole process.
+
+    The environment caches compiled templates in memory, so a template shared by many
+    Droplets is only parsed once. Templates in the same directory can `{% include %}`
+    or `{% import %}` each other. If `$DODO__TEMPLATE_CACHE_DIR` is set, compiled
+    bytecode is also persisted there for later runs.
+    """
+    bytecode_cache = None
+    if cache_dir := os.getenv(TEMPLATE_CACHE_DIR_ENV_VAR):
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    # templates render YAML, not HTML, so autoescaping would corrupt their output
+    return JinjaEnvironment(  # noqa: S701 jinja2-autoescape-false
+        loader=FileSystemLoader(template_dir), bytecode_cache=bytecode_cache
+    )
+
+
+def render_cloud_config(
+    template_path: Path, context: EnvVarDataClass, *, phone_home_url: str | None = None
+) -> str:
     """Generate a cloud config YAML definition by applying a context to a template.
 
     Args:
       template_path: The path to a cloud config template, a `.yaml.jinja` file.
       context: A dataclass that sources its values from environment variables.
+      phone_home_url: Exposed to the template as `phone_home_url`, for a cloud-init
+        `phone_home` module to report to, see `infra.phone_home`. Left falsy if `None`.
 
     Returns:
       The plain-text contents of a cloud-config YAML file, ready to be passed to
@@ -47,5 +136,155 @@ def render_cloud_config(template_path: Path, context: EnvVarDataClass) -> str:
     if not template_path.exists():
         raise FileNotFoundError(template_path)
 
-    template_text = template_path.read_text(encoding="utf-8")
-    return Template(template_text).render(**context.as_dict())
+    jinja_env = _get_jinja_env(template_path.parent.resolve())
+    template = jinja_env.get_template(template_path.name)
+    return template.render(**context.as_dict(), phone_home_url=phone_home_url)
+
+
+@functools.cache
+def _render_deferred_cloud_config(
+    template_path: Path,
+    context_type: type[EnvVarDataClass],
+    phone_home_url: str | None,
+) -> str:
+    return render_cloud_config(
+        template_path, context_type.from_env(), phone_home_url=phone_home_url
+    )
+
+
+@dataclass(frozen=True)
+class DeferredCloudConfig:
+    """A cloud-config that is only rendered when a Droplet using it is created.
+
+    Use as a `DropletRequest.user_data` in place of an eagerly rendered string, so
+    that environment variables are only read, and the template only rendered, for
+    Droplets that `apply` actually needs to create. Renders are memoized: Droplets
+    sharing a template & context type render it once.
+
+    While `apply` listens for new Droplets to phone home the template is rendered with
+    `phone_home_url` set to the listener's URL.
+
+    Its `fingerprint()`, part of the Droplet's `spec:` tag, hashes the source of the
+    template and of every template it includes, imports or extends, & the context type
+    and its fields, without rendering. Environment variables are left out: they hold
+    secrets, which a tag would expose, and need not be set for Droplets that exist.
+
+    Usage:
+      ```
+      DropletRequest(
+          user_data=DeferredCloudConfig(
+              CLOUD_CONFIG_DIR / "app_server.yaml.jinja", AppServerEnv
+          ),
+          ...
+      )
+      ```
+    """
+
+    template_path: Path
+    context_type: type[EnvVarDataClass]
+
+    def __call__(self) -> str:
+        return _render_deferred_cloud_config(
+            self.template_path, cast(Hashable, self.context_type), PHONE_HOME_URL.get()
+        )
+
+    def fingerprint(self) -> str:
+        return _deferred_cloud_config_fingerprint(
+            self.template_path, cast(Hashable, self.context_type)
+        )
+
+
+def _template_sources(jinja_env: JinjaEnvironment, name: str) -> dict[str, str]:
+    """The source of a template & of every template it loads when rendered."""
+    if jinja_env.loader is None:
+        raise ValueError("Jinja environment has no loader to read templates with")
+
+    sources: dict[str, str] = {}
+    pending = [name]
+    while pending:
+        name = pending.pop()
+        if name in sources:
+            continue
+        sources[name] = jinja_env.loader.get_source(jinja_env, name)[0]
+        referenced = list(meta.find_referenced_templates(jinja_env.parse(sources[name])))
+        if None in referenced:
+            # a template named at render time could be any in the directory
+            pending.extend(jinja_env.list_templates())
+        else:
+            pending.extend(n for n in referenced if n is not None)
+    return sources
+
+
+@functools.cache
+def _deferred_cloud_config_fingerprint(
+    template_path: Path, context_type: type[EnvVarDataClass]
+) -> str:
+    if not template_path.exists():
+        raise FileNotFoundError(template_path)
+
+    jinja_env = _get_jinja_env(template_path.parent.resolve())
+    digest = hashlib.sha256()
+    for name, source in sorted(_template_sources(jinja_env, template_path.name).items()):
+        digest.update(json.dumps([name, source]).encode())
+    context = [f"{context_type.__module__}.{context_type.__qualname__}"]
+    context.extend(f.name for f in fields(context_type))
+    digest.update(json.dumps(context).encode())
+    return digest.hexdigest()
+
+
+def run_operations(
+    operations: Iterable[Operation], *, max_parallel: int = DEFAULT_MAX_PARALLEL
+) -> list[OperationResult]:
+    """Run operations concurrently with at most `max_parallel` in flight at once.
+
+    A failing operation does not stop the others: its exception is captured in the
+    corresponding `OperationResult`.
+
+    Returns:
+      One result per operation, sorted by kind then target so that summaries are
+      deterministic regardless of completion order.
+    """
+    if max_parallel < 1:
+        raise ValueError(f"max_parallel must be at least 1, got {max_parallel}")
+
+    def _run(op: Operation) -> OperationResult:
+        try:
+            op.fn()
+        except Exception as err:
+            return OperationResult(op.kind, op.target, error=str(err))
+        return OperationResult(op.kind, op.target)
+
+    operations = list(operations)
+    if not operations:
+        return []
+
+    with ThreadPoolExecutor(max_workers=min(max_parallel, len(operations))) as pool:
+        # each operation runs in a copy of the caller's context so that values bound
+        # with `structlog.contextvars` carry over to its log events
+        futures = [
+            pool.submit(contextvars.copy_context().run, _run, op) for op in operations
+        ]
+        results = [f.result() for f in futures]
+
+    return sorted(results, key=lambda r: (r.kind, r.target))
+
+
+async def run_operations_async(
+    operations: Iterable[Operation], *, max_parallel: int = DEFAULT_MAX_PARALLEL
+) -> list[OperationResult]:
+    """Like `run_operations()`, for operations whose `fn` returns an awaitable."""
+    if max_parallel < 1:
+        raise ValueError(f"max_parallel must be at least 1, got {max_parallel}")
+
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def _run(op: Operation) -> OperationResult:
+        async with semaphore:
+            try:
+                await op.fn()
+            except Exception as err:
+                return OperationResult(op.kind, op.target, error=str(err))
+            return OperationResult(op.kind, op.target)
+
+    results = await asyncio.gather(*(_run(op) for op in operations))
+    return sorted(results, key=lambda r: (r.kind, r.target))
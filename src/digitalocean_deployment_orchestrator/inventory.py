@@ -0,0 +1,231 @@
+# Read the Droplets that currently exist in Digital Ocean.
+
+import asyncio
+import math
+import time
+from collections.abc import Collection, Iterator
+from dataclasses import dataclass, field
+from urllib.parse import parse_qs, urlparse
+from uuid import UUID
+
+import structlog
+from pydo import Client as DO_Client
+from pydo.aio import Client as AsyncDO_Client
+
+from digitalocean_deployment_orchestrator.cache import INVENTORY, DiskCache
+from digitalocean_deployment_orchestrator.types import Environment
+from digitalocean_deployment_orchestrator.types_DO import (
+    DropletListResponse,
+    DropletResponse,
+)
+from digitalocean_deployment_orchestrator.utils import get_public_ip, get_wkid_from_tags
+
+LOGGER = structlog.get_logger()
+
+# <https://docs.digitalocean.com/reference/api/digitalocean/#section/Introduction/Links-and-Pagination>
+DO_MAX_PER_PAGE = 200
+# seconds to wait for new Droplets to be ready, & between checks while waiting
+DEFAULT_READY_TIMEOUT = 300.0
+READY_POLL_INTERVAL = 5.0
+
+
+def _not_ready(droplets: list[DropletResponse], wkids: Collection[UUID]) -> set[UUID]:
+    """The `wkids` of Droplets that are not yet active with a public IP address."""
+    ready = {
+        get_wkid_from_tags(d["tags"])
+        for d in droplets
+        if d.get("status") == "active" and get_public_ip(d) is not None
+    }
+    return set(wkids) - ready
+
+
+def _log_readiness(wkids: Collection[UUID], not_ready: set[UUID], waited: float):
+    if not_ready:
+        LOGGER.warning(
+            "Droplets not ready before deadline",
+            wkids=sorted(str(wkid) for wkid in not_ready),
+            waited=round(waited, 1),
+        )
+    else:
+        LOGGER.info("Droplets ready", count=len(wkids), waited=round(waited, 1))
+
+
+def _next_page(res: DropletListResponse) -> int | None:
+    next_url = res.get("links", {}).get("pages", {}).get("next")
+    if not next_url:
+        return None
+    page = parse_qs(urlparse(next_url).query).get("page")
+    if not page:
+        return None
+    return int(page[0])
+
+
+def iter_droplets(
+    do_client: DO_Client,
+    *,
+    tag_name: str | None = None,
+    per_page: int = DO_MAX_PER_PAGE,
+) -> Iterator[DropletResponse]:
+    """Yield every Droplet matching `tag_name`, following pagination links.
+
+    Droplets are yielded as each page arrives, so callers can start work before the
+    whole fleet has been listed.
+    """
+    page: int | None = 1
+    while page is not None:
+        res: DropletListResponse = do_client.droplets.list(
+            tag_name=tag_name, per_page=per_page, page=page
+        )
+        yield from res["droplets"]
+        page = _next_page(res)
+
+
+async def list_droplets_async(
+    do_client: AsyncDO_Client,
+    *,
+    tag_name: str | None = None,
+    per_page: int = DO_MAX_PER_PAGE,
+) -> list[DropletResponse]:
+    """List every Droplet matching `tag_name` using a `pydo.aio` client.
+
+    Once the first page reveals `meta.total`, the remaining pages are fetched
+    concurrently.
+    """
+    first: DropletListResponse = await do_client.droplets.list(
+        tag_name=tag_name, per_page=per_page, page=1
+    )
+    droplets = list(first["droplets"])
+    total = first.get("meta", {}).get("total", len(droplets))
+    last_page = math.ceil(total / per_page)
+    if last_page <= 1:
+        return droplets
+
+    rest: list[DropletListResponse] = await asyncio.gather(
+        *(
+            do_client.droplets.list(tag_name=tag_name, per_page=per_page, page=page)
+            for page in range(2, last_page + 1)
+        )
+    )
+    for res in rest:
+        droplets.extend(res["droplets"])
+    return droplets
+
+
+@dataclass
+class EnvironmentInventory:
+    """A snapshot of the Droplets in an environment, listed once and shared per run.
+
+    The snapshot is never re-read implicitly: call `refresh()` after creating or
+    destroying Droplets so that later steps (eg. DNS) see the new state.
+
+    With a `cache`, `fetch()` reuses a snapshot from a recent run & `refresh()` stores
+    a new one. Snapshots with Droplets that are still being provisioned are not stored,
+    as those Droplets are about to change, eg. to gain an IP address.
+    """
+
+    do_client: DO_Client | AsyncDO_Client
+    env: Environment
+    droplets: list[DropletResponse] = field(default_factory=list)
+    cache: DiskCache | None = None
+
+    @classmethod
+    def fetch(
+        cls, do_client: DO_Client, env: Environment, *, cache: DiskCache | None = None
+    ) -> "EnvironmentInventory":
+        inventory = cls(do_client, env, cache=cache)
+        if not inventory._load_cached():
+            inventory.refresh()
+        return inventory
+
+    @classmethod
+    async def fetch_async(
+        cls,
+        do_client: AsyncDO_Client,
+        env: Environment,
+        *,
+        cache: DiskCache | None = None,
+    ) -> "EnvironmentInventory":
+        inventory = cls(do_client, env, cache=cache)
+        if not inventory._load_cached():
+            await inventory.refresh_async()
+        return inventory
+
+    def refresh(self) -> None:
+        if isinstance(self.do_client, AsyncDO_Client):
+            raise TypeError("Use refresh_async() for an inventory with a pydo.aio client")
+        self.droplets = list(iter_droplets(self.do_client, tag_name=self.env.tag))
+        self._store()
+
+    async def refresh_async(self) -> None:
+        """Like `refresh()`, for an inventory holding a `pydo.aio` client."""
+        if isinstance(self.do_client, DO_Client):
+            raise TypeError("Use refresh() for an inventory with a sync pydo client")
+        self.droplets = await list_droplets_async(self.do_client, tag_name=self.env.tag)
+        self._store()
+
+    def wait_until_ready(
+        self,
+        wkids: Collection[UUID],
+        *,
+        timeout: float = DEFAULT_READY_TIMEOUT,
+        poll_interval: float | None = None,
+    ) -> set[UUID]:
+        """Refresh until the Droplets with `wkids` are active & have a public IP.
+
+        Each check lists the whole environment once, however many Droplets are
+        awaited. Gives up once `timeout` seconds have passed.
+
+        Returns:
+          The wkids of the Droplets that are still not ready.
+        """
+        if poll_interval is None:
+            poll_interval = READY_POLL_INTERVAL
+        started = time.monotonic()
+        not_ready = _not_ready(self.droplets, wkids)
+        while not_ready and (remaining := started + timeout - time.monotonic()) > 0:
+            time.sleep(min(poll_interval, remaining))
+            self.refresh()
+            not_ready = _not_ready(self.droplets, wkids)
+        _log_readiness(wkids, not_ready, time.monotonic() - started)
+        return not_ready
+
+    async def wait_until_ready_async(
+        self,
+        wkids: Collection[UUID],
+        *,
+        timeout: float = DEFAULT_READY_TIMEOUT,
+        poll_interval: float | None = None,
+    ) -> set[UUID]:
+        """Like `wait_until_ready()`, for an inventory holding a `pydo.aio` client."""
+        if poll_interval is None:
+            poll_interval = READY_POLL_INTERVAL
+        started = time.monotonic()
+        not_ready = _not_ready(self.droplets, wkids)
+        while not_ready and (remaining := started + timeout - time.monotonic()) > 0:
+            await asyncio.sleep(min(poll_interval, remaining))
+            await self.refresh_async()
+            not_ready = _not_ready(self.droplets, wkids)
+        _log_readiness(wkids, not_ready, time.monotonic() - started)
+        return not_ready
+
+    def invalidate(self) -> None:
+        """Drop the cached snapshot, call before changing the environment's Droplets."""
+        if self.cache is not None:
+            self.cache.invalidate(INVENTORY, self.env.tag)
+
+    def _load_cached(self) -> bool:
+        if self.cache is None:
+            return False
+        droplets = self.cache.get(INVENTORY, self.env.tag)
+        if droplets is None:
+            return False
+        self.droplets = droplets
+        return True
+
+    def _store(self) -> None:
+        if self.cache is None:
+            return
+        if all(d.get("status") == "active" for d in self.droplets):
+            self.cache.set(INVENTORY, self.env.tag, self.droplets)
+        else:
+            self.invalidate()
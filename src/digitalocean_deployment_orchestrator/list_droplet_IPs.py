@@ -4,7 +4,7 @@
 #   ```sh
 #   uv run python -m \
 #     digitalocean_deployment_orchestrator.list_droplet_IPs [-h] {test,live}
-#       [--tag sometag]
+#       [--tag sometag] [--cache-dir DIR] [--no-cache]
 #   ```
 #
 # Prerequisites:
@@ -14,14 +14,23 @@
 #     - [ ] A Digital Ocean token stored in env. var. `$DIGITALOCEAN__TOKEN`
 
 import argparse
+from collections.abc import Iterable
 from uuid import UUID
 
 from pydo import Client as DO_Client
 
+from digitalocean_deployment_orchestrator.cache import (
+    add_cache_arguments,
+    cache_from_args,
+)
+from digitalocean_deployment_orchestrator.clients import make_do_client
+from digitalocean_deployment_orchestrator.inventory import (
+    EnvironmentInventory,
+    iter_droplets,
+)
 from digitalocean_deployment_orchestrator.types import Environment
 from digitalocean_deployment_orchestrator.types_DO import (
     DigitalOceanCredentials,
-    DropletListResponse,
     DropletResponse,
     IPVersion,
 )
@@ -37,12 +46,20 @@ def get_droplet_ips_for_env(
     *,
     version: IPVersion | None = None,
     required_tags: set[str] | None = None,
+    inventory: EnvironmentInventory | None = None,
 ) -> dict[UUID, str]:
+    """Map the well-known UUID of each Droplet in `env` to its public IP address.
+
+    Reads Droplets from `inventory` when given, otherwise lists them from the API.
+    """
     if version is None:
         version = "v4"
 
-    droplets_res: DropletListResponse = do_client.droplets.list(tag_name=env.tag)
-    droplets: list[DropletResponse] = droplets_res["droplets"]
+    droplets: Iterable[DropletResponse]
+    if inventory is not None:
+        droplets = inventory.droplets
+    else:
+        droplets = iter_droplets(do_client, tag_name=env.tag)
 
     addresses = {}
     for d in droplets:
@@ -58,10 +75,14 @@ def get_droplet_ips_for_env(
 
 
 def main(
-    *, do_client: DO_Client, env: Environment, required_tags: set[str] | None = None
+    *,
+    do_client: DO_Client,
+    env: Environment,
+    required_tags: set[str] | None = None,
+    inventory: EnvironmentInventory | None = None,
 ):
     for ip in get_droplet_ips_for_env(
-        do_client, env, required_tags=required_tags
+        do_client, env, required_tags=required_tags, inventory=inventory
     ).values():
         print(ip)  # noqa: T201 <https://docs.astral.sh/ruff/rules/print>
 
@@ -81,11 +102,15 @@ if __name__ == "__main__":
         help="Tag to match Droplets against. May be supplied multiple times.",
     )
 
+    add_cache_arguments(parser)
     args = parser.parse_args()
 
     env = args.env
     required_tags = set(args.tag) if args.tag else None
 
     do_creds = DigitalOceanCredentials.from_env()
-    do_client = DO_Client(do_creds.digitalocean__token)
-    main(do_client=do_client, env=env, required_tags=required_tags)
+    do_client = make_do_client(do_creds.digitalocean__token)
+    inventory = None
+    if (cache := cache_from_args(args)) is not None:
+        inventory = EnvironmentInventory.fetch(do_client, env, cache=cache)
+    main(do_client=do_client, env=env, required_tags=required_tags, inventory=inventory)
@@ -7,6 +7,8 @@ import structlog
 def configure_logging():
     structlog.configure(
         processors=[
+            # eg. `environment` when several environments are applied at once
+            structlog.contextvars.merge_contextvars,
             structlog.stdlib.add_log_level,
             structlog.processors.TimeStamper(fmt="iso"),
             structlog.processors.JSONRenderer(
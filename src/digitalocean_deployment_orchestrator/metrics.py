@@ -0,0 +1,161 @@
+# Count & time the API requests made during a run, see `clients.py` for where they are
+# recorded. A summary is logged at the end of a run and may also be written to a file,
+# either as JSON or as a Prometheus textfile for node_exporter's textfile collector.
+
+import json
+import math
+import os
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import urlparse
+
+import structlog
+
+LOGGER = structlog.get_logger()
+
+
+@dataclass(frozen=True)
+class ApiCall:
+    provider: str
+    operation: str
+    duration: float
+    # `None` if no response was received
+    status: int | None
+    retries: int
+
+
+def operation_name(method: str, url: str) -> str:
+    """Name an API call by its method & path, with resource IDs replaced by '{id}'.
+
+    eg. 'DELETE https://api.digitalocean.com/v2/droplets/1234' is named
+    'DELETE /v2/droplets/{id}'.
+    """
+    segments = [
+        "{id}"
+        if segment.isdigit() or (len(segment) >= 16 and any(c.isdigit() for c in segment))
+        else segment
+        for segment in urlparse(url).path.split("/")
+    ]
+    return f"{method.upper()} {'/'.join(segments)}"
+
+
+def _percentile(sorted_values: list[float], percent: float) -> float:
+    # nearest-rank
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+@dataclass
+class ApiMetrics:
+    """Collects the API calls made during one run. Safe to share between threads."""
+
+    calls: list[ApiCall] = field(default_factory=list)
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock)
+
+    def record(self, call: ApiCall) -> None:
+        with self._lock:
+            self.calls.append(call)
+
+    def summary(self) -> list[dict]:
+        """Aggregate calls per (provider, operation), slowest operations first."""
+        with self._lock:
+            calls = list(self.calls)
+
+        by_operation: dict[tuple[str, str], list[ApiCall]] = {}
+        for call in calls:
+            by_operation.setdefault((call.provider, call.operation), []).append(call)
+
+        summary = []
+        for (provider, operation), op_calls in by_operation.items():
+            durations = sorted(c.duration for c in op_calls)
+            statuses: dict[str, int] = {}
+            for c in op_calls:
+                key = str(c.status) if c.status is not None else "error"
+                statuses[key] = statuses.get(key, 0) + 1
+            summary.append(
+                {
+                    "provider": provider,
+                    "operation": operation,
+                    "count": len(op_calls),
+                    "total": round(sum(durations), 6),
+                    "p50": round(_percentile(durations, 50), 6),
+                    "p95": round(_percentile(durations, 95), 6),
+                    "max": round(durations[-1], 6),
+                    "retries": sum(c.retries for c in op_calls),
+                    "statuses": dict(sorted(statuses.items())),
+                }
+            )
+        return sorted(summary, key=lambda s: s["total"], reverse=True)
+
+    def log_summary(self) -> None:
+        summary = self.summary()
+        LOGGER.info(
+            "API call summary",
+            calls=sum(s["count"] for s in summary),
+            total=round(sum(s["total"] for s in summary), 6),
+            operations=summary,
+        )
+
+    def write(self, path: Path) -> None:
+        """Write the summary to `path`, as a Prometheus textfile if it ends in '.prom'.
+
+        The file is replaced atomically so that a collector never reads it half-written.
+        """
+        if path.suffix == ".prom":
+            content = self._to_prometheus()
+        else:
+            content = json.dumps(self.summary(), indent=2) + "\n"
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def _to_prometheus(self) -> str:
+        summary = self.summary()
+        lines = []
+
+        def _labels(s: dict, **extra) -> str:
+            labels = {"provider": s["provider"], "operation": s["operation"], **extra}
+            return ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels.items())
+
+        lines += [
+            "# HELP dodo_api_requests_total API requests made, by final status.",
+            "# TYPE dodo_api_requests_total counter",
+        ]
+        for s in summary:
+            for status, count in s["statuses"].items():
+                lines.append(
+                    f"dodo_api_requests_total{{{_labels(s, status=status)}}} {count}"
+                )
+
+        lines += [
+            "# HELP dodo_api_request_retries_total API requests retried.",
+            "# TYPE dodo_api_request_retries_total counter",
+        ]
+        for s in summary:
+            lines.append(f"dodo_api_request_retries_total{{{_labels(s)}}} {s['retries']}")
+
+        lines += [
+            "# HELP dodo_api_request_duration_seconds API request latency, with retries.",
+            "# TYPE dodo_api_request_duration_seconds summary",
+        ]
+        for s in summary:
+            for quantile, key in (("0.5", "p50"), ("0.95", "p95"), ("1", "max")):
+                labels = _labels(s, quantile=quantile)
+                lines.append(f"dodo_api_request_duration_seconds{{{labels}}} {s[key]}")
+            labels = _labels(s)
+            lines.append(
+                f"dodo_api_request_duration_seconds_sum{{{labels}}} {s['total']}"
+            )
+            lines.append(
+                f"dodo_api_request_duration_seconds_count{{{labels}}} {s['count']}"
+            )
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -1,5 +1,6 @@
 # Types specific to Digital Ocean for use in DODO environment blueprints.
 
+from collections.abc import Callable
 from dataclasses import dataclass
 from enum import StrEnum
 from typing import Literal, NotRequired, TypedDict
@@ -38,6 +39,18 @@ class DropletImage(StrEnum):
     UBUNTU_2504_X64 = "ubuntu-25-04-x64"
 
 
+@dataclass(frozen=True)
+class SnapshotImage:
+    """Use as a `DropletRequest.image` to create Droplets from a snapshot by name.
+
+    eg. one made by `infra.bake`. `apply` resolves the name to the ID of the most
+    recent snapshot with it when Droplets are created. Pass an `int` image ID instead
+    to pin a specific snapshot.
+    """
+
+    name: str
+
+
 class BaseDroplet(TypedDict):
     name: str
     tags: list[str]
@@ -52,15 +65,17 @@ class DropletRequest(BaseDroplet):
 
     region: DORegion
     size: DropletSize
-    image: DropletImage
+    # a public image, or a private snapshot by name or ID
+    image: DropletImage | SnapshotImage | int
     # the fingerprint(s) of SSH keys to embed in the Droplet's root account
     ssh_keys: list[str]
     backups: NotRequired[bool]
     ipv6: NotRequired[bool]
     monitoring: NotRequired[bool]
-    # `user_data` should be the contents of a 'cloud-config' file
+    # `user_data` should be the contents of a 'cloud-config' file, or a callable that
+    # returns them when the Droplet is created eg. `infra.utils.DeferredCloudConfig`
     # <https://www.digitalocean.com/community/tutorials/an-introduction-to-cloud-config-scripting>
-    user_data: str
+    user_data: str | Callable[[], str]
     well_known_uuid: UUID
 
 
@@ -90,6 +105,7 @@ class DropletResponse(BaseDroplet):
 
     id: int
     status: DropletStatus
+    size_slug: str
     created_at: str
     networks: DropletNetworks
 
@@ -99,12 +115,29 @@ class DropletCreateResponse(TypedDict):
     links: dict
 
 
+class DropletMultiCreateResponse(TypedDict):
+    droplets: list[DropletResponse]
+    links: dict
+
+
 class DropletListResponse(TypedDict):
     droplets: list[DropletResponse]
     links: dict
     meta: MetaApiRes
 
 
+ActionStatus = Literal["in-progress", "completed", "errored"]
+
+
+class ActionResponse(TypedDict):
+    """<https://docs.digitalocean.com/reference/api/digitalocean/#tag/Droplet-Actions>"""
+
+    id: int
+    status: ActionStatus
+    type: str
+    resource_id: int
+
+
 class IPAddressForDroplet(TypedDict):
     """Use in env. blueprints to indirectly point to a Droplet's IP without revealing it.
 
@@ -19,6 +19,14 @@ def get_wkid_from_tags(tags: list[str]) -> UUID | None:
     return UUID(uuid_tags[0].split(":")[1])
 
 
+def get_spec_tag_from_tags(tags: list[str]) -> str | None:
+    """Get the `spec:<fingerprint>` tag a Droplet was created with, if any.
+
+    See `infra.types.DropletSpec.fingerprint`.
+    """
+    return next((t for t in tags if t.startswith("spec:")), None)
+
+
 def get_public_ip(
     droplet: DropletResponse, version: IPVersion | None = None
 ) -> str | None:
@@ -0,0 +1,296 @@
+import dataclasses
+from pathlib import Path
+from unittest.mock import patch
+from uuid import UUID
+
+import httpx
+import pytest
+
+from benchmarks.fake_api import (
+    FakeAPIServer,
+    FakeAPIState,
+    RateLimit,
+    serve_in_background,
+)
+from digitalocean_deployment_orchestrator import clients
+from digitalocean_deployment_orchestrator.infra.apply import apply
+from digitalocean_deployment_orchestrator.infra.bake import bake
+from digitalocean_deployment_orchestrator.infra.phone_home import PHONE_HOME_URL
+from digitalocean_deployment_orchestrator.infra.types import EnvironmentSpec
+from digitalocean_deployment_orchestrator.inventory import iter_droplets
+from digitalocean_deployment_orchestrator.types import Environment
+from digitalocean_deployment_orchestrator.types_cloudflare import DNSRecord
+from digitalocean_deployment_orchestrator.types_DO import (
+    DORegion,
+    DropletImage,
+    DropletRequest,
+    DropletSize,
+    IPAddressForDroplet,
+    SnapshotImage,
+)
+
+
+@pytest.fixture
+def server():
+    with serve_in_background(FakeAPIServer()) as server:
+        yield server
+
+
+def _do_client(server, **kwargs):
+    return clients.make_do_client("token", endpoint=server.url, **kwargs)
+
+
+def _cf_client(server, **kwargs):
+    return clients.make_cloudflare_client(
+        "token", base_url=f"{server.url}/client/v4", **kwargs
+    )
+
+
+def _blueprint(size: int) -> EnvironmentSpec:
+    return EnvironmentSpec.from_blueprint(
+        {
+            "environment": Environment.TEST,
+            "droplets": [
+                DropletRequest(
+                    name=f"web-{i}",
+                    region=DORegion.LONDON1,
+                    size=DropletSize.BASIC_YOCTO,
+                    image=DropletImage.DEBIAN_13_X64,
+                    ssh_keys=["ab:cd"],
+                    tags=["web"],
+                    vpc_uuid="",
+                    user_data="#cloud-config",
+                    well_known_uuid=UUID(int=i),
+                )
+                for i in range(size)
+            ],
+            "dns": [
+                DNSRecord(
+                    cf_zone_name="example.com",
+                    type="A",
+                    name=f"web-{i}",
+                    content=IPAddressForDroplet(droplet_wkid=UUID(int=i)),
+                    ttl=None,
+                    proxied=True,
+                )
+                for i in range(size)
+            ],
+        }
+    )
+
+
+def test_droplets_are_paginated(server):
+    for i in range(450):
+        server.state.add_droplet(f"web-{i}", ["env:test"])
+
+    droplets = list(iter_droplets(_do_client(server), tag_name="env:test"))
+
+    assert len(droplets) == 450
+    assert server.requests[("digitalocean", "GET", "_do_droplets_list")] == 3
+
+
+def test_apply_converges_against_fake_api(server):
+    zone_id = server.state.add_zone("example.com")
+    blueprint = _blueprint(12)
+    do_client, cf_client = _do_client(server), _cf_client(server)
+
+    apply(False, do_client, cf_client, Path(), Environment.TEST, blueprint=blueprint)
+
+    droplets = list(server.state.droplets.values())
+    assert len(droplets) == 12
+    assert all("env:test" in d["tags"] for d in droplets)
+    assert {d["name"] for d in droplets} == {f"web-{i}" for i in range(12)}
+    records = server.state.records[zone_id].values()
+    assert {r["name"] for r in records} == {f"web-{i}.example.com" for i in range(12)}
+
+    server.requests.clear()
+    apply(False, do_client, cf_client, Path(), Environment.TEST, blueprint=blueprint)
+
+    assert len(server.state.droplets) == 12
+    assert not any(method != "GET" for _, method, _ in server.requests)
+
+
+def test_apply_resizes_droplets_in_place(server):
+    server.state.add_zone("example.com")
+    blueprint = _blueprint(3)
+    do_client, cf_client = _do_client(server), _cf_client(server)
+    apply(False, do_client, cf_client, Path(), Environment.TEST, blueprint=blueprint)
+    droplet_ids = set(server.state.droplets)
+
+    resized = dataclasses.replace(blueprint.droplets[1], size=DropletSize.BASIC_ZEPTO)
+    blueprint = dataclasses.replace(
+        blueprint, droplets=(blueprint.droplets[0], resized, blueprint.droplets[2])
+    )
+    apply(False, do_client, cf_client, Path(), Environment.TEST, blueprint=blueprint)
+
+    assert set(server.state.droplets) == droplet_ids
+    sizes = {d["name"]: d["size_slug"] for d in server.state.droplets.values()}
+    assert sizes == {
+        "web-0": "s-1vcpu-512mb-10gb",
+        "web-1": "s-1vcpu-1gb",
+        "web-2": "s-1vcpu-512mb-10gb",
+    }
+    assert not server.state.powered_off
+    actions = [a["type"] for a in server.state.actions.values()]
+    assert actions == ["shutdown", "resize", "power_on"]
+    spec_tags = {
+        d["name"]: [t for t in d["tags"] if t.startswith("spec:")]
+        for d in server.state.droplets.values()
+    }
+    assert spec_tags == {d.name: [d.spec_tag] for d in blueprint.droplets}
+
+
+class _ProvisionedAtOnce:
+    """A phone home listener that every builder Droplet reports to immediately."""
+
+    url = "http://203.0.113.1:8090/token"
+
+    def wait(self, droplet_ids, timeout):
+        yield from ((droplet_id, 0.0) for droplet_id in droplet_ids)
+
+
+def test_apply_creates_droplets_from_baked_snapshot(server):
+    server.state.add_zone("example.com")
+    blueprint = _blueprint(2)
+    do_client, cf_client = _do_client(server), _cf_client(server)
+    builder_spec = dataclasses.replace(
+        blueprint.droplets[0], user_data=lambda: f"url: {PHONE_HOME_URL.get()}"
+    )
+
+    image_id = bake(do_client, builder_spec, "web-baked", _ProvisionedAtOnce())
+
+    assert not server.state.droplets
+    assert server.state.snapshot_of.keys() == {image_id}
+
+    snapshot = SnapshotImage("web-baked")
+    blueprint = dataclasses.replace(
+        blueprint,
+        droplets=tuple(
+            dataclasses.replace(d, image=snapshot) for d in blueprint.droplets
+        ),
+    )
+    apply(False, do_client, cf_client, Path(), Environment.TEST, blueprint=blueprint)
+
+    images = [d["image"] for d in server.state.droplets.values()]
+    assert images == [{"id": image_id, "name": "web-baked"}] * 2
+    assert server.requests[("digitalocean", "GET", "_do_images_list")] == 1
+
+
+def test_create_rejects_unknown_image(server):
+    body = {"name": "web", "region": "lon1", "size": "s-1vcpu-1gb", "image": 99}
+
+    response = httpx.post(
+        f"{server.url}/v2/droplets",
+        json=body,
+        headers={"authorization": "Bearer token"},
+    )
+
+    assert response.status_code == 422
+    assert not server.state.droplets
+
+
+def test_rate_limited_requests_are_retried():
+    now = [0.0]
+    server = FakeAPIServer(
+        rate_limits={
+            "digitalocean": RateLimit(limit=2, window=60, clock=lambda: now[0]),
+            "cloudflare": RateLimit(limit=1, window=60),
+        }
+    )
+
+    def _sleep(seconds):
+        now[0] += seconds
+
+    with (
+        serve_in_background(server),
+        patch("digitalocean_deployment_orchestrator.clients.time.sleep", _sleep),
+    ):
+        do_client = _do_client(server)
+        for _ in range(3):
+            do_client.droplets.list(per_page=1, page=1)
+
+    assert now[0] >= 60
+    assert server.requests[("digitalocean", "GET", "_do_droplets_list")] == 3
+
+
+@patch("digitalocean_deployment_orchestrator.inventory.READY_POLL_INTERVAL", 0.05)
+def test_apply_waits_for_new_droplets_before_writing_dns():
+    state = FakeAPIState(boot_time=0.2)
+    zone_id = state.add_zone("example.com")
+
+    with serve_in_background(FakeAPIServer(state=state)) as server:
+        apply(
+            False,
+            _do_client(server),
+            _cf_client(server),
+            Path(),
+            Environment.TEST,
+            blueprint=_blueprint(3),
+        )
+
+    records = state.records[zone_id].values()
+    assert sorted(r["content"] for r in records) == ["10.0.0.1", "10.0.0.2", "10.0.0.3"]
+
+
+def test_droplets_boot_before_reporting_an_ip_address():
+    now = [0.0]
+    state = FakeAPIState(boot_time=30, clock=lambda: now[0])
+
+    droplet = state.add_droplet("web", ["env:test"])
+    assert (droplet["status"], droplet["networks"]["v4"]) == ("new", [])
+
+    now[0] = 30
+    droplet = state.droplet_view(state.droplets[droplet["id"]])
+    assert droplet["status"] == "active"
+    assert droplet["networks"]["v4"][0]["type"] == "public"
+
+
+def test_injected_errors_use_provider_error_shape():
+    with serve_in_background(FakeAPIServer(error_rate=1.0)) as server:
+        response = httpx.get(
+            f"{server.url}/client/v4/zones", headers={"authorization": "Bearer t"}
+        )
+
+    assert response.status_code == 503
+    assert response.json()["success"] is False
+    assert "ratelimit-remaining" in response.headers
+
+
+def test_unauthenticated_requests_are_rejected(server):
+    response = httpx.get(f"{server.url}/v2/droplets")
+
+    assert response.status_code == 401
+    assert response.json()["id"] == "unauthorized"
+
+
+def test_dns_batch_is_all_or_nothing(server):
+    zone_id = server.state.add_zone("example.com")
+    headers = {"authorization": "Bearer t"}
+
+    response = httpx.post(
+        f"{server.url}/client/v4/zones/{zone_id}/dns_records/batch",
+        headers=headers,
+        json={
+            "posts": [{"name": "www", "type": "A", "content": "192.0.2.1"}],
+            "deletes": [{"id": "missing"}],
+        },
+    )
+
+    assert response.status_code == 404
+    assert server.state.records[zone_id] == {}
+
+
+class TestApiUrlOverride:
+    def test_make_do_client_uses_env_var(self, monkeypatch):
+        monkeypatch.setenv(clients.DO_API_URL_ENV_VAR, "http://127.0.0.1:8080")
+
+        do_client = clients.make_do_client("token")
+
+        assert do_client._client._base_url == "http://127.0.0.1:8080"
+
+    def test_make_cloudflare_client_uses_env_var(self, monkeypatch):
+        monkeypatch.setenv(clients.CLOUDFLARE_API_URL_ENV_VAR, "http://127.0.0.1/v4")
+
+        cf_client = clients.make_cloudflare_client("token")
+
+        assert str(cf_client.base_url).rstrip("/") == "http://127.0.0.1/v4"
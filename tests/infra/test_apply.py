@@ -1,25 +1,62 @@
+import dataclasses
 import json
+import runpy
+import threading
 import types
+from dataclasses import dataclass
 from pathlib import Path
-from unittest.mock import MagicMock, call, patch
+from unittest.mock import ANY, MagicMock, call, patch
 from uuid import UUID
 
 import pytest
+from cloudflare import NotFoundError
 
+from digitalocean_deployment_orchestrator.cache import INVENTORY, ZONE_ID, DiskCache
 from digitalocean_deployment_orchestrator.infra import apply
+from digitalocean_deployment_orchestrator.infra.types import (
+    DropletPlan,
+    DropletSpec,
+    EnvironmentSpec,
+)
+from digitalocean_deployment_orchestrator.infra.utils import DeferredCloudConfig
+from digitalocean_deployment_orchestrator.types import Environment, EnvVarDataClass
+from digitalocean_deployment_orchestrator.types_DO import (
+    DORegion,
+    DropletImage,
+    DropletRequest,
+    DropletSize,
+    SnapshotImage,
+)
+
+
+def _droplet_request(name: str, wkid: UUID, user_data="secret") -> DropletRequest:
+    return DropletRequest(
+        name=name,
+        region=DORegion.LONDON1,
+        size=DropletSize.BASIC_YOCTO,
+        image=DropletImage.DEBIAN_13_X64,
+        ssh_keys=["ab:cd"],
+        tags=["web"],
+        vpc_uuid="",
+        user_data=user_data,
+        well_known_uuid=wkid,
+    )
+
+
+def _droplet_spec(name: str, wkid: UUID, user_data="secret") -> DropletSpec:
+    return DropletSpec.from_request(
+        _droplet_request(name, wkid, user_data), Environment.TEST
+    )
 
 
 @pytest.fixture
 def fake_blueprint(tmp_path):
     bp = {
-        "environment": MagicMock(value="prod"),
+        "environment": Environment.TEST,
         "droplets": [
-            {
-                "name": "web",
-                "well_known_uuid": UUID("12345678-1234-5678-1234-567812345678"),
-                "tags": [],
-            }
+            _droplet_request("web", UUID("12345678-1234-5678-1234-567812345678"))
         ],
+        "dns": [],
     }
     module_path = tmp_path / "bp1.py"
     module_path.write_text("BLUEPRINT = {}")  # overwritten later in test
@@ -38,9 +75,16 @@ class TestLoadEnvironmentBlueprint:
 
         result = apply.load_environment_blueprint(tmp_path, bp["environment"])
 
-        droplet = result["droplets"][0]
-        assert any(tag.startswith("env:") for tag in droplet["tags"])
-        assert any(tag.startswith("wkid:") for tag in droplet["tags"])
+        droplet = result.droplets[0]
+        assert droplet.tags == (
+            "web",
+            "env:test",
+            "wkid:12345678-1234-5678-1234-567812345678",
+            droplet.spec_tag,
+        )
+        # the blueprint itself is left untouched, and user_data is shared not copied
+        assert bp["droplets"][0]["tags"] == ["web"]
+        assert droplet.user_data is bp["droplets"][0]["user_data"]
         mock_import.assert_called_once_with(module_path)
 
     @patch("digitalocean_deployment_orchestrator.infra.apply.import_module_from_path")
@@ -58,6 +102,25 @@ class TestLoadEnvironmentBlueprint:
         with pytest.raises(ValueError):
             apply.load_environment_blueprint(tmp_path, bp["environment"])
 
+    @patch("digitalocean_deployment_orchestrator.infra.apply.import_module_from_path")
+    def test_load_environment_blueprint_only_imports_matching_module(
+        self, mock_import, tmp_path
+    ):
+        bp = {"environment": Environment.TEST, "droplets": []}
+        mock_import.return_value = types.SimpleNamespace(BLUEPRINT=bp)
+        (tmp_path / "live.py").write_text("BLUEPRINT = build()")
+        (tmp_path / "other.py").write_text(
+            "BLUEPRINT = EnvironmentBlueprint(environment=Environment.LIVE)"
+        )
+        test_module_path = tmp_path / "test.py"
+        test_module_path.write_text(
+            "BLUEPRINT = EnvironmentBlueprint(environment=Environment.TEST)"
+        )
+
+        apply.load_environment_blueprint(tmp_path, Environment.TEST)
+
+        mock_import.assert_called_once_with(test_module_path)
+
     @patch("digitalocean_deployment_orchestrator.infra.apply.import_module_from_path")
     def test_load_environment_blueprint_none_found(self, mock_import, tmp_path):
         mock_import.return_value = types.SimpleNamespace()
@@ -92,6 +155,7 @@ def fake_cf_client():
     client.zones.get.return_value = None
 
     client.dns.records.list.return_value.result = []
+    client.dns.records.list.return_value.result_info = None
     client.dns.records.update.return_value = {}
     client.dns.records.create.return_value = {}
 
@@ -99,45 +163,32 @@ def fake_cf_client():
 
 
 class TestManageDroplets:
-    @patch("digitalocean_deployment_orchestrator.infra.apply.get_wkid_from_tags")
-    def test_manage_droplets_no_changes(self, mock_get_wkid, fake_do_client, fake_env):
-        mock_get_wkid.side_effect = [UUID("a" * 32)] * 2
+    def test_manage_droplets_no_changes(self, fake_do_client, fake_env):
+        wkid = UUID("a" * 32)
         fake_do_client.droplets.list.return_value = {
-            "droplets": [{"tags": ["wkid:a" * 32], "name": "existing"}]
+            "droplets": [{"tags": [f"wkid:{wkid}"], "name": "existing"}]
         }
 
-        bp_droplet = {
-            "tags": ["wkid:a" * 32],
-            "well_known_uuid": UUID("a" * 32),
-            "name": "existing",
-        }
+        bp_droplet = _droplet_spec("existing", wkid)
         apply.manage_droplets(True, fake_do_client, fake_env, [bp_droplet])
 
         fake_do_client.droplets.create.assert_not_called()
         fake_do_client.droplets.destroy.assert_not_called()
 
-    @patch("digitalocean_deployment_orchestrator.infra.apply.get_wkid_from_tags")
-    def test_manage_droplets_dry_run_creates(
-        self, mock_get_wkid, fake_do_client, fake_env, capsys
-    ):
-        mock_get_wkid.side_effect = [None, UUID("1" * 32), UUID("1" * 32)]
-        bp_droplet = {
-            "name": "web",
-            "tags": ["wkid:11111111-1111-1111-1111-111111111111"],
-            "well_known_uuid": UUID("1" * 32),
-            "user_data": "secret",
-        }
+    def test_manage_droplets_dry_run_creates(self, fake_do_client, fake_env, capsys):
+        bp_droplet = _droplet_spec("web", UUID("1" * 32))
 
         apply.manage_droplets(True, fake_do_client, fake_env, [bp_droplet])
 
-        logs = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        out = capsys.readouterr().out
+        assert "secret" not in out
+        logs = [json.loads(line) for line in out.splitlines() if line.startswith('{"')]
         events = {entry["event"]: entry for entry in logs}
         assert "Droplets to create" in events
         assert events["Droplet comparison"]["to_create"] == 1
         fake_do_client.droplets.create.assert_not_called()
 
-    @patch("digitalocean_deployment_orchestrator.infra.apply.get_wkid_from_tags")
-    def test_manage_droplets_creates(self, mock_get_wkid):
+    def test_manage_droplets_creates(self):
         fake_do_client = MagicMock()
         fake_env = MagicMock()
         fake_env.tag = "env:test"
@@ -146,27 +197,29 @@ class TestManageDroplets:
         fake_do_client.droplets.list.return_value = {"droplets": []}
         fake_do_client.droplets.create.return_value = {"droplet": {"id": 999}}
 
-        mock_get_wkid.return_value = UUID("1" * 32)
-
-        bp_droplet = {
-            "name": "web",
-            "tags": ["wkid:11111111-1111-1111-1111-111111111111"],
-            "well_known_uuid": UUID("1" * 32),
-            "user_data": "secret",
-        }
+        bp_droplet = _droplet_spec("web", UUID("1" * 32))
 
         apply.manage_droplets(False, fake_do_client, fake_env, [bp_droplet])
 
         fake_do_client.droplets.create.assert_called_once()
         call_args = fake_do_client.droplets.create.call_args[1]
-        assert "body" in call_args
-        assert call_args["body"]["name"] == "web"
+        assert call_args["body"] == {
+            "name": "web",
+            "region": "lon1",
+            "size": "s-1vcpu-512mb-10gb",
+            "image": "debian-13-x64",
+            "ssh_keys": ["ab:cd"],
+            "tags": [
+                "web",
+                "env:test",
+                "wkid:11111111-1111-1111-1111-111111111111",
+                bp_droplet.spec_tag,
+            ],
+            "vpc_uuid": "",
+            "user_data": "secret",
+        }
 
-    @patch("digitalocean_deployment_orchestrator.infra.apply.get_wkid_from_tags")
-    def test_manage_droplets_destroy_dry_run(
-        self, mock_get_wkid, fake_do_client, fake_env, capsys
-    ):
-        mock_get_wkid.side_effect = [UUID("1" * 32), None, UUID("1" * 32)]
+    def test_manage_droplets_destroy_dry_run(self, fake_do_client, fake_env, capsys):
         fake_do_client.droplets.list.return_value = {
             "droplets": [
                 {
@@ -179,16 +232,15 @@ class TestManageDroplets:
 
         apply.manage_droplets(True, fake_do_client, fake_env, [])
 
-        logs = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        out = capsys.readouterr().out
+        assert "Would destroy Droplet:" in out
+        logs = [json.loads(line) for line in out.splitlines() if line.startswith('{"')]
         events = {entry["event"]: entry for entry in logs}
         assert "Droplets to destroy" in events
         assert events["Droplet comparison"]["to_destroy"] == 1
         fake_do_client.droplets.create.assert_not_called()
 
-    @patch("digitalocean_deployment_orchestrator.infra.apply.get_wkid_from_tags")
-    def test_manage_droplets_destroy(self, mock_get_wkid, fake_do_client, fake_env):
-        mock_get_wkid.return_value = UUID("1" * 32)
-
+    def test_manage_droplets_destroy(self, fake_do_client, fake_env):
         fake_do_client.droplets.list.return_value = {
             "droplets": [
                 {
@@ -203,6 +255,435 @@ class TestManageDroplets:
 
         fake_do_client.droplets.destroy.assert_called_once_with(droplet_id=123)
 
+    def test_manage_droplets_refreshes_inventory_after_mutation(
+        self, fake_do_client, fake_env
+    ):
+        inventory = MagicMock(droplets=[])
+        bp_droplet = _droplet_spec("web", UUID("1" * 32))
+
+        apply.manage_droplets(
+            False, fake_do_client, fake_env, [bp_droplet], inventory=inventory
+        )
+
+        fake_do_client.droplets.list.assert_not_called()
+        inventory.refresh.assert_called_once()
+
+    def test_manage_droplets_renders_deferred_user_data_only_on_create(
+        self, fake_do_client, fake_env
+    ):
+        existing_wkid, new_wkid = UUID("1" * 32), UUID("2" * 32)
+        fake_do_client.droplets.list.return_value = {
+            "droplets": [{"id": 1, "name": "old", "tags": [f"wkid:{existing_wkid}"]}]
+        }
+        renders = []
+
+        def existing_user_data():
+            renders.append("old")
+            return "#cloud-config"
+
+        def new_user_data():
+            renders.append("new")
+            return "#cloud-config"
+
+        bp_droplets = [
+            _droplet_spec("old", existing_wkid, existing_user_data),
+            _droplet_spec("new", new_wkid, new_user_data),
+        ]
+
+        apply.manage_droplets(False, fake_do_client, fake_env, bp_droplets)
+
+        assert renders == ["new"]
+        body = fake_do_client.droplets.create.call_args.kwargs["body"]
+        assert body["user_data"] == "#cloud-config"
+
+    def test_manage_droplets_collects_errors_and_continues(
+        self, fake_do_client, fake_env, capsys
+    ):
+        wkids = [UUID(c * 32) for c in "123"]
+        # distinct user_data so that each Droplet is created by its own request
+        bp_droplets = [
+            _droplet_spec(f"web-{i}", wkid, f"#cloud-config {i}")
+            for i, wkid in enumerate(wkids)
+        ]
+
+        def create_side_effect(body):
+            if body["name"] == "web-1":
+                raise RuntimeError("boom")
+            return {"droplet": {"id": 1}}
+
+        fake_do_client.droplets.create.side_effect = create_side_effect
+
+        with pytest.raises(RuntimeError, match="1 of 3 operation"):
+            apply.manage_droplets(
+                False, fake_do_client, fake_env, bp_droplets, max_parallel=2
+            )
+
+        assert fake_do_client.droplets.create.call_count == 3
+        logs = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        summary = next(e for e in logs if e["event"] == "Droplet operations summary")
+        assert summary["succeeded"] == 2
+        assert summary["errors"] == [
+            {"kind": "create", "target": str(wkids[1]), "err": "boom"}
+        ]
+
+    def test_manage_droplets_batches_identical_creates(self, fake_do_client, fake_env):
+        bp_droplets = [_droplet_spec(f"web-{i}", UUID(int=i)) for i in range(12)]
+
+        def create_side_effect(body):
+            return {
+                "droplets": [
+                    {"id": int(name.removeprefix("web-")), "name": name}
+                    for name in body["names"]
+                ]
+            }
+
+        fake_do_client.droplets.create.side_effect = create_side_effect
+
+        apply.manage_droplets(False, fake_do_client, fake_env, bp_droplets)
+
+        bodies = [c.kwargs["body"] for c in fake_do_client.droplets.create.call_args_list]
+        assert [len(b["names"]) for b in bodies] == [10, 2]
+        spec_tag = bp_droplets[0].spec_tag
+        assert all(b["tags"] == ["web", "env:test", spec_tag] for b in bodies)
+        assert "name" not in bodies[0]
+        assert fake_do_client.tags.create.call_count == 12
+        fake_do_client.tags.assign_resources.assert_any_call(
+            tag_id=f"wkid:{UUID(int=11)}",
+            body={"resources": [{"resource_id": "11", "resource_type": "droplet"}]},
+        )
+
+    def test_manage_droplets_destroys_droplets_it_could_not_tag(
+        self, fake_do_client, fake_env, capsys
+    ):
+        bp_droplets = [_droplet_spec(f"web-{i}", UUID(int=i)) for i in range(3)]
+        fake_do_client.droplets.create.return_value = {
+            "droplets": [{"id": i, "name": f"web-{i}"} for i in range(3)]
+        }
+
+        def assign_resources(tag_id, body):
+            if tag_id == f"wkid:{UUID(int=1)}":
+                raise RuntimeError("tag quota exceeded")
+
+        fake_do_client.tags.assign_resources.side_effect = assign_resources
+
+        with pytest.raises(RuntimeError, match="1 of 1 operation"):
+            apply.manage_droplets(False, fake_do_client, fake_env, bp_droplets)
+
+        fake_do_client.droplets.destroy.assert_called_once_with(droplet_id=1)
+        logs = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        summary = next(e for e in logs if e["event"] == "Droplet operations summary")
+        assert summary["errors"][0]["err"] == (
+            f"Could not tag 1 new Droplet(s) with their wkid: {UUID(int=1)}"
+        )
+
+    def test_manage_droplets_resize_dry_run(self, fake_do_client, fake_env, capsys):
+        wkid = UUID(int=1)
+        fake_do_client.droplets.list.return_value = {
+            "droplets": [
+                {
+                    "id": 5,
+                    "name": "web",
+                    "tags": [f"wkid:{wkid}"],
+                    "size_slug": "s-1vcpu-1gb",
+                }
+            ]
+        }
+
+        plan = apply.manage_droplets(
+            True, fake_do_client, fake_env, [_droplet_spec("web", wkid)]
+        )
+
+        assert [(d["id"], spec.well_known_uuid) for d, spec in plan.to_resize] == [
+            (5, wkid)
+        ]
+        out = capsys.readouterr().out
+        assert "Would resize Droplet:" in out
+        logs = [json.loads(line) for line in out.splitlines() if line.startswith('{"')]
+        events = {entry["event"]: entry for entry in logs}
+        assert events["Droplets to resize"]["droplets"] == {
+            "web": "s-1vcpu-1gb -> s-1vcpu-512mb-10gb"
+        }
+        fake_do_client.droplet_actions.post.assert_not_called()
+
+    @patch("digitalocean_deployment_orchestrator.infra.apply.resize")
+    def test_manage_droplets_resizes_drifted_droplets_one_at_a_time(
+        self, mock_resize, fake_do_client, fake_env
+    ):
+        lock = threading.Lock()
+        in_flight = peak = 0
+
+        def resize(*args, **kwargs):
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            threading.Event().wait(0.01)
+            with lock:
+                in_flight -= 1
+
+        mock_resize.side_effect = resize
+        wkids = [UUID(int=i) for i in range(3)]
+        fake_do_client.droplets.list.return_value = {
+            "droplets": [
+                {
+                    "id": i,
+                    "name": f"web-{i}",
+                    "tags": [f"wkid:{wkid}"],
+                    "status": "off" if i == 0 else "active",
+                    "size_slug": "s-1vcpu-512mb-10gb" if i == 2 else "s-1vcpu-1gb",
+                }
+                for i, wkid in enumerate(wkids)
+            ]
+        }
+        bp_droplets = [_droplet_spec(f"web-{i}", wkid) for i, wkid in enumerate(wkids)]
+
+        apply.manage_droplets(False, fake_do_client, fake_env, bp_droplets)
+
+        assert sorted(mock_resize.call_args_list, key=lambda c: c.args[1]) == [
+            call(fake_do_client, 0, "s-1vcpu-512mb-10gb", is_powered_on=False),
+            call(fake_do_client, 1, "s-1vcpu-512mb-10gb", is_powered_on=True),
+        ]
+        assert peak == 1
+        fake_do_client.droplets.create.assert_not_called()
+        fake_do_client.droplets.destroy.assert_not_called()
+
+    def test_manage_droplets_ignores_droplets_of_unknown_size(
+        self, fake_do_client, fake_env
+    ):
+        wkid = UUID(int=1)
+        fake_do_client.droplets.list.return_value = {
+            "droplets": [{"id": 5, "name": "web", "tags": [f"wkid:{wkid}"]}]
+        }
+
+        plan = apply.manage_droplets(
+            False, fake_do_client, fake_env, [_droplet_spec("web", wkid)]
+        )
+
+        assert plan.is_empty
+
+    def test_manage_droplets_trusts_matching_spec_tag(self, fake_do_client, fake_env):
+        droplet_spec = _droplet_spec("web", UUID(int=1))
+        fake_do_client.droplets.list.return_value = {
+            "droplets": [
+                {
+                    "id": 5,
+                    "name": "web",
+                    "tags": list(droplet_spec.tags),
+                    # a matching fingerprint is not compared any further
+                    "size_slug": "s-1vcpu-1gb",
+                }
+            ]
+        }
+
+        plan = apply.manage_droplets(False, fake_do_client, fake_env, [droplet_spec])
+
+        assert plan.is_empty
+
+    def test_manage_droplets_flags_drifted_droplets(
+        self, fake_do_client, fake_env, capsys
+    ):
+        droplet_spec = _droplet_spec("web", UUID(int=1))
+        created_from = _droplet_spec("web", UUID(int=1), "#cloud-config old")
+        fake_do_client.droplets.list.return_value = {
+            "droplets": [
+                {
+                    "id": 5,
+                    "name": "web",
+                    "tags": list(created_from.tags),
+                    "size_slug": "s-1vcpu-512mb-10gb",
+                }
+            ]
+        }
+
+        plan = apply.manage_droplets(False, fake_do_client, fake_env, [droplet_spec])
+
+        assert plan.is_empty
+        logs = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        drifted = [e for e in logs if e["event"].startswith("Droplets drifted")]
+        assert drifted[0]["droplets"] == {"web": str(UUID(int=1))}
+        assert drifted[0]["level"] == "warning"
+
+    @patch("digitalocean_deployment_orchestrator.infra.apply.resize")
+    def test_manage_droplets_retags_resized_droplets(
+        self, mock_resize, fake_do_client, fake_env
+    ):
+        droplet_spec = _droplet_spec("web", UUID(int=1))
+        created_from = dataclasses.replace(droplet_spec, size=DropletSize.BASIC_ZEPTO)
+        fake_do_client.droplets.list.return_value = {
+            "droplets": [
+                {
+                    "id": 5,
+                    "name": "web",
+                    "tags": list(created_from.tags),
+                    "size_slug": "s-1vcpu-1gb",
+                }
+            ]
+        }
+
+        apply.manage_droplets(False, fake_do_client, fake_env, [droplet_spec])
+
+        mock_resize.assert_called_once()
+        body = {"resources": [{"resource_id": "5", "resource_type": "droplet"}]}
+        fake_do_client.tags.assign_resources.assert_called_once_with(
+            tag_id=droplet_spec.spec_tag, body=body
+        )
+        fake_do_client.tags.unassign_resources.assert_called_once_with(
+            tag_id=created_from.spec_tag, body=body
+        )
+
+    @patch("digitalocean_deployment_orchestrator.infra.apply.resize")
+    def test_manage_droplets_keeps_tag_of_resized_droplets_that_drifted(
+        self, mock_resize, fake_do_client, fake_env
+    ):
+        droplet_spec = _droplet_spec("web", UUID(int=1))
+        created_from = dataclasses.replace(
+            droplet_spec, size=DropletSize.BASIC_ZEPTO, ssh_keys=("ef:01",)
+        )
+        fake_do_client.droplets.list.return_value = {
+            "droplets": [
+                {
+                    "id": 5,
+                    "name": "web",
+                    "tags": list(created_from.tags),
+                    "size_slug": "s-1vcpu-1gb",
+                }
+            ]
+        }
+
+        apply.manage_droplets(False, fake_do_client, fake_env, [droplet_spec])
+
+        mock_resize.assert_called_once()
+        fake_do_client.tags.unassign_resources.assert_not_called()
+
+
+class TestDropletFingerprint:
+    def test_ignores_name_and_wkid(self):
+        assert (
+            _droplet_spec("web-0", UUID(int=0)).spec_tag
+            == _droplet_spec("web-1", UUID(int=1)).spec_tag
+        )
+
+    @pytest.mark.parametrize(
+        "changes",
+        [
+            {"size": DropletSize.BASIC_ZEPTO},
+            {"image": SnapshotImage("web-baked")},
+            {"ssh_keys": ("ef:01",)},
+            {"base_tags": ("web", "canary")},
+            {"user_data": "#cloud-config changed"},
+        ],
+    )
+    def test_changes_with_spec(self, changes):
+        droplet_spec = _droplet_spec("web", UUID(int=1))
+
+        assert dataclasses.replace(droplet_spec, **changes).spec_tag != (
+            droplet_spec.spec_tag
+        )
+
+    def test_does_not_render_callable_user_data(self):
+        renders = []
+
+        def user_data():
+            renders.append(1)
+            return "#cloud-config"
+
+        assert _droplet_spec("web", UUID(int=1), user_data).fingerprint
+        assert renders == []
+
+    def test_callable_user_data_without_fingerprint_always_drifts(self):
+        def user_data():
+            return "#cloud-config"
+
+        droplet_spec = _droplet_spec("web", UUID(int=1), user_data)
+
+        assert droplet_spec.spec_tag != droplet_spec.spec_tag
+
+    def test_plans_existing_droplets_without_environment_variables(
+        self, tmp_path, monkeypatch, fake_env
+    ):
+        @dataclass(frozen=True)
+        class ServerEnv(EnvVarDataClass):
+            server__password: str
+
+        monkeypatch.delenv("SERVER__PASSWORD", raising=False)
+        tpl = tmp_path / "server.yaml.jinja"
+        tpl.write_text("password: {{ server__password }}")
+        droplet_spec = _droplet_spec(
+            "web", UUID(int=1), DeferredCloudConfig(tpl, ServerEnv)
+        )
+        droplet = {
+            "id": 5,
+            "tags": list(droplet_spec.tags),
+            "size_slug": str(DropletSize.BASIC_YOCTO),
+        }
+
+        plan = apply._plan_droplets(True, fake_env, [droplet], [droplet_spec])
+
+        assert plan.is_empty
+        assert "password" not in droplet_spec.spec_tag
+
+
+class TestBatchDropletCreates:
+    def test_only_identical_droplets_are_batched(self):
+        web = [_droplet_spec(f"web-{i}", UUID(int=i)) for i in range(3)]
+        worker = _droplet_spec("worker", UUID(int=9), "#cloud-config worker")
+
+        batches = apply._batch_droplet_creates([web[0], worker, web[1], web[2]])
+
+        assert batches == [web, [worker]]
+
+    def test_duplicate_names_are_split_across_batches(self):
+        first, second = (_droplet_spec("web", UUID(int=i)) for i in range(2))
+
+        assert apply._batch_droplet_creates([first, second]) == [[first], [second]]
+
+
+class TestResolveSnapshotImages:
+    def test_resolves_names_to_latest_snapshot_ids(self, fake_do_client):
+        baked = dataclasses.replace(
+            _droplet_spec("web", UUID(int=1)), image=SnapshotImage("web-baked")
+        )
+        public = _droplet_spec("db", UUID(int=2))
+        fake_do_client.images.list.side_effect = [
+            {
+                "images": [
+                    {"id": 10, "name": "web-baked", "created_at": "2026-01-01T00:00Z"},
+                    {"id": 11, "name": "db-baked", "created_at": "2026-03-01T00:00Z"},
+                ],
+                "links": {"pages": {"next": "https://api/v2/images?page=2"}},
+            },
+            {
+                "images": [
+                    {"id": 12, "name": "web-baked", "created_at": "2026-02-01T00:00Z"},
+                ],
+                "links": {},
+            },
+        ]
+
+        resolved = apply._resolve_snapshot_images(fake_do_client, [baked, public])
+
+        assert [d.image_id for d in resolved] == [12, None]
+        assert resolved[0].to_request_body()["image"] == 12
+        # the blueprint's image is kept, so the Droplet's fingerprint is unchanged
+        assert resolved[0].spec_tag == baked.spec_tag
+
+    def test_does_not_list_images_without_snapshots(self, fake_do_client):
+        droplet_spec = _droplet_spec("web", UUID(int=1))
+
+        assert apply._resolve_snapshot_images(fake_do_client, [droplet_spec]) == [
+            droplet_spec
+        ]
+        fake_do_client.images.list.assert_not_called()
+
+    def test_raises_for_unknown_snapshot(self, fake_do_client):
+        baked = dataclasses.replace(
+            _droplet_spec("web", UUID(int=1)), image=SnapshotImage("missing")
+        )
+        fake_do_client.images.list.return_value = {"images": [], "links": {}}
+
+        with pytest.raises(RuntimeError, match="No snapshot named missing"):
+            apply._resolve_snapshot_images(fake_do_client, [baked])
+
 
 class TestManageCloudflareDNS:
     @patch("digitalocean_deployment_orchestrator.infra.apply.get_droplet_ips_for_env")
@@ -247,6 +728,7 @@ class TestManageCloudflareDNS:
         apply.manage_cloudflare_dns(False, fake_do_client, fake_cf_client, fake_env, bp)
 
         fake_cf_client.zones.list.assert_called_once_with(name="example.com")
+        mock_get_ips.assert_called_once_with(fake_do_client, fake_env, inventory=None)
 
     @patch("digitalocean_deployment_orchestrator.infra.apply.get_droplet_ips_for_env")
     def test_manage_cf_dns_zone_lookup_performed_for_each_unique_zone(
@@ -342,7 +824,9 @@ class TestManageCloudflareDNS:
 
         apply.manage_cloudflare_dns(False, fake_do_client, fake_cf_client, fake_env, bp)
 
-        fake_cf_client.dns.records.list.assert_called_once_with(zone_id="zone123")
+        fake_cf_client.dns.records.list.assert_called_once_with(
+            zone_id="zone123", per_page=5000, page=1
+        )
 
     @patch("digitalocean_deployment_orchestrator.infra.apply.get_droplet_ips_for_env")
     def test_manage_cf_dns_fetches_zone_records_for_each_unique_zone(
@@ -399,7 +883,10 @@ class TestManageCloudflareDNS:
         apply.manage_cloudflare_dns(False, fake_do_client, fake_cf_client, fake_env, bp)
 
         assert fake_cf_client.dns.records.list.call_count == 2
-        calls = [call(zone_id="zone123"), call(zone_id="zone456")]
+        calls = [
+            call(zone_id="zone123", per_page=5000, page=1),
+            call(zone_id="zone456", per_page=5000, page=1),
+        ]
         fake_cf_client.dns.records.list.assert_has_calls(calls)
 
     @patch("digitalocean_deployment_orchestrator.infra.apply.get_droplet_ips_for_env")
@@ -470,10 +957,14 @@ class TestManageCloudflareDNS:
 
         apply.manage_cloudflare_dns(False, fake_do_client, fake_cf_client, fake_env, bp)
 
-        fake_cf_client.dns.records.update.assert_called_once()
-        call_args = fake_cf_client.dns.records.update.call_args.kwargs
-        assert call_args["dns_record_id"] == "rec444"
-        assert call_args["content"] == "10.0.0.2"
+        fake_cf_client.dns.records.batch.assert_called_once()
+        call_args = fake_cf_client.dns.records.batch.call_args.kwargs
+        assert call_args["zone_id"] == "zone123"
+        assert call_args["posts"] == []
+        [patch_data] = call_args["patches"]
+        assert patch_data["id"] == "rec444"
+        assert patch_data["content"] == "10.0.0.2"
+        fake_cf_client.dns.records.update.assert_not_called()
 
     @patch("digitalocean_deployment_orchestrator.infra.apply.get_droplet_ips_for_env")
     def test_manage_cf_dns_create_dry_run(
@@ -534,9 +1025,12 @@ class TestManageCloudflareDNS:
 
         apply.manage_cloudflare_dns(False, fake_do_client, fake_cf_client, fake_env, bp)
 
-        fake_cf_client.dns.records.create.assert_called_once()
-        call_args = fake_cf_client.dns.records.create.call_args.kwargs
-        assert call_args["content"] == "192.168.0.5"
+        fake_cf_client.dns.records.batch.assert_called_once()
+        call_args = fake_cf_client.dns.records.batch.call_args.kwargs
+        assert call_args["patches"] == []
+        [post_data] = call_args["posts"]
+        assert post_data["content"] == "192.168.0.5"
+        fake_cf_client.dns.records.create.assert_not_called()
 
     @patch("digitalocean_deployment_orchestrator.infra.apply.get_droplet_ips_for_env")
     def test_manage_cf_dns_missing_wkid_logs_warning(
@@ -564,6 +1058,254 @@ class TestManageCloudflareDNS:
         fake_cf_client.dns.records.create.assert_not_called()
         fake_cf_client.dns.records.update.assert_not_called()
 
+    def test_manage_cf_dns_round_robin_set_pairs_by_content(
+        self, fake_do_client, fake_cf_client, fake_env
+    ):
+        zone = MagicMock()
+        zone.id = "zone123"
+        fake_cf_client.zones.list.return_value.result = [zone]
+
+        existing = []
+        for record_id, content in [("rec001", "10.0.0.1"), ("rec002", "10.0.0.2")]:
+            record = MagicMock()
+            record.id = record_id
+            record.name = "www.example.com"
+            record.type = "A"
+            record.content = content
+            existing.append(record)
+        fake_cf_client.dns.records.list.return_value.result = existing
+
+        bp = [
+            {
+                "cf_zone_name": "example.com",
+                "type": "A",
+                "name": "www",
+                "content": content,
+                "ttl": 300,
+                "proxied": False,
+            }
+            for content in ["10.0.0.9", "10.0.0.1", "10.0.0.8"]
+        ]
+
+        apply.manage_cloudflare_dns(False, fake_do_client, fake_cf_client, fake_env, bp)
+
+        call_args = fake_cf_client.dns.records.batch.call_args.kwargs
+        updates = {p["id"]: p["content"] for p in call_args["patches"]}
+        assert updates == {"rec001": "10.0.0.1", "rec002": "10.0.0.9"}
+        assert [p["content"] for p in call_args["posts"]] == ["10.0.0.8"]
+
+    def test_manage_cf_dns_batches_are_chunked(
+        self, fake_do_client, fake_cf_client, fake_env, monkeypatch
+    ):
+        monkeypatch.setattr(apply, "CF_MAX_BATCH_SIZE", 2)
+        zone = MagicMock()
+        zone.id = "zone123"
+        fake_cf_client.zones.list.return_value.result = [zone]
+
+        bp = [
+            {
+                "cf_zone_name": "example.com",
+                "type": "TXT",
+                "name": f"txt{i}",
+                "content": "hello",
+                "ttl": 300,
+                "proxied": False,
+            }
+            for i in range(5)
+        ]
+
+        apply.manage_cloudflare_dns(False, fake_do_client, fake_cf_client, fake_env, bp)
+
+        batch_sizes = [
+            len(c.kwargs["posts"])
+            for c in fake_cf_client.dns.records.batch.call_args_list
+        ]
+        assert batch_sizes == [2, 2, 1]
+
+    def test_manage_cf_dns_falls_back_when_batch_unavailable(
+        self, fake_do_client, fake_cf_client, fake_env
+    ):
+        zone = MagicMock()
+        zone.id = "zone123"
+        fake_cf_client.zones.list.return_value.result = [zone]
+        existing_record = MagicMock()
+        existing_record.id = "rec444"
+        existing_record.name = "web.example.com"
+        existing_record.type = "A"
+        fake_cf_client.dns.records.list.return_value.result = [existing_record]
+        fake_cf_client.dns.records.batch.side_effect = NotFoundError(
+            "not found", response=MagicMock(status_code=404), body=None
+        )
+
+        bp = [
+            {
+                "cf_zone_name": "example.com",
+                "type": "A",
+                "name": name,
+                "content": "10.0.0.2",
+                "ttl": 300,
+                "proxied": False,
+            }
+            for name in ["web", "api"]
+        ]
+
+        apply.manage_cloudflare_dns(False, fake_do_client, fake_cf_client, fake_env, bp)
+
+        fake_cf_client.dns.records.update.assert_called_once()
+        assert (
+            fake_cf_client.dns.records.update.call_args.kwargs["dns_record_id"]
+            == "rec444"
+        )
+        fake_cf_client.dns.records.create.assert_called_once()
+        assert fake_cf_client.dns.records.create.call_args.kwargs["name"] == "api"
+
+    @pytest.mark.parametrize(
+        "content,ttl,proxied,expected_event",
+        [
+            ("10.0.0.1", 300, False, "Would leave DNS record unchanged"),
+            ("10.0.0.2", 300, False, "Would update DNS record"),
+            ("10.0.0.1", 600, False, "Would update DNS record"),
+            ("10.0.0.1", 300, True, "Would update DNS record"),
+        ],
+    )
+    def test_manage_cf_dns_dry_run_classifies_records(
+        self,
+        content,
+        ttl,
+        proxied,
+        expected_event,
+        fake_do_client,
+        fake_cf_client,
+        fake_env,
+        capsys,
+    ):
+        zone = MagicMock()
+        zone.id = "zone123"
+        fake_cf_client.zones.list.return_value.result = [zone]
+        existing_record = MagicMock()
+        existing_record.id = "rec444"
+        existing_record.name = "web.example.com"
+        existing_record.type = "A"
+        existing_record.content = "10.0.0.1"
+        existing_record.ttl = 300
+        existing_record.proxied = False
+        fake_cf_client.dns.records.list.return_value.result = [existing_record]
+
+        bp = [
+            {
+                "cf_zone_name": "example.com",
+                "type": "A",
+                "name": "web",
+                "content": content,
+                "ttl": ttl,
+                "proxied": proxied,
+            }
+        ]
+
+        apply.manage_cloudflare_dns(True, fake_do_client, fake_cf_client, fake_env, bp)
+
+        logs = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert expected_event in {e["event"] for e in logs}
+        fake_cf_client.dns.records.batch.assert_not_called()
+
+    def test_manage_cf_dns_skips_unchanged_records(
+        self, fake_do_client, fake_cf_client, fake_env
+    ):
+        zone = MagicMock()
+        zone.id = "zone123"
+        fake_cf_client.zones.list.return_value.result = [zone]
+        existing_record = MagicMock()
+        existing_record.name = "example.com"
+        existing_record.type = "A"
+        existing_record.content = "10.0.0.1"
+        existing_record.ttl = 1
+        existing_record.proxied = True
+        fake_cf_client.dns.records.list.return_value.result = [existing_record]
+
+        bp = [
+            {
+                "cf_zone_name": "example.com",
+                "type": "A",
+                "name": "@",
+                "content": "10.0.0.1",
+                "proxied": True,
+            }
+        ]
+
+        apply.manage_cloudflare_dns(False, fake_do_client, fake_cf_client, fake_env, bp)
+
+        fake_cf_client.dns.records.batch.assert_not_called()
+        fake_cf_client.dns.records.update.assert_not_called()
+        fake_cf_client.dns.records.create.assert_not_called()
+
+
+def _records_page(records, total_pages):
+    return MagicMock(result=records, result_info=MagicMock(total_pages=total_pages))
+
+
+def _record(name, type_="A", content="10.0.0.1"):
+    record = MagicMock()
+    record.name = name
+    record.type = type_
+    record.content = content
+    return record
+
+
+class TestFetchZoneRecords:
+    def test_single_page_zone_is_read_once(self, fake_cf_client):
+        fake_cf_client.dns.records.list.return_value = _records_page(
+            [_record("www.example.com")], total_pages=1
+        )
+
+        index = apply._fetch_zone_records(
+            fake_cf_client, "zone123", {("www.example.com", "A")}
+        )
+
+        assert list(index) == [("www.example.com", "A")]
+        fake_cf_client.dns.records.list.assert_called_once()
+
+    def test_large_zone_few_names_queries_by_name(self, fake_cf_client):
+        def list_side_effect(zone_id, per_page, page, **filters):
+            if not filters:
+                return _records_page([_record("other.example.com")], total_pages=20)
+            return _records_page([_record(filters["name"]["exact"])], total_pages=1)
+
+        fake_cf_client.dns.records.list.side_effect = list_side_effect
+
+        index = apply._fetch_zone_records(
+            fake_cf_client,
+            "zone123",
+            {("api.example.com", "A"), ("www.example.com", "A")},
+        )
+
+        assert set(index) == {("api.example.com", "A"), ("www.example.com", "A")}
+        assert fake_cf_client.dns.records.list.call_count == 3
+        fake_cf_client.dns.records.list.assert_any_call(
+            zone_id="zone123",
+            per_page=5000,
+            page=1,
+            name={"exact": "www.example.com"},
+            type="A",
+        )
+
+    def test_large_zone_many_names_paginates_whole_zone(self, fake_cf_client):
+        def list_side_effect(zone_id, per_page, page):
+            return _records_page([_record(f"r{page}.example.com")], total_pages=3)
+
+        fake_cf_client.dns.records.list.side_effect = list_side_effect
+        wanted = {(f"r{i}.example.com", "A") for i in range(5)}
+
+        index = apply._fetch_zone_records(fake_cf_client, "zone123", wanted)
+
+        assert set(index) == {(f"r{i}.example.com", "A") for i in (1, 2, 3)}
+        assert [
+            c.kwargs["page"] for c in fake_cf_client.dns.records.list.call_args_list
+        ] == [
+            1,
+            2,
+            3,
+        ]
+
 
 class TestApply:
     @patch("digitalocean_deployment_orchestrator.infra.apply.load_environment_blueprint")
@@ -578,13 +1320,410 @@ class TestApply:
         fake_cf_client,
         fake_env,
     ):
-        bp = {"droplets": [{"name": "web"}], "dns": []}
+        bp = EnvironmentSpec(
+            environment=Environment.TEST,
+            droplets=(_droplet_spec("web", UUID("1" * 32)),),
+            dns=(),
+        )
         mock_load.return_value = bp
 
         apply.apply(False, fake_do_client, fake_cf_client, Path("."), fake_env)
         mock_manage_droplets.assert_called_once_with(
-            False, fake_do_client, fake_env, bp["droplets"]
+            False,
+            fake_do_client,
+            fake_env,
+            bp.droplets,
+            max_parallel=8,
+            max_parallel_resizes=1,
+            inventory=ANY,
         )
+        inventory = mock_manage_droplets.call_args.kwargs["inventory"]
         mock_manage_cf_dns.assert_called_once_with(
-            False, fake_do_client, fake_cf_client, fake_env, bp["dns"]
+            False,
+            fake_do_client,
+            fake_cf_client,
+            fake_env,
+            bp.dns,
+            inventory=inventory,
+            zone_cache=None,
+            cache=None,
+        )
+        fake_do_client.droplets.list.assert_called_once()
+
+    def test_apply_looks_up_zones_in_disk_cache(
+        self, fake_do_client, fake_cf_client, tmp_path
+    ):
+        disk_cache = DiskCache(tmp_path)
+        disk_cache.set(ZONE_ID, "example.com", "zone123")
+        bp = EnvironmentSpec(
+            environment=Environment.TEST,
+            droplets=(),
+            dns=(
+                {
+                    "cf_zone_name": "example.com",
+                    "type": "A",
+                    "name": "api",
+                    "content": "10.0.0.9",
+                    "proxied": True,
+                },
+            ),
+        )
+        fake_cf_client.dns.records.list.return_value.result = []
+
+        apply.apply(
+            False,
+            fake_do_client,
+            fake_cf_client,
+            tmp_path,
+            Environment.TEST,
+            blueprint=bp,
+            cache=disk_cache,
+        )
+
+        fake_cf_client.zones.list.assert_not_called()
+        assert fake_cf_client.dns.records.list.call_args.kwargs["zone_id"] == "zone123"
+
+    @pytest.mark.parametrize("is_dry_run", [False, True])
+    @patch("digitalocean_deployment_orchestrator.infra.apply.manage_droplets")
+    @patch("digitalocean_deployment_orchestrator.infra.apply.manage_cloudflare_dns")
+    @patch.object(apply.EnvironmentInventory, "wait_until_ready")
+    def test_apply_waits_for_created_droplets_before_dns(
+        self,
+        mock_wait,
+        mock_manage_cf_dns,
+        mock_manage_droplets,
+        is_dry_run,
+        fake_do_client,
+        fake_cf_client,
+    ):
+        droplet_spec = _droplet_spec("web", UUID(int=1))
+        bp = EnvironmentSpec(
+            environment=Environment.TEST, droplets=(droplet_spec,), dns=()
+        )
+        mock_manage_droplets.return_value = DropletPlan(
+            to_create=[droplet_spec], to_destroy=[]
+        )
+        mock_manage_cf_dns.side_effect = lambda *args, **kwargs: (
+            mock_wait.assert_called_once() if not is_dry_run else None
+        )
+
+        apply.apply(
+            is_dry_run,
+            fake_do_client,
+            fake_cf_client,
+            Path("."),
+            Environment.TEST,
+            blueprint=bp,
+            ready_timeout=60,
+        )
+
+        if is_dry_run:
+            mock_wait.assert_not_called()
+        else:
+            mock_wait.assert_called_once_with([UUID(int=1)], timeout=60)
+        mock_manage_cf_dns.assert_called_once()
+
+    @patch("digitalocean_deployment_orchestrator.infra.apply.manage_droplets")
+    @patch("digitalocean_deployment_orchestrator.infra.apply.manage_cloudflare_dns")
+    @patch("digitalocean_deployment_orchestrator.infra.apply.wait_for_phone_home")
+    @patch.object(apply.EnvironmentInventory, "wait_until_ready")
+    def test_apply_waits_for_droplets_to_phone_home_after_dns(
+        self,
+        mock_wait,
+        mock_wait_for_phone_home,
+        mock_manage_cf_dns,
+        mock_manage_droplets,
+        fake_do_client,
+        fake_cf_client,
+    ):
+        droplet_spec = _droplet_spec("web", UUID(int=1))
+        bp = EnvironmentSpec(
+            environment=Environment.TEST, droplets=(droplet_spec,), dns=()
+        )
+        rendered_with = []
+
+        def _manage_droplets(*args, **kwargs):
+            rendered_with.append(apply.PHONE_HOME_URL.get())
+            return DropletPlan(to_create=[droplet_spec], to_destroy=[])
+
+        mock_manage_droplets.side_effect = _manage_droplets
+        mock_manage_cf_dns.side_effect = lambda *args, **kwargs: (
+            mock_wait_for_phone_home.assert_not_called()
+        )
+        listener = MagicMock(url="http://203.0.113.1:8090")
+
+        apply.apply(
+            False,
+            fake_do_client,
+            fake_cf_client,
+            Path("."),
+            Environment.TEST,
+            blueprint=bp,
+            phone_home=listener,
+            phone_home_timeout=60,
+        )
+
+        assert rendered_with == ["http://203.0.113.1:8090"]
+        assert apply.PHONE_HOME_URL.get() is None
+        mock_wait_for_phone_home.assert_called_once_with(
+            listener, ANY, [droplet_spec], timeout=60
+        )
+
+
+class TestApplyEnvironments:
+    @staticmethod
+    def _blueprint(env: Environment) -> EnvironmentSpec:
+        return EnvironmentSpec(
+            environment=env,
+            droplets=(),
+            dns=(
+                {
+                    "cf_zone_name": "example.com",
+                    "type": "CNAME",
+                    "name": env.value,
+                    "content": "example.com",
+                    "proxied": True,
+                },
+            ),
+        )
+
+    @patch("digitalocean_deployment_orchestrator.infra.apply.load_environment_blueprint")
+    def test_apply_environments_shares_zone_lookups(
+        self, mock_load, fake_do_client, fake_cf_client, capsys
+    ):
+        mock_load.side_effect = lambda _, env: self._blueprint(env)
+        zone = MagicMock()
+        zone.id = "zone123"
+        fake_cf_client.zones.list.return_value.result = [zone]
+
+        apply.apply_environments(
+            True,
+            fake_do_client,
+            fake_cf_client,
+            Path("."),
+            [Environment.TEST, Environment.LIVE, Environment.TEST],
         )
+
+        assert mock_load.call_count == 2
+        fake_cf_client.zones.list.assert_called_once_with(name="example.com")
+        assert fake_do_client.droplets.list.call_count == 2
+        logs = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        comparisons = [e for e in logs if e["event"] == "DNS comparison"]
+        assert sorted(e["environment"] for e in comparisons) == ["live", "test"]
+        summary = next(e for e in logs if e["event"] == "Environments apply summary")
+        assert summary["succeeded"] == 2
+
+    @patch("digitalocean_deployment_orchestrator.infra.apply.apply")
+    @patch("digitalocean_deployment_orchestrator.infra.apply.load_environment_blueprint")
+    def test_apply_environments_reports_each_environment(
+        self, mock_load, mock_apply, fake_do_client, fake_cf_client, capsys
+    ):
+        mock_load.side_effect = lambda _, env: self._blueprint(env)
+
+        def apply_side_effect(*args, **kwargs):
+            if kwargs["blueprint"].environment == Environment.LIVE:
+                raise RuntimeError("boom")
+
+        mock_apply.side_effect = apply_side_effect
+
+        with pytest.raises(RuntimeError, match="1 of 2 operation"):
+            apply.apply_environments(
+                False,
+                fake_do_client,
+                fake_cf_client,
+                Path("."),
+                [Environment.TEST, Environment.LIVE],
+            )
+
+        assert mock_apply.call_count == 2
+        zone_caches = {id(c.kwargs["zone_cache"]) for c in mock_apply.call_args_list}
+        assert len(zone_caches) == 1
+        logs = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        summary = next(e for e in logs if e["event"] == "Environments apply summary")
+        assert summary["errors"] == [{"kind": "apply", "target": "live", "err": "boom"}]
+
+    @patch("digitalocean_deployment_orchestrator.infra.apply.load_environment_blueprint")
+    def test_apply_environments_reuses_cached_lookups(
+        self, mock_load, fake_do_client, fake_cf_client, tmp_path, capsys
+    ):
+        mock_load.side_effect = lambda _, env: self._blueprint(env)
+        zone = MagicMock()
+        zone.id = "zone123"
+        fake_cf_client.zones.list.return_value.result = [zone]
+        fake_do_client.droplets.list.return_value = {"droplets": []}
+        disk_cache = DiskCache(tmp_path)
+
+        for _ in range(2):
+            apply.apply_environments(
+                True,
+                fake_do_client,
+                fake_cf_client,
+                Path("."),
+                [Environment.TEST],
+                cache=disk_cache,
+            )
+
+        fake_cf_client.zones.list.assert_called_once_with(name="example.com")
+        fake_do_client.droplets.list.assert_called_once()
+
+
+class TestTeardown:
+    @staticmethod
+    def _blueprint() -> EnvironmentSpec:
+        return EnvironmentSpec(
+            environment=Environment.TEST,
+            droplets=(),
+            dns=tuple(
+                {
+                    "cf_zone_name": "example.com",
+                    "type": "A",
+                    "name": name,
+                    "content": {"droplet_wkid": UUID(int=1)},
+                    "proxied": True,
+                }
+                for name in ["api", "@"]
+            ),
+        )
+
+    @pytest.fixture
+    def zone_records(self, fake_cf_client):
+        records = [
+            _record("api.example.com"),
+            _record("api.example.com", content="10.0.0.2"),
+            _record("example.com"),
+            _record("www.example.com"),
+            # matches the blueprint, but does not point at one of its Droplets
+            _record("api.example.com", content="192.0.2.9"),
+        ]
+        for i, record in enumerate(records):
+            record.id = f"rec{i}"
+        zone = MagicMock()
+        zone.id = "zone123"
+        fake_cf_client.zones.list.return_value.result = [zone]
+        fake_cf_client.dns.records.list.return_value.result = records
+        return records
+
+    @pytest.fixture(autouse=True)
+    def env_droplets(self, fake_do_client):
+        fake_do_client.droplets.list.return_value = {
+            "droplets": [
+                {
+                    "id": i,
+                    "name": f"web-{i}",
+                    "tags": [f"wkid:{UUID(int=i)}"],
+                    "networks": {
+                        "v4": [{"type": "public", "ip_address": f"10.0.0.{i}"}],
+                        "v6": [],
+                    },
+                }
+                for i in (1, 2)
+            ]
+        }
+
+    def test_teardown_deletes_records_then_destroys_by_tag(
+        self, fake_do_client, fake_cf_client, zone_records
+    ):
+        apply.teardown(False, fake_do_client, fake_cf_client, self._blueprint())
+
+        fake_cf_client.dns.records.batch.assert_called_once_with(
+            zone_id="zone123",
+            deletes=[{"id": "rec0"}, {"id": "rec1"}, {"id": "rec2"}],
+        )
+        fake_do_client.droplets.destroy_by_tag.assert_called_once_with(
+            tag_name="env:test"
+        )
+        fake_do_client.droplets.destroy.assert_not_called()
+
+    def test_teardown_invalidates_cached_inventory(
+        self, fake_do_client, fake_cf_client, zone_records, tmp_path
+    ):
+        disk_cache = DiskCache(tmp_path)
+        disk_cache.set(INVENTORY, "env:test", [])
+
+        apply.teardown(
+            False, fake_do_client, fake_cf_client, self._blueprint(), cache=disk_cache
+        )
+
+        assert disk_cache.get(INVENTORY, "env:test") is None
+
+    def test_teardown_falls_back_when_batch_unavailable(
+        self, fake_do_client, fake_cf_client, zone_records
+    ):
+        fake_cf_client.dns.records.batch.side_effect = NotFoundError(
+            "not found", response=MagicMock(status_code=404), body=None
+        )
+
+        apply.teardown(False, fake_do_client, fake_cf_client, self._blueprint())
+
+        assert fake_cf_client.dns.records.delete.call_args_list == [
+            call(dns_record_id=f"rec{i}", zone_id="zone123") for i in range(3)
+        ]
+
+    def test_teardown_dry_run_makes_no_changes(
+        self, fake_do_client, fake_cf_client, zone_records, capsys
+    ):
+        apply.teardown(True, fake_do_client, fake_cf_client, self._blueprint())
+
+        fake_cf_client.dns.records.batch.assert_not_called()
+        fake_do_client.droplets.destroy_by_tag.assert_not_called()
+        logs = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        would_delete = [e for e in logs if e["event"] == "Would delete DNS record"]
+        assert len(would_delete) == 3
+        destroy = next(e for e in logs if e["event"] == "Would destroy Droplets by tag")
+        assert destroy["droplets"] == {
+            "web-1": str(UUID(int=1)),
+            "web-2": str(UUID(int=2)),
+        }
+
+    def test_teardown_keeps_records_not_pointing_at_droplets(
+        self, fake_do_client, fake_cf_client, zone_records
+    ):
+        fake_do_client.droplets.list.return_value = {"droplets": []}
+
+        apply.teardown(False, fake_do_client, fake_cf_client, self._blueprint())
+
+        fake_cf_client.dns.records.batch.assert_not_called()
+        fake_do_client.droplets.destroy_by_tag.assert_called_once_with(
+            tag_name="env:test"
+        )
+
+    def test_teardown_refuses_live_without_confirmation(
+        self, fake_do_client, fake_cf_client, zone_records
+    ):
+        blueprint = dataclasses.replace(self._blueprint(), environment=Environment.LIVE)
+
+        with pytest.raises(ValueError, match="env:live"):
+            apply.teardown(False, fake_do_client, fake_cf_client, blueprint)
+
+        fake_cf_client.dns.records.batch.assert_not_called()
+        fake_do_client.droplets.destroy_by_tag.assert_not_called()
+
+    def test_teardown_live_with_confirmation(
+        self, fake_do_client, fake_cf_client, zone_records
+    ):
+        blueprint = dataclasses.replace(self._blueprint(), environment=Environment.LIVE)
+
+        apply.teardown(False, fake_do_client, fake_cf_client, blueprint, confirm=True)
+
+        fake_do_client.droplets.destroy_by_tag.assert_called_once_with(
+            tag_name="env:live"
+        )
+
+
+@pytest.mark.filterwarnings("ignore:.*found in sys.modules:RuntimeWarning")
+class TestCLI:
+    @staticmethod
+    def _run(*argv: str):
+        with patch("sys.argv", ["apply", *argv]):
+            runpy.run_module(apply.__name__, run_name="__main__")
+
+    @pytest.mark.parametrize(
+        "argv",
+        [["--all", "--teardown"], ["live", "--teardown"], ["test", "live", "--teardown"]],
+    )
+    def test_teardown_of_live_or_all_requires_confirmation(self, tmp_path, argv, capsys):
+        with pytest.raises(SystemExit) as exc_info:
+            self._run(str(tmp_path), *argv)
+
+        assert exc_info.value.code == 2
+        assert "--confirm-teardown" in capsys.readouterr().err
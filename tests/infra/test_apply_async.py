@@ -0,0 +1,378 @@
+import asyncio
+import dataclasses
+import json
+from unittest.mock import AsyncMock, MagicMock, call, patch
+from uuid import UUID
+
+import pytest
+
+from digitalocean_deployment_orchestrator.infra import apply_async
+from digitalocean_deployment_orchestrator.infra.types import DropletSpec, EnvironmentSpec
+from digitalocean_deployment_orchestrator.inventory import EnvironmentInventory
+from digitalocean_deployment_orchestrator.types import Environment
+from digitalocean_deployment_orchestrator.types_DO import (
+    DORegion,
+    DropletImage,
+    DropletRequest,
+    DropletSize,
+)
+
+
+def _droplet_spec(name: str, wkid: UUID) -> DropletSpec:
+    return DropletSpec.from_request(
+        DropletRequest(
+            name=name,
+            region=DORegion.LONDON1,
+            size=DropletSize.BASIC_YOCTO,
+            image=DropletImage.DEBIAN_13_X64,
+            ssh_keys=[],
+            tags=[],
+            vpc_uuid="",
+            user_data="secret",
+            well_known_uuid=wkid,
+        ),
+        Environment.TEST,
+    )
+
+
+@pytest.fixture
+def fake_env():
+    env = MagicMock()
+    env.value = "prod"
+    env.tag = "env:prod"
+    return env
+
+
+@pytest.fixture
+def fake_do_client():
+    client = MagicMock()
+    client.droplets.list = AsyncMock(return_value={"droplets": []})
+    client.droplets.create = AsyncMock(return_value={"droplet": {"id": 1}})
+    client.droplets.destroy = AsyncMock(return_value=None)
+    return client
+
+
+@pytest.fixture
+def fake_cf_client():
+    client = MagicMock()
+    zone = MagicMock()
+    zone.id = "zone123"
+    client.zones.list = AsyncMock(return_value=MagicMock(result=[zone]))
+    client.dns.records.list = AsyncMock(
+        return_value=MagicMock(result=[], result_info=None)
+    )
+    client.dns.records.batch = AsyncMock(return_value=None)
+    return client
+
+
+class TestManageDropletsAsync:
+    def test_manage_droplets_async_creates_and_destroys(self, fake_do_client, fake_env):
+        inventory = EnvironmentInventory(
+            fake_do_client,
+            fake_env,
+            droplets=[
+                {"id": 123, "name": "old", "tags": [f"wkid:{UUID('2' * 32)}"]},
+            ],
+        )
+        bp_droplet = _droplet_spec("web", UUID("1" * 32))
+
+        asyncio.run(
+            apply_async.manage_droplets_async(
+                False, fake_do_client, fake_env, [bp_droplet], inventory=inventory
+            )
+        )
+
+        fake_do_client.droplets.create.assert_awaited_once()
+        assert fake_do_client.droplets.create.call_args.kwargs["body"]["name"] == "web"
+        fake_do_client.droplets.destroy.assert_awaited_once_with(droplet_id=123)
+        # inventory is refreshed after mutating the environment
+        fake_do_client.droplets.list.assert_awaited_once()
+
+    def test_manage_droplets_async_dry_run_makes_no_changes(
+        self, fake_do_client, fake_env
+    ):
+        inventory = EnvironmentInventory(fake_do_client, fake_env)
+        bp_droplet = _droplet_spec("web", UUID("1" * 32))
+
+        asyncio.run(
+            apply_async.manage_droplets_async(
+                True, fake_do_client, fake_env, [bp_droplet], inventory=inventory
+            )
+        )
+
+        fake_do_client.droplets.create.assert_not_called()
+        fake_do_client.droplets.list.assert_not_called()
+
+    def test_manage_droplets_async_batches_identical_creates(
+        self, fake_do_client, fake_env
+    ):
+        inventory = EnvironmentInventory(fake_do_client, fake_env)
+        bp_droplets = [_droplet_spec(f"web-{i}", UUID(int=i)) for i in range(3)]
+        fake_do_client.droplets.create.return_value = {
+            "droplets": [{"id": i, "name": f"web-{i}"} for i in range(3)]
+        }
+        fake_do_client.tags.create = AsyncMock()
+        fake_do_client.tags.assign_resources = AsyncMock()
+
+        asyncio.run(
+            apply_async.manage_droplets_async(
+                False, fake_do_client, fake_env, bp_droplets, inventory=inventory
+            )
+        )
+
+        fake_do_client.droplets.create.assert_awaited_once()
+        body = fake_do_client.droplets.create.call_args.kwargs["body"]
+        assert body["names"] == ["web-0", "web-1", "web-2"]
+        assert fake_do_client.tags.assign_resources.await_count == 3
+
+    def test_manage_droplets_async_destroys_droplets_it_could_not_tag(
+        self, fake_do_client, fake_env
+    ):
+        inventory = EnvironmentInventory(fake_do_client, fake_env)
+        bp_droplets = [_droplet_spec(f"web-{i}", UUID(int=i)) for i in range(3)]
+        fake_do_client.droplets.create.return_value = {
+            "droplets": [{"id": i, "name": f"web-{i}"} for i in range(3)]
+        }
+
+        async def assign_resources(tag_id, body):
+            if tag_id == f"wkid:{UUID(int=1)}":
+                raise RuntimeError("tag quota exceeded")
+
+        fake_do_client.tags.create = AsyncMock()
+        fake_do_client.tags.assign_resources = AsyncMock(side_effect=assign_resources)
+
+        with pytest.raises(RuntimeError, match="1 of 1 operation"):
+            asyncio.run(
+                apply_async.manage_droplets_async(
+                    False, fake_do_client, fake_env, bp_droplets, inventory=inventory
+                )
+            )
+
+        fake_do_client.droplets.destroy.assert_awaited_once_with(droplet_id=1)
+
+    def test_manage_droplets_async_resizes_drifted_droplets(
+        self, fake_do_client, fake_env
+    ):
+        inventory = EnvironmentInventory(
+            fake_do_client,
+            fake_env,
+            droplets=[
+                {
+                    "id": 7,
+                    "name": "web",
+                    "status": "active",
+                    "size_slug": "s-1vcpu-1gb",
+                    "tags": [f"wkid:{UUID(int=1)}"],
+                },
+            ],
+        )
+        fake_do_client.droplet_actions.post = AsyncMock(
+            side_effect=lambda droplet_id, body: {
+                "action": {"id": 1, "status": "completed", "type": body["type"]}
+            }
+        )
+
+        asyncio.run(
+            apply_async.manage_droplets_async(
+                False,
+                fake_do_client,
+                fake_env,
+                [_droplet_spec("web", UUID(int=1))],
+                inventory=inventory,
+            )
+        )
+
+        bodies = [
+            c.kwargs["body"] for c in fake_do_client.droplet_actions.post.call_args_list
+        ]
+        assert bodies == [
+            {"type": "shutdown"},
+            {"type": "resize", "size": "s-1vcpu-512mb-10gb", "disk": False},
+            {"type": "power_on"},
+        ]
+        fake_do_client.droplets.create.assert_not_called()
+
+    def test_manage_droplets_async_retags_resized_droplets(
+        self, fake_do_client, fake_env
+    ):
+        droplet_spec = _droplet_spec("web", UUID(int=1))
+        created_from = dataclasses.replace(droplet_spec, size=DropletSize.BASIC_ZEPTO)
+        inventory = EnvironmentInventory(
+            fake_do_client,
+            fake_env,
+            droplets=[
+                {
+                    "id": 7,
+                    "name": "web",
+                    "status": "off",
+                    "size_slug": "s-1vcpu-1gb",
+                    "tags": list(created_from.tags),
+                },
+            ],
+        )
+        fake_do_client.droplet_actions.post = AsyncMock(
+            side_effect=lambda droplet_id, body: {
+                "action": {"id": 1, "status": "completed", "type": body["type"]}
+            }
+        )
+        fake_do_client.tags.create = AsyncMock()
+        fake_do_client.tags.assign_resources = AsyncMock()
+        fake_do_client.tags.unassign_resources = AsyncMock()
+
+        asyncio.run(
+            apply_async.manage_droplets_async(
+                False, fake_do_client, fake_env, [droplet_spec], inventory=inventory
+            )
+        )
+
+        body = {"resources": [{"resource_id": "7", "resource_type": "droplet"}]}
+        fake_do_client.tags.assign_resources.assert_awaited_once_with(
+            tag_id=droplet_spec.spec_tag, body=body
+        )
+        fake_do_client.tags.unassign_resources.assert_awaited_once_with(
+            tag_id=created_from.spec_tag, body=body
+        )
+
+
+class TestManageCloudflareDNSAsync:
+    def test_manage_cf_dns_async_batches_changes_per_zone(
+        self, fake_do_client, fake_cf_client, fake_env
+    ):
+        inventory = EnvironmentInventory(
+            fake_do_client,
+            fake_env,
+            droplets=[
+                {
+                    "id": 1,
+                    "tags": ["wkid:11111111-1111-1111-1111-111111111111"],
+                    "networks": {
+                        "v4": [{"type": "public", "ip_address": "10.0.0.1"}],
+                        "v6": [],
+                    },
+                }
+            ],
+        )
+        bp = [
+            {
+                "cf_zone_name": zone_name,
+                "type": "A",
+                "name": "api",
+                "content": {"droplet_wkid": UUID("11111111-1111-1111-1111-111111111111")},
+                "proxied": True,
+            }
+            for zone_name in ["example.com", "other.com"]
+        ]
+
+        asyncio.run(
+            apply_async.manage_cloudflare_dns_async(
+                False,
+                fake_cf_client,
+                fake_env,
+                bp,
+                inventory=inventory,
+                zone_ids={"example.com": "zone123", "other.com": "zone456"},
+            )
+        )
+
+        assert fake_cf_client.dns.records.list.await_count == 2
+        batched = {
+            c.kwargs["zone_id"]: c.kwargs["posts"]
+            for c in fake_cf_client.dns.records.batch.call_args_list
+        }
+        assert set(batched) == {"zone123", "zone456"}
+        assert batched["zone123"][0]["content"] == "10.0.0.1"
+
+    def test_fetch_zone_records_async_fetches_remaining_pages(self, fake_cf_client):
+        def record(name):
+            r = MagicMock()
+            r.name = name
+            r.type = "A"
+            return r
+
+        async def list_side_effect(zone_id, per_page, page):
+            return MagicMock(
+                result=[record(f"r{page}.example.com")],
+                result_info=MagicMock(total_pages=3),
+            )
+
+        fake_cf_client.dns.records.list = AsyncMock(side_effect=list_side_effect)
+        wanted = {(f"r{i}.example.com", "A") for i in range(5)}
+
+        index = asyncio.run(
+            apply_async._fetch_zone_records(fake_cf_client, "zone123", wanted)
+        )
+
+        assert set(index) == {(f"r{i}.example.com", "A") for i in (1, 2, 3)}
+        assert fake_cf_client.dns.records.list.await_count == 3
+
+
+class TestApplyAsync:
+    @patch(
+        "digitalocean_deployment_orchestrator.infra.apply_async.load_environment_blueprint"
+    )
+    def test_apply_async_resolves_zones_once(
+        self, mock_load, fake_do_client, fake_cf_client, fake_env, capsys
+    ):
+        mock_load.return_value = EnvironmentSpec(
+            environment=Environment.TEST,
+            droplets=(),
+            dns=tuple(
+                {
+                    "cf_zone_name": "example.com",
+                    "type": "CNAME",
+                    "name": name,
+                    "content": "example.com",
+                    "proxied": True,
+                }
+                for name in ["www", "docs"]
+            ),
+        )
+
+        asyncio.run(
+            apply_async.apply_async(
+                True, fake_do_client, fake_cf_client, MagicMock(), fake_env
+            )
+        )
+
+        fake_cf_client.zones.list.assert_has_awaits([call(name="example.com")])
+        assert fake_cf_client.zones.list.await_count == 1
+        fake_do_client.droplets.list.assert_awaited_once()
+        logs = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        comparison = next(e for e in logs if e["event"] == "DNS comparison")
+        assert comparison["to_create"] == 2
+
+
+class TestApplyEnvironmentsAsync:
+    @patch(
+        "digitalocean_deployment_orchestrator.infra.apply_async.load_environment_blueprint"
+    )
+    def test_apply_environments_async_resolves_zones_once(
+        self, mock_load, fake_do_client, fake_cf_client, capsys
+    ):
+        mock_load.side_effect = lambda _, env: EnvironmentSpec(
+            environment=env,
+            droplets=(),
+            dns=(
+                {
+                    "cf_zone_name": "example.com",
+                    "type": "CNAME",
+                    "name": env.value,
+                    "content": "example.com",
+                    "proxied": True,
+                },
+            ),
+        )
+
+        asyncio.run(
+            apply_async.apply_environments_async(
+                True, fake_do_client, fake_cf_client, MagicMock(), list(Environment)
+            )
+        )
+
+        assert fake_cf_client.zones.list.await_count == 1
+        assert fake_do_client.droplets.list.await_count == len(Environment)
+        logs = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        comparisons = [e for e in logs if e["event"] == "DNS comparison"]
+        assert sorted(e["environment"] for e in comparisons) == ["live", "test"]
+        summary = next(e for e in logs if e["event"] == "Environments apply summary")
+        assert summary["succeeded"] == len(Environment)
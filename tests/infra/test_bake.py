@@ -0,0 +1,109 @@
+from unittest.mock import MagicMock, patch
+from uuid import UUID
+
+import pytest
+
+from digitalocean_deployment_orchestrator.infra import bake
+from digitalocean_deployment_orchestrator.infra.phone_home import PHONE_HOME_URL
+from digitalocean_deployment_orchestrator.infra.types import DropletSpec
+from digitalocean_deployment_orchestrator.types import Environment
+from digitalocean_deployment_orchestrator.types_DO import (
+    DORegion,
+    DropletImage,
+    DropletRequest,
+    DropletSize,
+)
+
+
+def _phone_home_cloud_config() -> str:
+    return f"phone_home: {PHONE_HOME_URL.get()}"
+
+
+def _droplet_spec(
+    name: str, wkid: UUID, user_data=_phone_home_cloud_config
+) -> DropletSpec:
+    request = DropletRequest(
+        name=name,
+        region=DORegion.LONDON1,
+        size=DropletSize.BASIC_YOCTO,
+        image=DropletImage.DEBIAN_13_X64,
+        ssh_keys=[],
+        tags=["web"],
+        vpc_uuid="",
+        user_data=user_data,
+        well_known_uuid=wkid,
+    )
+    return DropletSpec.from_request(request, Environment.TEST)
+
+
+@pytest.fixture
+def do_client():
+    client = MagicMock()
+    client.droplets.create.return_value = {"droplet": {"id": 42}}
+    return client
+
+
+@pytest.fixture
+def listener():
+    return MagicMock(url="http://203.0.113.1:8090")
+
+
+class TestFindDropletSpec:
+    @pytest.mark.parametrize("name_or_wkid", ["db", str(UUID(int=2))])
+    def test_finds_by_name_or_wkid(self, name_or_wkid):
+        specs = [_droplet_spec("web", UUID(int=1)), _droplet_spec("db", UUID(int=2))]
+
+        assert bake.find_droplet_spec(specs, name_or_wkid) is specs[1]
+
+    def test_raises_if_ambiguous(self):
+        specs = [_droplet_spec("web", UUID(int=1)), _droplet_spec("web", UUID(int=2))]
+
+        with pytest.raises(ValueError, match="found 2"):
+            bake.find_droplet_spec(specs, "web")
+
+
+@patch("digitalocean_deployment_orchestrator.infra.bake.snapshot", return_value=99)
+@patch("digitalocean_deployment_orchestrator.infra.bake.power_off")
+class TestBake:
+    def test_snapshots_builder_once_it_phones_home(
+        self, mock_power_off, mock_snapshot, do_client, listener
+    ):
+        listener.wait.return_value = iter([(42, 0.0)])
+
+        snapshot_id = bake.bake(
+            do_client, _droplet_spec("web", UUID(int=1)), "web-baked", listener
+        )
+
+        assert snapshot_id == 99
+        body = do_client.droplets.create.call_args.kwargs["body"]
+        assert body["name"] == "web-builder"
+        assert body["tags"] == [bake.BUILDER_TAG]
+        assert body["user_data"] == "phone_home: http://203.0.113.1:8090"
+        mock_power_off.assert_called_once_with(
+            do_client, 42, timeout=bake.DEFAULT_ACTION_TIMEOUT
+        )
+        mock_snapshot.assert_called_once_with(
+            do_client, 42, "web-baked", timeout=bake.DEFAULT_ACTION_TIMEOUT
+        )
+        do_client.droplets.destroy.assert_called_once_with(droplet_id=42)
+
+    def test_destroys_builder_that_does_not_phone_home(
+        self, mock_power_off, mock_snapshot, do_client, listener
+    ):
+        listener.wait.return_value = iter([])
+
+        with pytest.raises(RuntimeError, match="did not phone home"):
+            bake.bake(do_client, _droplet_spec("web", UUID(int=1)), "baked", listener)
+
+        mock_snapshot.assert_not_called()
+        do_client.droplets.destroy.assert_called_once_with(droplet_id=42)
+
+    def test_rejects_cloud_config_that_does_not_phone_home(
+        self, mock_power_off, mock_snapshot, do_client, listener
+    ):
+        droplet_spec = _droplet_spec("web", UUID(int=1), user_data="#cloud-config")
+
+        with pytest.raises(ValueError, match="does not phone home"):
+            bake.bake(do_client, droplet_spec, "baked", listener)
+
+        do_client.droplets.create.assert_not_called()
@@ -0,0 +1,196 @@
+import re
+import urllib.error
+import urllib.request
+from pathlib import Path
+from unittest.mock import MagicMock
+from uuid import UUID
+
+import pytest
+
+from digitalocean_deployment_orchestrator.infra import phone_home
+from digitalocean_deployment_orchestrator.infra.types import (
+    AppServerEnv,
+    DropletSpec,
+    PostgresServerEnv,
+)
+from digitalocean_deployment_orchestrator.infra.utils import render_cloud_config
+from digitalocean_deployment_orchestrator.types import Environment
+from digitalocean_deployment_orchestrator.types_DO import (
+    DORegion,
+    DropletImage,
+    DropletRequest,
+    DropletSize,
+)
+
+
+def _post(url: str, data: bytes = b"") -> int:
+    with urllib.request.urlopen(url, data=data, timeout=5) as response:  # noqa: S310
+        return response.status
+
+
+TEMPLATES_DIR = Path(__file__).parents[2] / "docs" / "demo" / "cloud_config_templates"
+DEMO_TEMPLATES = [
+    ("app_server.yaml.jinja", AppServerEnv(ssh__public_key="ssh-ed25519 AAAA")),
+    (
+        "postgres_server.yaml.jinja",
+        PostgresServerEnv(
+            ssh__public_key="ssh-ed25519 AAAA",
+            postgres_db="db",
+            postgres_user="user",
+            postgres_password="password",
+        ),
+    ),
+]
+
+
+def _top_level_sections(cloud_config: str) -> dict[str, str]:
+    """Split a rendered cloud-config into `{ top-level key: its block }`, in order."""
+    sections = re.split(r"^(?=[a-z_]+:)", cloud_config, flags=re.MULTILINE)[1:]
+    return {section.partition(":")[0]: section for section in sections}
+
+
+def _droplet_spec(wkid: UUID, user_data) -> DropletSpec:
+    request = DropletRequest(
+        name="web",
+        region=DORegion.LONDON1,
+        size=DropletSize.BASIC_YOCTO,
+        image=DropletImage.DEBIAN_13_X64,
+        ssh_keys=[],
+        tags=[],
+        vpc_uuid="",
+        user_data=user_data,
+        well_known_uuid=wkid,
+    )
+    return DropletSpec.from_request(request, Environment.TEST)
+
+
+@pytest.fixture
+def listener():
+    with phone_home.PhoneHomeListener("http://127.0.0.1:0") as listener:
+        yield listener
+
+
+class TestPhoneHomeListener:
+    def test_url_has_the_bound_port_and_a_token(self, listener):
+        assert listener.url.startswith("http://127.0.0.1:")
+        base_url, _, token = listener.url.rpartition("/")
+        assert not base_url.endswith(":0")
+        assert len(token) >= 16
+
+    def test_each_listener_has_its_own_token(self, listener):
+        with phone_home.PhoneHomeListener("http://127.0.0.1:0") as other:
+            assert other.url.rpartition("/")[2] != listener.url.rpartition("/")[2]
+
+    @pytest.mark.parametrize(
+        ("path", "data"),
+        [
+            ("/1234", b"instance_id=1234&hostname=web"),
+            ("/", b"instance_id=1234&hostname=web"),
+        ],
+    )
+    def test_records_droplet_from_path_or_form(self, listener, path, data):
+        listener.expect([1234])
+
+        assert _post(listener.url + path, data) == 200
+
+        assert [droplet_id for droplet_id, _ in listener.wait([1234], 5)] == [1234]
+
+    def test_rejects_request_without_droplet_id(self, listener):
+        with pytest.raises(urllib.error.HTTPError) as exc_info:
+            _post(listener.url + "/", b"hostname=web")
+
+        assert exc_info.value.code == 400
+
+    @pytest.mark.parametrize("token", ["", "not-the-token/"])
+    def test_rejects_request_without_token(self, listener, token):
+        listener.expect([1234])
+        base_url = listener.url.rpartition("/")[0]
+
+        with pytest.raises(urllib.error.HTTPError) as exc_info:
+            _post(f"{base_url}/{token}1234", b"instance_id=1234")
+
+        assert exc_info.value.code == 403
+        assert list(listener.wait([1234], 0.05)) == []
+
+    def test_ignores_droplets_the_run_does_not_wait_for(self, listener):
+        listener.expect([1234])
+
+        with pytest.raises(urllib.error.HTTPError) as exc_info:
+            _post(listener.url + "/5678")
+
+        assert exc_info.value.code == 404
+        assert list(listener.wait([5678], 0.05)) == []
+
+    def test_wait_stops_at_timeout(self, listener):
+        listener.expect([1])
+        listener.record(1)
+
+        assert [droplet_id for droplet_id, _ in listener.wait([1, 2], 0.05)] == [1]
+
+
+class TestWaitForPhoneHome:
+    def test_waits_only_for_droplets_whose_cloud_config_phones_home(self, listener):
+        phones_home = _droplet_spec(
+            UUID(int=1), lambda: f"url: {phone_home.PHONE_HOME_URL.get()}"
+        )
+        silent = _droplet_spec(UUID(int=2), "#cloud-config")
+        inventory = MagicMock(
+            droplets=[
+                {
+                    "id": 11,
+                    "tags": list(phones_home.tags),
+                    "created_at": "2020-07-21T18:37:44Z",
+                },
+                {"id": 12, "tags": list(silent.tags)},
+            ]
+        )
+        phone_home.expect_phone_home(listener, inventory, [phones_home, silent])
+        _post(f"{listener.url}/11")
+        with pytest.raises(urllib.error.HTTPError):
+            _post(f"{listener.url}/12")
+
+        not_ready = phone_home.wait_for_phone_home(
+            listener, inventory, [phones_home, silent], timeout=5
+        )
+
+        assert not_ready == set()
+
+    def test_returns_droplets_that_did_not_phone_home(self, listener):
+        droplet_spec = _droplet_spec(
+            UUID(int=1), lambda: str(phone_home.PHONE_HOME_URL.get())
+        )
+        inventory = MagicMock(droplets=[{"id": 11, "tags": list(droplet_spec.tags)}])
+
+        not_ready = phone_home.wait_for_phone_home(
+            listener, inventory, [droplet_spec], timeout=0.05
+        )
+
+        assert not_ready == {UUID(int=1)}
+
+
+class TestDemoTemplates:
+    @pytest.mark.parametrize(("template", "context"), DEMO_TEMPLATES)
+    def test_phones_home_on_the_boot_after_the_final_reboot(
+        self, listener, template, context
+    ):
+        rendered = render_cloud_config(
+            TEMPLATES_DIR / template, context, phone_home_url=listener.url
+        )
+        sections = _top_level_sections(rendered)
+
+        # cloud-init's own module would phone home before `power_state` reboots
+        assert "phone_home" not in sections
+        assert "mode: reboot" in sections["power_state"]
+        assert f'"{listener.url}/${{instance_id}}"' in sections["write_files"]
+        assert "WantedBy=multi-user.target" in sections["write_files"]
+        # enabled for the next boot, but not started during this one
+        assert "- systemctl enable dodo-phone-home.service" in sections["runcmd"]
+        assert "start dodo-phone-home" not in rendered
+        assert "--now" not in rendered
+
+    @pytest.mark.parametrize(("template", "context"), DEMO_TEMPLATES)
+    def test_does_not_phone_home_without_listener(self, template, context):
+        rendered = render_cloud_config(TEMPLATES_DIR / template, context)
+
+        assert "dodo-phone-home" not in rendered
+        assert list(_top_level_sections(rendered))[-1] == "power_state"
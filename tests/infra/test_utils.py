@@ -1,4 +1,6 @@
 import sys
+import threading
+from dataclasses import dataclass
 from types import ModuleType
 from unittest.mock import MagicMock, patch
 
@@ -6,6 +8,9 @@ import jinja2
 import pytest
 
 from digitalocean_deployment_orchestrator.infra import utils
+from digitalocean_deployment_orchestrator.infra.phone_home import PHONE_HOME_URL
+from digitalocean_deployment_orchestrator.infra.types import Operation
+from digitalocean_deployment_orchestrator.types import Environment, EnvVarDataClass
 
 
 class TestImportModuleFromPath:
@@ -41,6 +46,48 @@ class TestImportModuleFromPath:
             utils.import_module_from_path(fake_path)
 
 
+class TestFindBlueprintEnvironment:
+    @pytest.mark.parametrize(
+        "source,expected",
+        [
+            ("BLUEPRINT = EnvironmentBlueprint(environment=Environment.LIVE)", "live"),
+            ('BLUEPRINT = {"environment": Env.TEST, "droplets": []}', "test"),
+            ("BLUEPRINT = make(environment=Environment.TEST)", "test"),
+        ],
+    )
+    def test_find_blueprint_environment_from_source(self, tmp_path, source, expected):
+        mod_path = tmp_path / "bp.py"
+        mod_path.write_text(source)
+
+        assert utils.find_blueprint_environment(mod_path) == Environment(expected)
+
+    def test_find_blueprint_environment_prefers_source_over_file_name(self, tmp_path):
+        mod_path = tmp_path / "test.py"
+        mod_path.write_text("BLUEPRINT = dict(environment=Environment.LIVE)")
+
+        assert utils.find_blueprint_environment(mod_path) == Environment.LIVE
+
+    def test_find_blueprint_environment_from_file_name(self, tmp_path):
+        mod_path = tmp_path / "live.py"
+        mod_path.write_text("BLUEPRINT = build_blueprint()")
+
+        assert utils.find_blueprint_environment(mod_path) == Environment.LIVE
+
+    @pytest.mark.parametrize(
+        "source",
+        [
+            "BLUEPRINT = {}",
+            "A = dict(environment=Env.TEST)\nB = dict(environment=Env.LIVE)",
+            "def broken(:",
+        ],
+    )
+    def test_find_blueprint_environment_undetermined(self, tmp_path, source):
+        mod_path = tmp_path / "bp.py"
+        mod_path.write_text(source)
+
+        assert utils.find_blueprint_environment(mod_path) is None
+
+
 @pytest.fixture
 def fake_env():
     class FakeEnv:
@@ -75,6 +122,64 @@ class TestRenderCloudConfig:
         result = utils.render_cloud_config(tpl, ctx)
         assert "hello" in result
 
+    def test_render_cloud_config_compiles_template_once(self, tmp_path, fake_env):
+        tpl = tmp_path / "shared.yaml.jinja"
+        tpl.write_text("service: {{ name }}")
+
+        with patch.object(
+            jinja2.Environment,
+            "compile",
+            autospec=True,
+            side_effect=jinja2.Environment.compile,
+        ) as mock_compile:
+            results = [utils.render_cloud_config(tpl, fake_env) for _ in range(5)]
+
+        assert results == ["service: web"] * 5
+        assert mock_compile.call_count == 1
+
+    def test_render_cloud_config_supports_includes(self, tmp_path, fake_env):
+        (tmp_path / "_common.yaml.jinja").write_text("port: {{ port }}")
+        tpl = tmp_path / "app.yaml.jinja"
+        tpl.write_text('service: {{ name }}\n{% include "_common.yaml.jinja" %}')
+
+        result = utils.render_cloud_config(tpl, fake_env)
+
+        assert result == "service: web\nport: 80"
+
+    def test_render_cloud_config_persists_bytecode_cache(
+        self, tmp_path, fake_env, monkeypatch
+    ):
+        cache_dir = tmp_path / "cache"
+        monkeypatch.setenv(utils.TEMPLATE_CACHE_DIR_ENV_VAR, str(cache_dir))
+        tpl_dir = tmp_path / "templates"
+        tpl_dir.mkdir()
+        tpl = tpl_dir / "conf.yaml.jinja"
+        tpl.write_text("service: {{ name }}")
+
+        utils.render_cloud_config(tpl, fake_env)
+
+        assert any(cache_dir.iterdir())
+
+    @pytest.mark.parametrize(
+        ("phone_home_url", "expected"),
+        [
+            (None, "service: web"),
+            ("http://203.0.113.1:8090", "service: web\nurl: http://203.0.113.1:8090"),
+        ],
+    )
+    def test_render_cloud_config_phone_home_url(
+        self, tmp_path, fake_env, phone_home_url, expected
+    ):
+        tpl = tmp_path / "conf.yaml.jinja"
+        tpl.write_text(
+            "service: {{ name }}"
+            "{% if phone_home_url %}\nurl: {{ phone_home_url }}{% endif %}"
+        )
+
+        result = utils.render_cloud_config(tpl, fake_env, phone_home_url=phone_home_url)
+
+        assert result == expected
+
     def test_render_cloud_config_propagates_jinja_error(self, tmp_path, fake_env):
         tpl = tmp_path / "bad.yaml.jinja"
         tpl.write_text("{{ broken_syntax }}")
@@ -82,3 +187,194 @@ class TestRenderCloudConfig:
         with patch("jinja2.Template.render", side_effect=jinja2.TemplateError("broken")):
             with pytest.raises(jinja2.TemplateError):
                 utils.render_cloud_config(tpl, fake_env)
+
+
+class TestRunOperations:
+    def test_run_operations_collects_errors(self):
+        def fail():
+            raise RuntimeError("boom")
+
+        ops = [
+            Operation("destroy", "b", lambda: None),
+            Operation("create", "z", fail),
+            Operation("create", "a", lambda: None),
+        ]
+
+        results = utils.run_operations(ops, max_parallel=2)
+
+        assert [(r.kind, r.target, r.ok) for r in results] == [
+            ("create", "a", True),
+            ("create", "z", False),
+            ("destroy", "b", True),
+        ]
+        assert results[1].error == "boom"
+
+    def test_run_operations_respects_max_parallel(self):
+        lock = threading.Lock()
+        in_flight = 0
+        peak = 0
+
+        def work():
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            threading.Event().wait(0.01)
+            with lock:
+                in_flight -= 1
+
+        ops = [Operation("create", str(i), work) for i in range(10)]
+        utils.run_operations(ops, max_parallel=3)
+
+        assert peak <= 3
+
+    def test_run_operations_rejects_non_positive_max_parallel(self):
+        with pytest.raises(ValueError):
+            utils.run_operations([], max_parallel=0)
+
+
+class TestDeferredCloudConfig:
+    def test_deferred_cloud_config_renders_from_env_on_call(self, tmp_path, monkeypatch):
+        @dataclass(frozen=True)
+        class FakeServerEnv(EnvVarDataClass):
+            ssh__public_key: str
+
+        tpl = tmp_path / "server.yaml.jinja"
+        tpl.write_text("key: {{ ssh__public_key }}")
+        deferred = utils.DeferredCloudConfig(tpl, FakeServerEnv)
+
+        # nothing is read from the environment until the config is needed
+        monkeypatch.setenv("SSH__PUBLIC_KEY", "ssh-ed25519 AAAA")
+
+        assert deferred() == "key: ssh-ed25519 AAAA"
+
+    def test_deferred_cloud_config_renders_once(self, tmp_path):
+        class FakeServerEnv:
+            from_env = MagicMock(return_value=MagicMock(as_dict=lambda: {"n": 1}))
+
+        tpl = tmp_path / "server.yaml.jinja"
+        tpl.write_text("n: {{ n }}")
+
+        results = [utils.DeferredCloudConfig(tpl, FakeServerEnv)() for _ in range(3)]
+
+        assert results == ["n: 1"] * 3
+        FakeServerEnv.from_env.assert_called_once()
+
+    def test_deferred_cloud_config_renders_phone_home_url_when_listening(self, tmp_path):
+        class FakeServerEnv:
+            from_env = MagicMock(return_value=MagicMock(as_dict=lambda: {}))
+
+        tpl = tmp_path / "server.yaml.jinja"
+        tpl.write_text("url: {{ phone_home_url }}")
+        deferred = utils.DeferredCloudConfig(tpl, FakeServerEnv)
+
+        token = PHONE_HOME_URL.set("http://203.0.113.1:8090")
+        try:
+            listening = deferred()
+        finally:
+            PHONE_HOME_URL.reset(token)
+
+        assert listening == "url: http://203.0.113.1:8090"
+        assert deferred() == "url: None"
+
+    @pytest.fixture
+    def server_env(self, monkeypatch):
+        @dataclass(frozen=True)
+        class ServerEnv(EnvVarDataClass):
+            server__name: str
+
+        monkeypatch.setenv("SERVER__NAME", "web")
+        utils._deferred_cloud_config_fingerprint.cache_clear()
+        yield ServerEnv
+        utils._deferred_cloud_config_fingerprint.cache_clear()
+
+    def test_deferred_cloud_config_fingerprint_does_not_render(
+        self, tmp_path, server_env
+    ):
+        @dataclass(frozen=True)
+        class OtherServerEnv(EnvVarDataClass):
+            server__name: str
+
+        tpl, changed = tmp_path / "server.yaml.jinja", tmp_path / "changed.yaml.jinja"
+        tpl.write_text("n: {{ server__name }}")
+        changed.write_text("n: {{ server__name }}0")
+        with patch.object(utils, "render_cloud_config") as mock_render:
+            fingerprints = {
+                utils.DeferredCloudConfig(path, context_type).fingerprint()
+                for path, context_type in [
+                    (tpl, server_env),
+                    (changed, server_env),
+                    (tpl, OtherServerEnv),
+                ]
+            }
+
+        assert len(fingerprints) == 3
+        mock_render.assert_not_called()
+
+    def test_deferred_cloud_config_fingerprint_ignores_context_values(
+        self, tmp_path, monkeypatch, server_env
+    ):
+        tpl = tmp_path / "server.yaml.jinja"
+        tpl.write_text("n: {{ server__name }}")
+        before = utils.DeferredCloudConfig(tpl, server_env).fingerprint()
+
+        # secrets are neither needed nor leaked into the `spec:` tag
+        monkeypatch.delenv("SERVER__NAME")
+        utils._deferred_cloud_config_fingerprint.cache_clear()
+
+        assert utils.DeferredCloudConfig(tpl, server_env).fingerprint() == before
+
+    def test_deferred_cloud_config_fingerprint_changes_with_context_fields(
+        self, tmp_path, server_env
+    ):
+        @dataclass(frozen=True)
+        class ServerEnv(EnvVarDataClass):
+            server__name: str
+            server__port: str
+
+        ServerEnv.__qualname__ = server_env.__qualname__
+        tpl = tmp_path / "server.yaml.jinja"
+        tpl.write_text("n: {{ server__name }}")
+
+        assert (
+            utils.DeferredCloudConfig(tpl, ServerEnv).fingerprint()
+            != utils.DeferredCloudConfig(tpl, server_env).fingerprint()
+        )
+
+    @pytest.mark.parametrize(
+        "source",
+        [
+            "{% include 'partial.yaml.jinja' %}",
+            "{% import 'partial.yaml.jinja' as p %}",
+            "{% extends 'partial.yaml.jinja' %}",
+            "{% include 'partial' ~ '.yaml.jinja' %}",
+        ],
+    )
+    def test_deferred_cloud_config_fingerprint_changes_with_loaded_templates(
+        self, tmp_path, server_env, source
+    ):
+        tpl, partial = tmp_path / "server.yaml.jinja", tmp_path / "partial.yaml.jinja"
+        tpl.write_text(source)
+        partial.write_text("n: {{ server__name }}")
+        before = utils.DeferredCloudConfig(tpl, server_env).fingerprint()
+
+        partial.write_text("n: {{ server__name }}0")
+        utils._deferred_cloud_config_fingerprint.cache_clear()
+
+        assert utils.DeferredCloudConfig(tpl, server_env).fingerprint() != before
+
+    def test_template_sources_needs_a_loader(self):
+        with pytest.raises(ValueError, match="no loader"):
+            utils._template_sources(jinja2.Environment(), "server.yaml.jinja")
+
+    def test_deferred_cloud_config_missing_env_raises(self, tmp_path, monkeypatch):
+        @dataclass(frozen=True)
+        class OtherServerEnv(EnvVarDataClass):
+            some__secret: str
+
+        monkeypatch.delenv("SOME__SECRET", raising=False)
+        tpl = tmp_path / "server.yaml.jinja"
+        tpl.write_text("{{ some__secret }}")
+
+        with pytest.raises(OSError, match="SOME__SECRET"):
+            utils.DeferredCloudConfig(tpl, OtherServerEnv)()
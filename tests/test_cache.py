@@ -0,0 +1,86 @@
+import argparse
+
+import pytest
+
+from digitalocean_deployment_orchestrator import cache
+
+
+@pytest.fixture
+def now():
+    return [1_000.0]
+
+
+@pytest.fixture
+def disk_cache(tmp_path, now):
+    return cache.DiskCache(
+        tmp_path, ttls={cache.ZONE_ID: 60, cache.INVENTORY: 5}, clock=lambda: now[0]
+    )
+
+
+class TestDiskCache:
+    def test_get_returns_stored_value(self, disk_cache):
+        disk_cache.set(cache.ZONE_ID, "example.com", "023e105f4ecef8ad9ca31a8372d0c353")
+
+        assert (
+            disk_cache.get(cache.ZONE_ID, "example.com")
+            == "023e105f4ecef8ad9ca31a8372d0c353"
+        )
+
+    def test_get_misses_unknown_key(self, disk_cache):
+        assert disk_cache.get(cache.ZONE_ID, "example.com") is None
+
+    def test_entries_expire_after_their_kinds_ttl(self, disk_cache, now):
+        disk_cache.set(cache.ZONE_ID, "example.com", "zone")
+        disk_cache.set(cache.INVENTORY, "env:test", [])
+
+        now[0] += 10
+
+        assert disk_cache.get(cache.ZONE_ID, "example.com") == "zone"
+        assert disk_cache.get(cache.INVENTORY, "env:test") is None
+
+    def test_invalidate_removes_entry(self, disk_cache):
+        disk_cache.set(cache.INVENTORY, "env:test", [])
+
+        disk_cache.invalidate(cache.INVENTORY, "env:test")
+        disk_cache.invalidate(cache.INVENTORY, "env:test")
+
+        assert disk_cache.get(cache.INVENTORY, "env:test") is None
+
+    def test_corrupt_entry_is_a_miss(self, disk_cache):
+        disk_cache.set(cache.ZONE_ID, "example.com", "zone")
+        (entry,) = (disk_cache.directory / cache.ZONE_ID).iterdir()
+        entry.write_text("{")
+
+        assert disk_cache.get(cache.ZONE_ID, "example.com") is None
+
+
+class TestCacheArguments:
+    def _parse(self, *argv):
+        parser = argparse.ArgumentParser()
+        cache.add_cache_arguments(parser)
+        return cache.cache_from_args(parser.parse_args(argv))
+
+    def test_no_cache_without_cache_dir(self, monkeypatch):
+        monkeypatch.delenv(cache.CACHE_DIR_ENV_VAR, raising=False)
+
+        assert self._parse() is None
+
+    def test_cache_dir_from_env_var(self, monkeypatch, tmp_path):
+        monkeypatch.setenv(cache.CACHE_DIR_ENV_VAR, str(tmp_path))
+
+        assert self._parse().directory == tmp_path
+
+    def test_no_cache_overrides_cache_dir(self, tmp_path):
+        assert self._parse("--cache-dir", str(tmp_path), "--no-cache") is None
+
+    def test_cache_ttl_overrides_default(self, tmp_path):
+        disk_cache = self._parse(
+            "--cache-dir", str(tmp_path), "--cache-ttl", "inventory=5"
+        )
+
+        assert disk_cache.ttls[cache.INVENTORY] == 5
+        assert disk_cache.ttls[cache.ZONE_ID] == cache.DEFAULT_TTLS[cache.ZONE_ID]
+
+    def test_cache_ttl_rejects_unknown_kind(self, tmp_path):
+        with pytest.raises(SystemExit):
+            self._parse("--cache-dir", str(tmp_path), "--cache-ttl", "droplet=5")
@@ -0,0 +1,210 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import httpx
+import pytest
+from azure.core.exceptions import ServiceRequestError
+
+from digitalocean_deployment_orchestrator import clients
+from digitalocean_deployment_orchestrator.metrics import ApiMetrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def scheduler(clock):
+    return clients.RequestScheduler(
+        "test",
+        rate=1.0,
+        burst=2,
+        max_retries=2,
+        clock=clock,
+        wall_clock=lambda: 1_000.0 + clock.now,
+        jitter=lambda: 1.0,
+    )
+
+
+class TestRequestScheduler:
+    def test_reserve_allows_burst_then_paces_requests(self, scheduler, clock):
+        assert [scheduler.reserve() for _ in range(4)] == [0.0, 0.0, 1.0, 2.0]
+
+        clock.now = 10.0
+        assert scheduler.reserve() == 0.0
+
+    def test_observe_blocks_until_reset_when_budget_is_spent(self, scheduler):
+        scheduler.observe(200, {"ratelimit-remaining": "0", "ratelimit-reset": "1030"})
+
+        assert scheduler.reserve() == 30.0
+
+    def test_observe_blocks_after_rate_limited_response(self, scheduler):
+        scheduler.observe(429, {"retry-after": "5"})
+
+        assert scheduler.reserve() == 5.0
+
+    @pytest.mark.parametrize(
+        ("method", "status", "expected"),
+        [
+            ("GET", 503, 0.5),
+            ("GET", None, 0.5),
+            ("DELETE", 502, 0.5),
+            ("POST", 503, None),
+            ("POST", None, None),
+            ("POST", 429, 0.5),
+            ("GET", 404, None),
+            ("GET", 200, None),
+        ],
+    )
+    def test_retry_delay(self, scheduler, method, status, expected):
+        assert scheduler.retry_delay(method, status, {}, attempt=0) == expected
+
+    def test_retry_delay_honours_retry_after(self, scheduler):
+        assert scheduler.retry_delay("POST", 429, {"retry-after": "7"}, 0) == 7.0
+
+    def test_retry_delay_backs_off_exponentially_then_gives_up(self, scheduler):
+        delays = [scheduler.retry_delay("GET", 503, {}, attempt) for attempt in range(3)]
+
+        assert delays == [0.5, 1.0, None]
+
+
+def _pipeline_response(status, headers=None):
+    response = MagicMock()
+    response.http_response.status_code = status
+    response.http_response.headers = headers or {}
+    return response
+
+
+@patch("digitalocean_deployment_orchestrator.clients.time.sleep")
+class TestRateLimitPolicy:
+    def test_retries_rate_limited_request(self, mock_sleep, scheduler):
+        policy = clients.RateLimitPolicy(scheduler)
+        policy.next = MagicMock()
+        policy.next.send.side_effect = [
+            _pipeline_response(429, {"retry-after": "3"}),
+            _pipeline_response(202),
+        ]
+        request = MagicMock()
+        request.http_request.method = "POST"
+
+        response = policy.send(request)
+
+        assert response.http_response.status_code == 202
+        assert policy.next.send.call_count == 2
+        assert 3.0 in [c.args[0] for c in mock_sleep.call_args_list]
+
+    def test_does_not_retry_non_idempotent_request_on_error(self, mock_sleep, scheduler):
+        policy = clients.RateLimitPolicy(scheduler)
+        policy.next = MagicMock()
+        policy.next.send.side_effect = ServiceRequestError("connection reset")
+        request = MagicMock()
+        request.http_request.method = "POST"
+
+        with pytest.raises(ServiceRequestError):
+            policy.send(request)
+
+        policy.next.send.assert_called_once()
+
+    def test_records_failed_call(self, mock_sleep, scheduler):
+        metrics = ApiMetrics()
+        policy = clients.RateLimitPolicy(scheduler, metrics)
+        policy.next = MagicMock()
+        policy.next.send.side_effect = ServiceRequestError("connection reset")
+        request = MagicMock()
+        request.http_request.method = "POST"
+        request.http_request.url = "https://api.digitalocean.com/v2/droplets"
+
+        with pytest.raises(ServiceRequestError):
+            policy.send(request)
+
+        (call,) = metrics.calls
+        assert call.operation == "POST /v2/droplets"
+        assert call.status is None
+
+
+@patch("digitalocean_deployment_orchestrator.clients.time.sleep")
+class TestRateLimitedTransport:
+    def test_retries_until_success(self, mock_sleep, scheduler):
+        statuses = iter([503, 429, 200])
+        transport = clients.RateLimitedTransport(
+            scheduler,
+            httpx.MockTransport(lambda request: httpx.Response(next(statuses))),
+        )
+
+        with httpx.Client(transport=transport) as client:
+            response = client.get("https://api.example.com/zones")
+
+        assert response.status_code == 200
+        assert mock_sleep.call_count == 5  # 3 reservations & 2 backoffs
+
+    def test_records_one_call_with_its_retries(self, mock_sleep, scheduler):
+        metrics = ApiMetrics()
+        statuses = iter([429, 200])
+        transport = clients.RateLimitedTransport(
+            scheduler,
+            httpx.MockTransport(lambda request: httpx.Response(next(statuses))),
+            metrics,
+        )
+
+        with httpx.Client(transport=transport) as client:
+            client.get("https://api.example.com/zones/023e105f4ecef8ad9ca31a8372d0c353")
+
+        (call,) = metrics.calls
+        assert call.provider == "test"
+        assert call.operation == "GET /zones/{id}"
+        assert (call.status, call.retries) == (200, 1)
+
+    def test_gives_up_after_max_retries(self, mock_sleep, scheduler):
+        transport = clients.RateLimitedTransport(
+            scheduler, httpx.MockTransport(lambda request: httpx.Response(503))
+        )
+
+        with httpx.Client(transport=transport) as client:
+            response = client.get("https://api.example.com/zones")
+
+        assert response.status_code == 503
+
+
+class TestAsyncRateLimitedTransport:
+    def test_retries_rate_limited_request(self, clock):
+        scheduler = clients.RequestScheduler(
+            "test", rate=1.0, burst=2, clock=clock, jitter=lambda: 0.0
+        )
+        statuses = iter([429, 200])
+
+        async def handler(request):
+            return httpx.Response(next(statuses))
+
+        transport = clients.AsyncRateLimitedTransport(
+            scheduler, httpx.MockTransport(handler)
+        )
+
+        async def send():
+            async with httpx.AsyncClient(transport=transport) as client:
+                return await client.post("https://api.example.com/dns_records")
+
+        response = asyncio.run(send())
+
+        assert response.status_code == 200
+
+
+class TestClientFactories:
+    def test_make_do_client_installs_rate_limit_policy(self, scheduler):
+        do_client = clients.make_do_client("token", scheduler=scheduler)
+
+        assert do_client._config.retry_policy.scheduler is scheduler
+
+    def test_make_cloudflare_client_disables_sdk_retries(self, scheduler):
+        cf_client = clients.make_cloudflare_client("token", scheduler=scheduler)
+
+        assert cf_client.max_retries == 0
+        assert cf_client._client._transport.scheduler is scheduler
@@ -0,0 +1,119 @@
+from unittest.mock import MagicMock, call, patch
+
+import pytest
+
+from digitalocean_deployment_orchestrator import droplet_actions
+
+
+def _action(status, action_id=7):
+    return {"action": {"id": action_id, "status": status, "type": "x", "resource_id": 1}}
+
+
+@pytest.fixture
+def do_client():
+    return MagicMock()
+
+
+@patch("digitalocean_deployment_orchestrator.droplet_actions.time")
+class TestRunAction:
+    def test_polls_until_completed(self, mock_time, do_client):
+        mock_time.monotonic.return_value = 0.0
+        do_client.droplet_actions.post.return_value = _action("in-progress")
+        do_client.droplet_actions.get.side_effect = [
+            _action("in-progress"),
+            _action("completed"),
+        ]
+
+        action = droplet_actions.run_action(do_client, 1, "snapshot", name="baked")
+
+        assert action["status"] == "completed"
+        do_client.droplet_actions.post.assert_called_once_with(
+            droplet_id=1, body={"type": "snapshot", "name": "baked"}
+        )
+        assert do_client.droplet_actions.get.call_count == 2
+
+    def test_raises_if_action_errored(self, mock_time, do_client):
+        mock_time.monotonic.return_value = 0.0
+        do_client.droplet_actions.post.return_value = _action("errored")
+
+        with pytest.raises(RuntimeError, match="errored"):
+            droplet_actions.run_action(do_client, 1, "power_on")
+
+    def test_raises_at_timeout(self, mock_time, do_client):
+        mock_time.monotonic.side_effect = [0.0, 5.0, 11.0]
+        do_client.droplet_actions.post.return_value = _action("in-progress")
+        do_client.droplet_actions.get.return_value = _action("in-progress")
+
+        with pytest.raises(RuntimeError, match="did not finish"):
+            droplet_actions.run_action(do_client, 1, "resize", timeout=10)
+
+
+@patch("digitalocean_deployment_orchestrator.droplet_actions.run_action")
+class TestPowerOff:
+    def test_shuts_down_gracefully(self, mock_run_action, do_client):
+        droplet_actions.power_off(do_client, 1, timeout=60)
+
+        mock_run_action.assert_called_once_with(do_client, 1, "shutdown", timeout=60)
+
+    def test_cuts_power_if_shutdown_fails(self, mock_run_action, do_client):
+        mock_run_action.side_effect = [RuntimeError("errored"), None]
+
+        droplet_actions.power_off(do_client, 1, timeout=60)
+
+        assert mock_run_action.call_args_list == [
+            call(do_client, 1, "shutdown", timeout=60),
+            call(do_client, 1, "power_off", timeout=60),
+        ]
+
+
+@patch("digitalocean_deployment_orchestrator.droplet_actions.run_action")
+class TestResize:
+    def test_powers_off_resizes_and_powers_on(self, mock_run_action, do_client):
+        droplet_actions.resize(do_client, 1, "s-2vcpu-4gb", timeout=60)
+
+        assert [c.args[2] for c in mock_run_action.call_args_list] == [
+            "shutdown",
+            "resize",
+            "power_on",
+        ]
+        assert mock_run_action.call_args_list[1] == call(
+            do_client, 1, "resize", timeout=60, size="s-2vcpu-4gb", disk=False
+        )
+
+    def test_powers_on_after_failed_resize(self, mock_run_action, do_client):
+        def run_action(do_client, droplet_id, action_type, **kwargs):
+            if action_type == "resize":
+                raise RuntimeError("errored")
+
+        mock_run_action.side_effect = run_action
+
+        with pytest.raises(RuntimeError):
+            droplet_actions.resize(do_client, 1, "s-2vcpu-4gb")
+
+        assert mock_run_action.call_args_list[-1].args[2] == "power_on"
+
+    def test_leaves_powered_off_droplet_off(self, mock_run_action, do_client):
+        droplet_actions.resize(do_client, 1, "s-2vcpu-4gb", is_powered_on=False)
+
+        mock_run_action.assert_called_once()
+        assert mock_run_action.call_args.args[2] == "resize"
+
+
+@patch("digitalocean_deployment_orchestrator.droplet_actions.run_action")
+class TestSnapshot:
+    def test_returns_latest_snapshot_with_name(self, mock_run_action, do_client):
+        do_client.droplets.list_snapshots.return_value = {
+            "snapshots": [
+                {"id": 1, "name": "baked", "created_at": "2026-01-01T00:00:00Z"},
+                {"id": 2, "name": "baked", "created_at": "2026-02-01T00:00:00Z"},
+                {"id": 3, "name": "other", "created_at": "2026-03-01T00:00:00Z"},
+            ]
+        }
+
+        assert droplet_actions.snapshot(do_client, 9, "baked") == 2
+
+    def test_raises_if_snapshot_not_found(self, mock_run_action, do_client):
+        do_client.droplets.list_snapshots.return_value = {"snapshots": []}
+
+        with pytest.raises(RuntimeError, match="not found"):
+            droplet_actions.snapshot(do_client, 9, "baked")
@@ -0,0 +1,216 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, call, patch
+from uuid import UUID
+
+import pytest
+from pydo import Client as DO_Client
+from pydo.aio import Client as AsyncDO_Client
+
+from digitalocean_deployment_orchestrator.cache import INVENTORY, DiskCache
+from digitalocean_deployment_orchestrator.inventory import (
+    EnvironmentInventory,
+    iter_droplets,
+    list_droplets_async,
+)
+from digitalocean_deployment_orchestrator.types import Environment
+
+
+def _page(droplets, next_page=None):
+    links = {}
+    if next_page is not None:
+        links = {
+            "pages": {
+                "next": "https://api.digitalocean.com/v2/droplets"
+                f"?page={next_page}&per_page=200&tag_name=env%3Atest"
+            }
+        }
+    return {"droplets": droplets, "links": links, "meta": {"total": 3}}
+
+
+class TestIterDroplets:
+    def test_iter_droplets_single_page(self):
+        client = MagicMock()
+        client.droplets.list.return_value = {"droplets": [{"id": 1}]}
+
+        result = list(iter_droplets(client, tag_name="env:test"))
+
+        assert result == [{"id": 1}]
+        client.droplets.list.assert_called_once_with(
+            tag_name="env:test", per_page=200, page=1
+        )
+
+    def test_iter_droplets_follows_next_links(self):
+        client = MagicMock()
+        client.droplets.list.side_effect = [
+            _page([{"id": 1}, {"id": 2}], next_page=2),
+            _page([{"id": 3}]),
+        ]
+
+        result = list(iter_droplets(client, tag_name="env:test"))
+
+        assert [d["id"] for d in result] == [1, 2, 3]
+        assert client.droplets.list.call_args_list == [
+            call(tag_name="env:test", per_page=200, page=1),
+            call(tag_name="env:test", per_page=200, page=2),
+        ]
+
+    def test_iter_droplets_is_lazy(self):
+        client = MagicMock()
+        client.droplets.list.side_effect = [
+            _page([{"id": 1}], next_page=2),
+            _page([{"id": 2}]),
+        ]
+
+        droplets = iter_droplets(client, tag_name="env:test")
+        assert next(droplets) == {"id": 1}
+
+        client.droplets.list.assert_called_once()
+
+
+class TestEnvironmentInventory:
+    def test_fetch_lists_droplets_once(self):
+        client = MagicMock()
+        client.droplets.list.return_value = {"droplets": [{"id": 1}]}
+
+        inventory = EnvironmentInventory.fetch(client, Environment.TEST)
+
+        assert inventory.droplets == [{"id": 1}]
+        assert inventory.droplets == [{"id": 1}]
+        client.droplets.list.assert_called_once_with(
+            tag_name=Environment.TEST.tag, per_page=200, page=1
+        )
+
+    def test_refresh_relists_droplets(self):
+        client = MagicMock()
+        client.droplets.list.side_effect = [
+            {"droplets": []},
+            {"droplets": [{"id": 2}]},
+        ]
+        inventory = EnvironmentInventory.fetch(client, Environment.TEST)
+
+        inventory.refresh()
+
+        assert inventory.droplets == [{"id": 2}]
+        assert client.droplets.list.call_count == 2
+
+    def test_refresh_rejects_the_wrong_kind_of_client(self):
+        sync_inventory = EnvironmentInventory(MagicMock(spec=DO_Client), Environment.TEST)
+        async_inventory = EnvironmentInventory(
+            MagicMock(spec=AsyncDO_Client), Environment.TEST
+        )
+
+        with pytest.raises(TypeError, match="refresh_async"):
+            async_inventory.refresh()
+        with pytest.raises(TypeError, match=r"Use refresh\(\)"):
+            asyncio.run(sync_inventory.refresh_async())
+
+    def test_fetch_reuses_cached_droplets(self, tmp_path):
+        cache = DiskCache(tmp_path)
+        client = MagicMock()
+        client.droplets.list.return_value = {"droplets": [{"id": 1, "status": "active"}]}
+        EnvironmentInventory.fetch(client, Environment.TEST, cache=cache)
+
+        inventory = EnvironmentInventory.fetch(client, Environment.TEST, cache=cache)
+
+        assert inventory.droplets == [{"id": 1, "status": "active"}]
+        client.droplets.list.assert_called_once()
+
+    def test_droplets_being_provisioned_are_not_cached(self, tmp_path):
+        cache = DiskCache(tmp_path)
+        client = MagicMock()
+        client.droplets.list.return_value = {"droplets": [{"id": 1, "status": "new"}]}
+        EnvironmentInventory.fetch(client, Environment.TEST, cache=cache)
+
+        EnvironmentInventory.fetch(client, Environment.TEST, cache=cache)
+
+        assert client.droplets.list.call_count == 2
+
+    def test_invalidate_drops_cached_droplets(self, tmp_path):
+        cache = DiskCache(tmp_path)
+        client = MagicMock()
+        client.droplets.list.return_value = {"droplets": []}
+        inventory = EnvironmentInventory.fetch(client, Environment.TEST, cache=cache)
+
+        inventory.invalidate()
+
+        assert cache.get(INVENTORY, Environment.TEST.tag) is None
+
+
+def _droplet(wkid: UUID, status="active", ip="10.0.0.1"):
+    v4 = [{"type": "public", "ip_address": ip}] if ip else []
+    return {
+        "id": wkid.int,
+        "status": status,
+        "tags": [f"wkid:{wkid}"],
+        "networks": {"v4": v4, "v6": []},
+    }
+
+
+@patch("digitalocean_deployment_orchestrator.inventory.time")
+class TestWaitUntilReady:
+    def test_polls_with_one_list_per_tick_until_ready(self, mock_time):
+        mock_time.monotonic.return_value = 0.0
+        wkids = [UUID(int=1), UUID(int=2)]
+        client = MagicMock()
+        client.droplets.list.side_effect = [
+            {"droplets": [_droplet(wkids[0], status="new", ip=None), _droplet(wkids[1])]},
+            {"droplets": [_droplet(wkids[0]), _droplet(wkids[1])]},
+        ]
+        inventory = EnvironmentInventory(client, Environment.TEST)
+
+        not_ready = inventory.wait_until_ready(wkids, timeout=60, poll_interval=5)
+
+        assert not_ready == set()
+        assert client.droplets.list.call_count == 2
+        mock_time.sleep.assert_called_with(5)
+
+    def test_gives_up_at_deadline(self, mock_time):
+        mock_time.monotonic.side_effect = [0.0, 0.0, 4.0, 8.0, 8.0]
+        wkid = UUID(int=1)
+        client = MagicMock()
+        client.droplets.list.return_value = {
+            "droplets": [_droplet(wkid, status="active", ip=None)]
+        }
+        inventory = EnvironmentInventory(client, Environment.TEST)
+
+        not_ready = inventory.wait_until_ready([wkid], timeout=8, poll_interval=5)
+
+        assert not_ready == {wkid}
+        assert [c.args[0] for c in mock_time.sleep.call_args_list] == [5, 4.0]
+
+    def test_wait_until_ready_async(self, mock_time):
+        mock_time.monotonic.return_value = 0.0
+        wkid = UUID(int=1)
+        client = MagicMock()
+        client.droplets.list = AsyncMock(
+            return_value={"droplets": [_droplet(wkid)], "meta": {"total": 1}}
+        )
+        inventory = EnvironmentInventory(client, Environment.TEST)
+        inventory.droplets = [_droplet(wkid, status="new", ip=None)]
+
+        with patch("digitalocean_deployment_orchestrator.inventory.asyncio.sleep"):
+            not_ready = asyncio.run(
+                inventory.wait_until_ready_async([wkid], timeout=60, poll_interval=1)
+            )
+
+        assert not_ready == set()
+        client.droplets.list.assert_awaited_once()
+
+
+class TestListDropletsAsync:
+    def test_list_droplets_async_fetches_remaining_pages(self):
+        client = MagicMock()
+
+        async def list_side_effect(tag_name, per_page, page):
+            return {
+                "droplets": [{"id": page}],
+                "links": {},
+                "meta": {"total": 3},
+            }
+
+        client.droplets.list = AsyncMock(side_effect=list_side_effect)
+
+        result = asyncio.run(list_droplets_async(client, tag_name="env:test", per_page=1))
+
+        assert sorted(d["id"] for d in result) == [1, 2, 3]
+        assert client.droplets.list.await_count == 3
@@ -55,7 +55,9 @@ class TestGetDropletIPsForEnv:
             UUID("11111111-1111-1111-1111-111111111111"): "10.0.0.1",
             UUID("22222222-2222-2222-2222-222222222222"): "10.0.0.2",
         }
-        fake_client.droplets.list.assert_called_once_with(tag_name=Environment.TEST.tag)
+        fake_client.droplets.list.assert_called_once_with(
+            tag_name=Environment.TEST.tag, per_page=200, page=1
+        )
 
     @patch(
         "digitalocean_deployment_orchestrator.list_droplet_IPs.get_public_ip",
@@ -125,6 +127,27 @@ class TestGetDropletIPsForEnv:
 
         assert result == {UUID("11111111-1111-1111-1111-111111111111"): "10.0.0.1"}
 
+    def test_get_droplet_ips_reads_from_inventory(self, fake_client):
+        inventory = MagicMock(
+            droplets=[
+                {
+                    "id": 1,
+                    "tags": ["wkid:11111111-1111-1111-1111-111111111111"],
+                    "networks": {
+                        "v4": [{"type": "public", "ip_address": "10.0.0.1"}],
+                        "v6": [],
+                    },
+                }
+            ]
+        )
+
+        result = get_droplet_ips_for_env(
+            fake_client, Environment.TEST, inventory=inventory
+        )
+
+        assert result == {UUID("11111111-1111-1111-1111-111111111111"): "10.0.0.1"}
+        fake_client.droplets.list.assert_not_called()
+
 
 class TestMain:
     @patch("builtins.print")
@@ -144,4 +167,5 @@ class TestMain:
             fake_client,
             Environment.TEST,
             required_tags=None,
+            inventory=None,
         )
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from digitalocean_deployment_orchestrator.logging import configure_logging
+from digitalocean_deployment_orchestrator.metrics import (
+    ApiCall,
+    ApiMetrics,
+    operation_name,
+)
+
+
+@pytest.mark.parametrize(
+    ("method", "url", "expected"),
+    [
+        ("get", "https://api.digitalocean.com/v2/droplets?page=2", "GET /v2/droplets"),
+        (
+            "DELETE",
+            "https://api.digitalocean.com/v2/droplets/123456",
+            "DELETE /v2/droplets/{id}",
+        ),
+        (
+            "PATCH",
+            "https://api.cloudflare.com/client/v4/zones/"
+            "023e105f4ecef8ad9ca31a8372d0c353/dns_records/batch",
+            "PATCH /client/v4/zones/{id}/dns_records/batch",
+        ),
+    ],
+)
+def test_operation_name(method, url, expected):
+    assert operation_name(method, url) == expected
+
+
+@pytest.fixture
+def metrics():
+    metrics = ApiMetrics()
+    for i in range(1, 21):
+        metrics.record(ApiCall("digitalocean", "GET /v2/droplets", i / 10, 200, 0))
+    metrics.record(ApiCall("cloudflare", "GET /client/v4/zones", 0.1, 429, 2))
+    metrics.record(ApiCall("cloudflare", "GET /client/v4/zones", 0.3, None, 0))
+    return metrics
+
+
+class TestApiMetrics:
+    def test_summary_aggregates_per_operation(self, metrics):
+        droplets, zones = metrics.summary()
+
+        assert droplets == {
+            "provider": "digitalocean",
+            "operation": "GET /v2/droplets",
+            "count": 20,
+            "total": 21.0,
+            "p50": 1.0,
+            "p95": 1.9,
+            "max": 2.0,
+            "retries": 0,
+            "statuses": {"200": 20},
+        }
+        assert zones["count"] == 2
+        assert zones["retries"] == 2
+        assert zones["statuses"] == {"429": 1, "error": 1}
+
+    def test_log_summary(self, metrics, capsys):
+        configure_logging()
+
+        metrics.log_summary()
+
+        event = json.loads(capsys.readouterr().out)
+        assert event["event"] == "API call summary"
+        assert event["calls"] == 22
+        assert len(event["operations"]) == 2
+
+    def test_write_json(self, metrics, tmp_path):
+        path = tmp_path / "metrics.json"
+
+        metrics.write(path)
+
+        assert json.loads(path.read_text()) == metrics.summary()
+        assert list(tmp_path.iterdir()) == [path]
+
+    def test_write_prometheus_textfile(self, metrics, tmp_path):
+        path = tmp_path / "dodo.prom"
+
+        metrics.write(path)
+
+        lines = path.read_text().splitlines()
+        labels = 'provider="digitalocean",operation="GET /v2/droplets"'
+        assert f'dodo_api_requests_total{{{labels},status="200"}} 20' in lines
+        assert (
+            f'dodo_api_request_duration_seconds{{{labels},quantile="0.95"}} 1.9' in lines
+        )
+        assert f"dodo_api_request_duration_seconds_count{{{labels}}} 20" in lines
+        assert "# TYPE dodo_api_request_duration_seconds summary" in lines
@@ -13,6 +13,15 @@ class TestGetWKIDFromTags:
         assert utils.get_wkid_from_tags(["foo", "bar"]) is None
 
 
+class TestGetSpecTagFromTags:
+    def test_get_spec_tag_from_tags_valid(self):
+        tags = ["foo", "wkid:12345678-1234-5678-1234-567812345678", "spec:0123abcd"]
+        assert utils.get_spec_tag_from_tags(tags) == "spec:0123abcd"
+
+    def test_get_spec_tag_from_tags_none(self):
+        assert utils.get_spec_tag_from_tags(["foo", "bar"]) is None
+
+
 class TestGetPublicIP:
     def test_get_public_ip_default_v4(self, droplet_response):
         assert utils.get_public_ip(droplet_response) == "1.2.3.4"